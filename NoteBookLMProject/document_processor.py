@@ -1,12 +1,25 @@
 import os
-import fitz
-import pytesseract
+import sys
+import json
+import shutil
+import hashlib
 import logging
-from PIL import Image
-import io
+import threading
+from contextlib import contextmanager
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import FAISS
 from langchain_core.documents import Document
+from pathlib import Path
+
+# Add project root to path for the shared rag_services package
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from rag_services.embedding_cache import CachedEmbeddings, get_chunk_store
+from rag_services.bm25 import BM25Index, hybrid_search
+from rag_services.vector_index import FaissVectorIndex, merge_results
+from rag_services.manifest import file_sha256
+from rag_services.ocr import ocr_pages
+from rag_services.pdf_extract import iter_pdf_text
+from rag_services.index_version import IndexSnapshot, VersionedDirectory, POINTER_FILE
 
 # Try to use new HuggingFace embeddings, fallback to old if not available
 try:
@@ -14,90 +27,269 @@ try:
 except ImportError:
     from langchain_community.embeddings import HuggingFaceEmbeddings
 
+# Sub-topics searched together to gather broad context for podcast overviews
+OVERVIEW_TOPICS = [
+    "key concepts and main topics",
+    "definitions and terminology",
+    "methods and how it works",
+    "results, examples and conclusions",
+]
+
 class DocumentProcessor:
     def __init__(self, persist_dir="./faiss_db"):
         # Using HuggingFace embeddings instead of Ollama (faster and more reliable)
-        self.embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
+        # Query embeddings are cached (memory + disk) across Q&A, chat and podcast searches;
+        # chunk embeddings are cached by content hash so re-uploads only embed new chunks
+        self.embeddings = CachedEmbeddings(
+            HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2"),
+            model_name="all-MiniLM-L6-v2",
+            chunk_store=get_chunk_store("all-MiniLM-L6-v2"),
+            symmetric=True
+        )
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=1000,
             chunk_overlap=200,
-            separators=["\n\n", "\n• ", ". ", " ", ""]
+            separators=["\n\n", "\n• ", ". ", " ", ""],
+            add_start_index=True
         )
         self.persist_directory = persist_dir
-        self.vector_store = None
+        # Each upload/removal is built into a new version directory under persist_dir and published
+        # by swapping current.json, so searches never see a half-written index
+        self.versions = VersionedDirectory(persist_dir)
+        self._current_dir = None
+        self._write_lock = threading.Lock()
+        # Vector store + keyword index over the same chunks (fused in search()), swapped together;
+        # a replaced version's store is closed once the searches still reading it finish
+        self._live = IndexSnapshot(None, None, BM25Index())
+        self._read_lock = threading.Lock()
+        # Documents in the notebook: doc_id (content hash, per uploader) -> source, chunk and page counts
+        self.documents = {}
+
+    @property
+    def vector_store(self):
+        """The live vector store (pinned only inside reading())"""
+        return self._live.store
+
+    @property
+    def keyword_index(self):
+        return self._live.keyword_index
+
+    @contextmanager
+    def reading(self):
+        """Pin the live version (store + keyword index) so an upload can't close it while in use"""
+        with self._read_lock:
+            live = self._live
+            live.readers += 1
+        try:
+            yield live
+        finally:
+            with self._read_lock:
+                live.readers -= 1
+                live.close_if_unused()
+
+    def _swap(self, version, store, keyword_index):
+        """Make a loaded/built version live and retire the previous one"""
+        with self._read_lock:
+            previous, self._live = self._live, IndexSnapshot(version, store, keyword_index)
+            previous.retired = True
+            previous.close_if_unused()
+
+    def _load_version(self, directory):
+        store = FaissVectorIndex(directory, self.embeddings)
+        keyword_index = BM25Index.load(os.path.join(directory, "bm25.pkl"), lookup=store.get_documents)
+        documents = {}
+        if os.path.exists(os.path.join(directory, "documents.json")):
+            with open(os.path.join(directory, "documents.json"), "r", encoding="utf-8") as f:
+                documents = json.load(f)
+        return store, keyword_index, documents
 
     def load_vector_store(self):
         """Load existing vector store or create empty one if none exists"""
+        version, directory = self.versions.current()
+        # Stores written before versioned builds keep their files directly in persist_dir
+        directory = directory or self.persist_directory
         try:
-            if os.path.exists(self.persist_directory):
-                print(f"📂 Loading existing vector store from {self.persist_directory}")
-                self.vector_store = FAISS.load_local(
-                    self.persist_directory, 
-                    self.embeddings,
-                    allow_dangerous_deserialization=True
-                )
-                print(f"✅ Vector store loaded successfully")
+            if os.path.exists(directory):
+                print(f"📂 Loading existing vector store from {directory}")
             else:
                 print(f"📂 No existing vector store found, creating empty one")
-                self.vector_store = FAISS.from_texts([""], self.embeddings)
+            store, keyword_index, documents = self._load_version(directory)
+            self.documents, self._current_dir = documents, directory
+            self._swap(version, store, keyword_index)
+            print(f"✅ Vector store loaded successfully ({len(self.documents)} documents, "
+                  f"{len(self.vector_store)} chunks)")
         except Exception as e:
             logging.error(f"Vector store loading error: {str(e)}")
             print(f"❌ Vector store loading failed, creating new empty one")
-            self.vector_store = FAISS.from_texts([""], self.embeddings)
+            store = FaissVectorIndex(directory, self.embeddings)
+            store.reset()
+            self.documents, self._current_dir = {}, directory
+            self._swap(version, store, BM25Index())
 
-    def process_document(self, file_path):
-        # Don't reload vector store here - preserve the global state
+    @contextmanager
+    def _new_version(self):
+        """
+        Yield (vector_store, keyword_index, documents) for a copy of the current version;
+        when the block succeeds the copy is saved, published and becomes the live store.
+        A block that leaves `documents` unchanged publishes nothing.
+        Searches running meanwhile keep using the previous version, which is closed after them.
+        """
+        with self._write_lock:
+            if self.vector_store is None:
+                self.load_vector_store()
+            legacy = self._current_dir == self.persist_directory
+            ignore = shutil.ignore_patterns("v[0-9]*", POINTER_FILE + "*") if legacy else None
+            version, directory = self.versions.stage(copy_from=self._current_dir, ignore=ignore)
+            store = None
+            try:
+                store, keyword_index, documents = self._load_version(directory)
+                before = {doc_id: dict(info) for doc_id, info in documents.items()}
+                yield store, keyword_index, documents
+                if documents == before:
+                    store.close()
+                    self.versions.discard(version)
+                    return
+                store.wait_for_build()
+                store.persist()
+                keyword_index.save(os.path.join(directory, "bm25.pkl"))
+                with open(os.path.join(directory, "documents.json"), "w", encoding="utf-8") as f:
+                    json.dump(documents, f, indent=2)
+            except BaseException:
+                if store is not None:
+                    store.close()
+                self.versions.discard(version)
+                raise
+            self.versions.publish(version)
+            self.documents, self._current_dir = documents, directory
+            self._swap(version, store, keyword_index)
+
+    def process_document(self, file_path, user_id=None):
+        """
+        Add a PDF to the notebook (appends to the existing index; unchanged re-uploads are skipped).
+        A user_id is stored on every chunk so searches can be filtered by uploader; each uploader
+        of the same file gets their own document and chunks.
+        """
         try:
-            doc = fitz.open(file_path)
-            text_content = []
-            
-            for page_num in range(len(doc)):
-                page = doc.load_page(page_num)
-                text = page.get_text()
-                
-                if not text.strip():
-                    text = self._ocr_page(page)
-                
-                if text.strip():
-                    text_content.append({
-                        "text": text,
-                        "metadata": {
-                            "source": os.path.basename(file_path),
-                            "page": page_num + 1
-                        }
-                    })
+            if self.vector_store is None:
+                self.load_vector_store()
+            source = os.path.basename(file_path)
+            doc_id = self._document_id(file_sha256(file_path), user_id)
+            # Shortcut before extraction; re-checked under the write lock below
+            if doc_id in self.documents:
+                return f"Already in notebook: {source}"
+
+            page_texts = dict(iter_pdf_text(file_path))
+
+            # Scanned pages: OCR all of them in parallel (results cached by image hash)
+            scanned = [number for number, text in page_texts.items() if not text.strip()]
+            page_texts.update(ocr_pages(file_path, scanned))
+
+            text_content = [
+                {"text": text, "metadata": {"source": source, "page": number}}
+                for number, text in sorted(page_texts.items()) if text.strip()
+            ]
 
             if not text_content:
-                return f"No content found: {os.path.basename(file_path)}"
+                return f"No content found: {source}"
 
             chunks = self.text_splitter.create_documents(
                 [t["text"] for t in text_content],
-                metadatas=[t["metadata"] for t in text_content]
-            )
-            
-            # Create a FRESH vector store for the new document (replace old one)
-            print(f"🔄 Creating fresh vector store for {os.path.basename(file_path)}")
-            self.vector_store = FAISS.from_texts(
-                texts=[c.page_content for c in chunks],
-                metadatas=[c.metadata for c in chunks],
-                embedding=self.embeddings
+                metadatas=[{**t["metadata"], "doc_id": doc_id, **({"user_id": user_id} if user_id else {})}
+                           for t in text_content]
             )
-            
-            # Save the new vector store (overwrites the old one)
-            self.vector_store.save_local(self.persist_directory)
-            print(f"✅ Fresh vector store saved with {len(chunks)} chunks from {os.path.basename(file_path)}")
-            
-            return f"Processed {len(chunks)} chunks from {os.path.basename(file_path)}"
-        
+            # Make start_index an offset into the whole document so overlapping chunks can be merged later
+            page_offsets, offset = {}, 0
+            for t in text_content:
+                page_offsets[t["metadata"]["page"]] = offset
+                offset += len(t["text"])
+            for chunk in chunks:
+                chunk.metadata["start_index"] += page_offsets[chunk.metadata["page"]]
+
+            with self._new_version() as (store, keyword_index, documents):
+                # A concurrent upload of the same file may have added it since the shortcut above
+                if doc_id in documents:
+                    return f"Already in notebook: {source}"
+                # A new version of a file replaces the same uploader's old one (other users keep theirs)
+                for old_id, info in list(documents.items()):
+                    if info["source"] == source and info.get("user_id") == (user_id or None):
+                        print(f"🔁 Replacing previous version of {source}")
+                        self._remove_chunks(old_id, store, keyword_index, documents)
+
+                print(f"➕ Adding {source} to the notebook")
+                ids = [f"{doc_id}-{i}" for i in range(len(chunks))]
+                reused = self.embeddings.chunk_store.stats["hits"]
+                store.add(chunks, ids)
+                reused = self.embeddings.chunk_store.stats["hits"] - reused
+                if reused:
+                    print(f"♻️ Reused cached embeddings for {reused}/{len(chunks)} chunks")
+                keyword_index.add(ids, [c.page_content for c in chunks])
+                documents[doc_id] = {"source": source, "chunks": len(chunks), "pages": len(text_content)}
+                if user_id:
+                    documents[doc_id]["user_id"] = user_id
+            print(f"✅ Notebook now has {len(self.documents)} documents ({len(self.vector_store)} chunks)")
+
+            return f"Processed {len(chunks)} chunks from {source}"
+
         except Exception as e:
             logging.error(f"Processing error: {str(e)}")
             return f"Error: {str(e)}"
 
-    def _ocr_page(self, page):
-        text = []
-        for img in page.get_images():
-            xref = img[0]
-            base_image = page.parent.extract_image(xref)
-            image = Image.open(io.BytesIO(base_image["image"]))
-            text.append(pytesseract.image_to_string(image))
-        return "\n".join(text)
\ No newline at end of file
+    @staticmethod
+    def _document_id(content_hash, user_id=None):
+        """Content hash prefix, made per-uploader when a user_id is given"""
+        if not user_id:
+            return content_hash[:16]
+        return hashlib.sha256(f"{content_hash}:{user_id}".encode("utf-8")).hexdigest()[:16]
+
+    @staticmethod
+    def _remove_chunks(doc_id, store, keyword_index, documents):
+        info = documents.pop(doc_id)
+        ids = [f"{doc_id}-{i}" for i in range(info["chunks"])]
+        store.delete(ids)
+        keyword_index.remove(ids)
+        return info
+
+    def remove_document(self, doc_id):
+        """Remove one document's chunks from the notebook"""
+        if self.vector_store is None:
+            self.load_vector_store()
+        if doc_id not in self.documents:
+            return f"Unknown document: {doc_id}"
+        with self._new_version() as (store, keyword_index, documents):
+            info = self._remove_chunks(doc_id, store, keyword_index, documents)
+        return f"Removed {info['source']} ({info['chunks']} chunks)"
+
+    def list_documents(self):
+        """Documents in the notebook as dicts with doc_id, source, chunks and pages"""
+        return [{"doc_id": doc_id, **info} for doc_id, info in self.documents.items()]
+
+    def search(self, query, k=5, filters=None):
+        """
+        Hybrid retrieval: FAISS cosine similarity and BM25 keyword hits merged by rank fusion.
+        `filters` (e.g. {"source": "notes.pdf", "page_start": 3}) restrict both indexes.
+        """
+        # Read both indexes from one published version even if an upload swaps it meanwhile
+        with self.reading() as live:
+            store = live.store
+            if not store:
+                return []
+            return hybrid_search(
+                lambda q, n: store.similarity_search(q, k=n, filters=filters), live.keyword_index, query, k=k,
+                filters=filters
+            )
+
+    def batch_search(self, queries, k=5, filters=None):
+        """Vector top-k for several queries in one embedding batch and one index search"""
+        with self.reading() as live:
+            if not live.store:
+                return [[] for _ in queries]
+            return [[doc for doc, _ in hits] for hits in live.store.batch_search(queries, k=k, filters=filters)]
+
+    def overview_context(self, k=7, topics=OVERVIEW_TOPICS, filters=None):
+        """Up to k distinct chunks covering several sub-topics (used for podcast scripts)"""
+        # One spare hit per topic, since topics often share their best chunks
+        per_topic = -(-k // len(topics)) + 1
+        with self.reading() as live:
+            if not live.store:
+                return []
+            return merge_results(live.store.batch_search(topics, k=per_topic, filters=filters), limit=k)
@@ -7,8 +7,9 @@ from pydub import AudioSegment
 from gtts import gTTS
 from langchain_ollama import OllamaLLM
 from langchain.prompts import ChatPromptTemplate
-from sentence_transformers import CrossEncoder
 from document_processor import DocumentProcessor
+from rag_services.reranker import get_reranker
+from rag_services.context_packing import pack_context
 
 # Configuration
 TTS_CONFIG = {
@@ -84,8 +85,9 @@ Format requirements:
 
 def main():
     processor = DocumentProcessor()
+    processor.load_vector_store()
     podcast = PodcastGenerator()
-    reranker = CrossEncoder('cross-encoder/ms-marco-MiniLM-L-6-v2')
+    reranker = get_reranker()
     
     # Initialize QA chain
     model = OllamaLLM(model="llama3.2")
@@ -96,9 +98,11 @@ def main():
         print("1. Upload Document")
         print("2. Ask Question")
         print("3. Generate Podcast")
-        print("4. Exit")
+        print("4. List Documents")
+        print("5. Remove Document")
+        print("6. Exit")
         
-        choice = input("Choose option (1-4): ").strip()
+        choice = input("Choose option (1-6): ").strip()
         
         if choice == "1":
             file_path = input("Document path: ").strip()
@@ -110,17 +114,20 @@ def main():
                 print("Upload documents first!")
                 continue
                 
-            docs = processor.vector_store.similarity_search(question, k=5)
+            # Over-retrieve, then rerank all candidates in one batched cross-encoder pass
+            candidates = processor.search(question, k=20)
+            reranked = reranker.rerank(question, candidates, top_n=6)
+            docs = pack_context(question, reranked, k=3, index=processor.vector_store)
             context = "\n\n".join(
                 f"Source: {d.metadata['source']} (Page {d.metadata.get('page','?')})\n{d.page_content}"
-                for d in docs[:3]
+                for d in docs
             )
             response = chain.invoke({"input": f"Context: {context}\nQuestion: {question}\nAnswer:"})
             print(f"\nANSWER:\n{response}")
         
         elif choice == "3":
             if processor.vector_store:
-                docs = processor.vector_store.similarity_search("key concepts", k=7)
+                docs = processor.overview_context(k=7)
                 context = "\n".join(d.page_content[:300] for d in docs)
                 audio_path, script_path = podcast.generate_podcast(context)
                 
@@ -133,6 +140,14 @@ def main():
                 print("Upload documents first!")
         
         elif choice == "4":
+            for info in processor.list_documents():
+                print(f"{info['doc_id']}  {info['source']} ({info['pages']} pages, {info['chunks']} chunks)")
+        
+        elif choice == "5":
+            doc_id = input("Document id: ").strip()
+            print(processor.remove_document(doc_id))
+        
+        elif choice == "6":
             print("Exiting...")
             break
         
@@ -6,6 +6,7 @@ from google import genai
 from google.genai import types
 from PIL import Image
 from io import BytesIO
+from ai_services.RateLimiter import rate_limited_call, estimate_tokens
 
 load_dotenv()
 
@@ -15,7 +16,10 @@ client = genai.Client(api_key=api_key)
 # === 1. CHAT / COMPLETION ===
 def call_gemini(prompt: str, model: str = "gemini-2.5-flash") -> str:
     try:
-        resp = client.models.generate_content(model=model, contents=prompt)
+        resp = rate_limited_call(
+            "gemini", client.models.generate_content,
+            model=model, contents=prompt, estimated_tokens=estimate_tokens(prompt)
+        )
         return resp.text
     except Exception as e:
         return f"Error (Chat): {str(e)}"
@@ -27,7 +31,8 @@ def gemini_image_gen(prompt: str, num_images: int = 1) -> str:
         print(f"🎨 Attempting to generate {num_images} image(s) with Imagen 4.0...")
         print(f"📝 Prompt: {prompt}")
         
-        response = client.models.generate_images(
+        response = rate_limited_call(
+            "gemini", client.models.generate_images,
             model='imagen-4.0-generate-001',
             prompt=prompt,
             config=types.GenerateImagesConfig(
@@ -74,7 +79,8 @@ def gemini_image_understand(image_path: str, task_prompt: str = "Describe this i
         
         with open(image_path, "rb") as f:
             img_data = f.read()
-        resp = client.models.generate_content(
+        resp = rate_limited_call(
+            "gemini", client.models.generate_content,
             model="gemini-2.0-flash",
             contents=[{"role": "user", "parts": [
                 {"inline_data": {"mime_type": mime_type, "data": img_data}},
@@ -98,9 +104,11 @@ def gemini_search(query: str) -> str:
             tools=[grounding_tool]
         )
         
-        response = client.models.generate_content(
+        response = rate_limited_call(
+            "gemini", client.models.generate_content,
             model="gemini-2.5-flash",
             contents=query,
+            estimated_tokens=estimate_tokens(query),
             config=config,
         )
         
@@ -125,7 +133,8 @@ def gemini_transcribe(audio_path: str) -> str:
         
         with open(audio_path, "rb") as f:
             audio_data = f.read()
-        resp = client.models.generate_content(
+        resp = rate_limited_call(
+            "gemini", client.models.generate_content,
             model="gemini-2.0-flash",
             contents=[{"role": "user", "parts": [
                 {"inline_data": {"mime_type": mime_type, "data": audio_data}},
@@ -142,7 +151,8 @@ def gemini_video_describe(video_path: str) -> str:
     try:
         with open(video_path, "rb") as f:
             video_data = f.read()
-        resp = client.models.generate_content(
+        resp = rate_limited_call(
+            "gemini", client.models.generate_content,
             model="gemini-2.0-flash",
             contents=[{"role": "user", "parts": [
                 {"inline_data": {"mime_type": "video/mp4", "data": video_data}},
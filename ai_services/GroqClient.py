@@ -1,6 +1,7 @@
 import os
 from groq import Groq
 from dotenv import load_dotenv
+from ai_services.RateLimiter import rate_limited_call, estimate_tokens
 
 load_dotenv()
 
@@ -9,12 +10,15 @@ groq_pro_client = Groq(api_key=os.getenv("GROQ_API_PRO"))
 
 def generate_completion(prompt: str, system_message: str = "You are a helpful assistant.", model: str = "llama-3.3-70b-versatile") -> str:
     try:
-        chat_completion = groq_client.chat.completions.create(
+        chat_completion = rate_limited_call(
+            "groq",
+            groq_client.chat.completions.create,
             messages=[
                 {"role": "system", "content": system_message},
                 {"role": "user", "content": prompt},
             ],
             model=model,
+            estimated_tokens=estimate_tokens(system_message, prompt),
         )
         return chat_completion.choices[0].message.content
     except Exception as e:
@@ -23,12 +27,15 @@ def generate_completion(prompt: str, system_message: str = "You are a helpful as
 
 def generate_completion_paid(prompt: str, system_message: str = "You are a helpful assistant.", model: str = "mixtral-8x7b") -> str:
     try:
-        chat_completion = groq_pro_client.chat.completions.create(
+        chat_completion = rate_limited_call(
+            "groq_pro",
+            groq_pro_client.chat.completions.create,
             messages=[
                 {"role": "system", "content": system_message},
                 {"role": "user", "content": prompt},
             ],
             model=model,
+            estimated_tokens=estimate_tokens(system_message, prompt),
         )
         return chat_completion.choices[0].message.content
     except Exception as e:
@@ -0,0 +1,160 @@
+"""
+Hedged LLM Requests
+Streams the request from a primary chat model; if no first token arrives within
+a dynamic threshold (observed p90 first-token latency of that provider), the
+same request is fired at a secondary provider and whichever completes first wins.
+The loser is cancelled; if it never produced a token, its elapsed time still
+counts as a (lower-bound) latency sample. Enable with HEDGE_REQUESTS=1.
+"""
+import os
+import time
+import asyncio
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from langchain_core.messages import AIMessage, message_chunk_to_message
+
+HEDGING_ENABLED = os.getenv("HEDGE_REQUESTS", "0") == "1"
+
+# Threshold used until enough samples have been observed, and its clamp range (seconds)
+DEFAULT_THRESHOLD = 2.0
+MIN_THRESHOLD = 0.5
+MAX_THRESHOLD = 10.0
+MIN_SAMPLES = 20
+HEDGE_PERCENTILE = 0.9
+
+
+class LatencyTracker:
+    """Rolling window of first-token latencies for one provider"""
+
+    def __init__(self, window: int = 200):
+        self.samples = deque(maxlen=window)
+
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, p: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(p * len(ordered)))
+        return ordered[index]
+
+    def threshold(self) -> float:
+        if len(self.samples) < MIN_SAMPLES:
+            return DEFAULT_THRESHOLD
+        return min(MAX_THRESHOLD, max(MIN_THRESHOLD, self.percentile(HEDGE_PERCENTILE)))
+
+
+_trackers: Dict[str, LatencyTracker] = {}
+hedge_stats = {"requests": 0, "hedged": 0, "secondary_wins": 0}
+
+
+def get_tracker(provider: str) -> LatencyTracker:
+    if provider not in _trackers:
+        _trackers[provider] = LatencyTracker()
+    return _trackers[provider]
+
+
+def hedge_rate() -> float:
+    """Fraction of requests that fired a hedge"""
+    return hedge_stats["hedged"] / hedge_stats["requests"] if hedge_stats["requests"] else 0.0
+
+
+async def _stream(llm, messages: List[Any], provider: str, first_token: asyncio.Event):
+    """Stream a completion, flagging and timing the first chunk"""
+    start = time.monotonic()
+    full = None
+    try:
+        async for chunk in llm.astream(messages):
+            if not first_token.is_set():
+                get_tracker(provider).record(time.monotonic() - start)
+                first_token.set()
+            full = chunk if full is None else full + chunk
+    except asyncio.CancelledError:
+        # A cancelled slow stream took at least this long: record it as a lower bound so the
+        # threshold is not computed from the fast responses only
+        if not first_token.is_set():
+            get_tracker(provider).record(time.monotonic() - start)
+        raise
+    return message_chunk_to_message(full) if full is not None else AIMessage(content="")
+
+
+async def _cancel(task: asyncio.Task):
+    task.cancel()
+    try:
+        await task
+    except BaseException:
+        pass
+
+
+async def hedged_ainvoke(primary: Tuple[str, Any], get_secondary: Callable[[], Optional[Tuple[str, Any]]],
+                         messages: List[Any], on_result: Optional[Callable[[str, Optional[BaseException]], None]] = None):
+    """
+    Invoke `primary` (provider, llm) and hedge to a secondary if it is slow to start.
+
+    Args:
+        primary: (provider name, chat model)
+        get_secondary: called only when the hedge fires; returns (provider name, chat model)
+            or None if no secondary is available right now
+        messages: LangChain messages to send
+        on_result: called with (provider, None) for every request that completed and
+            (provider, error) for every one that failed; cancelled losers are not reported
+
+    Returns:
+        (message, provider that produced it)
+    """
+    primary_name, primary_llm = primary
+    hedge_stats["requests"] += 1
+
+    primary_first = asyncio.Event()
+    primary_task = asyncio.create_task(_stream(primary_llm, messages, primary_name, primary_first))
+    first_wait = asyncio.create_task(primary_first.wait())
+    tasks = [primary_task, first_wait]
+    names = {primary_task: primary_name}
+
+    def finished(task: asyncio.Task):
+        """Report a finished request and return its result (raising its error)"""
+        error = task.exception()
+        if on_result is not None:
+            on_result(names[task], error)
+        if error is not None:
+            raise error
+        return task.result()
+
+    try:
+        await asyncio.wait({primary_task, first_wait}, timeout=get_tracker(primary_name).threshold(),
+                           return_when=asyncio.FIRST_COMPLETED)
+        secondary = None
+        if not (primary_first.is_set() or primary_task.done()):
+            secondary = get_secondary()
+        if secondary is None:
+            await asyncio.wait({primary_task})
+            return finished(primary_task), primary_name
+
+        secondary_name, secondary_llm = secondary
+        hedge_stats["hedged"] += 1
+        print(f"--- Hedging: {primary_name} slow to respond, firing {secondary_name} "
+              f"(hedge rate {hedge_rate():.1%}) ---")
+        secondary_task = asyncio.create_task(_stream(secondary_llm, messages, secondary_name, asyncio.Event()))
+        tasks.append(secondary_task)
+        names[secondary_task] = secondary_name
+
+        pending = {primary_task, secondary_task}
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                try:
+                    result = finished(task)
+                except Exception as e:
+                    error = e
+                    continue
+                if task is secondary_task:
+                    hedge_stats["secondary_wins"] += 1
+                return result, names[task]
+        raise error
+    finally:
+        # Losers, and everything when the caller itself is cancelled
+        for task in tasks:
+            if not task.done():
+                await _cancel(task)
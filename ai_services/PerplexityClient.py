@@ -1,6 +1,7 @@
 import os
 from dotenv import load_dotenv
 from perplexity import Perplexity
+from ai_services.RateLimiter import rate_limited_call, estimate_tokens
 
 load_dotenv()
 
@@ -8,9 +9,12 @@ client = Perplexity(api_key=os.getenv("PERPLEXITY_API_KEY"))
 
 def call_perplexity_chat(prompt: str, model: str = "sonar-pro") -> str:
     try:
-        completion = client.chat.completions.create(
+        completion = rate_limited_call(
+            "perplexity",
+            client.chat.completions.create,
             model=model,
             messages=[{"role": "user", "content": prompt}],
+            estimated_tokens=estimate_tokens(prompt),
         )
         return completion.choices[0].message.content
     except Exception as e:
@@ -19,7 +23,7 @@ def call_perplexity_chat(prompt: str, model: str = "sonar-pro") -> str:
 
 def call_perplexity_search(query: str, max_results: int = 3):
     try:
-        search = client.search.create(query=query, max_results=max_results)
+        search = rate_limited_call("perplexity", client.search.create, query=query, max_results=max_results)
         return [{"title": r.title, "url": r.url} for r in search.results]
     except Exception as e:
         return {"error": f"Error (Perplexity Search): {str(e)}"}
@@ -0,0 +1,224 @@
+"""
+Client-side Rate Limiter
+Per-provider token buckets (requests/min and tokens/min) shared by every caller
+in the process. Calls queue in FIFO order, Retry-After hints are honoured and
+the allowed rate adapts (multiplicative decrease / additive increase) after 429s.
+
+Limits are read from the environment, e.g. GROQ_RPM=30, GROQ_TPM=12000.
+"""
+import os
+import re
+import time
+import asyncio
+import threading
+from typing import Callable, Dict, Optional
+
+# Conservative free-tier defaults: (requests/min, tokens/min)
+DEFAULT_LIMITS = {
+    "groq": (30, 12000),
+    "gemini": (10, 250000),
+    "perplexity": (50, 100000),
+}
+
+# Rough completion budget added to every estimate (providers count output tokens too)
+DEFAULT_COMPLETION_TOKENS = 256
+
+MIN_RATE_SCALE = 0.1
+RATE_INCREASE_STEP = 0.05
+
+
+def estimate_tokens(*texts: str) -> int:
+    """Cheap token estimate (~4 characters per token) plus a completion allowance"""
+    chars = sum(len(t) for t in texts if t)
+    return chars // 4 + DEFAULT_COMPLETION_TOKENS
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at `rate_per_min`"""
+
+    def __init__(self, rate_per_min: float):
+        self.capacity = float(rate_per_min)
+        self.rate = rate_per_min / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` tokens are available (0 if available now)"""
+        self._refill(now)
+        # A single request larger than the bucket can only ever wait for a full bucket
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float):
+        self.tokens -= min(amount, self.capacity)
+
+    def set_rate(self, rate_per_min: float):
+        self._refill(time.monotonic())
+        self.rate = rate_per_min / 60.0
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """Detect 429 / quota errors across the Groq, Gemini and Perplexity SDKs"""
+    status = getattr(error, "status_code", None) or getattr(error, "code", None)
+    response = getattr(error, "response", None)
+    if status is None and response is not None:
+        status = getattr(response, "status_code", None)
+    if status == 429:
+        return True
+    message = str(error)
+    return "429" in message or "RESOURCE_EXHAUSTED" in message or "rate limit" in message.lower()
+
+
+def parse_retry_after(error: Exception) -> Optional[float]:
+    """Extract a retry delay (seconds) from headers or the error message, if any"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000.0
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        pass
+
+    # Gemini: "retryDelay': '23s'", Groq: "Please try again in 7.66s"
+    match = re.search(r"retryDelay['\"]?\s*[:=]\s*['\"]?([\d.]+)s", str(error)) or \
+        re.search(r"try again in ([\d.]+)s", str(error))
+    if match:
+        return float(match.group(1))
+    return None
+
+
+class ProviderLimiter:
+    """Rate limiter for a single provider (thread-safe, FIFO fair)"""
+
+    def __init__(self, provider: str, rpm: float, tpm: float):
+        self.provider = provider
+        self.base_rpm = rpm
+        self.base_tpm = tpm
+        self.scale = 1.0
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.blocked_until = 0.0
+        self.consecutive_429s = 0
+
+        self._cond = threading.Condition()
+        self._next_ticket = 0
+        self._serving = 0
+
+        self.stats = {"calls": 0, "rate_limited": 0, "waited_seconds": 0.0}
+
+    def acquire(self, tokens: int = DEFAULT_COMPLETION_TOKENS):
+        """Block until a request of `tokens` may be sent. Callers are served in arrival order."""
+        start = time.monotonic()
+        with self._cond:
+            ticket = self._next_ticket
+            self._next_ticket += 1
+            while True:
+                now = time.monotonic()
+                if ticket == self._serving:
+                    wait = max(
+                        self.requests.wait_time(1, now),
+                        self.tokens.wait_time(tokens, now),
+                        self.blocked_until - now,
+                    )
+                    if wait <= 0:
+                        self.requests.consume(1)
+                        self.tokens.consume(tokens)
+                        self._serving += 1
+                        self.stats["calls"] += 1
+                        self.stats["waited_seconds"] += now - start
+                        self._cond.notify_all()
+                        return
+                    self._cond.wait(wait)
+                else:
+                    self._cond.wait()
+
+    async def acquire_async(self, tokens: int = DEFAULT_COMPLETION_TOKENS):
+        """Async variant of acquire() that does not block the event loop"""
+        await asyncio.to_thread(self.acquire, tokens)
+
+    def try_acquire(self, tokens: int = DEFAULT_COMPLETION_TOKENS) -> bool:
+        """Take budget only if it is available right now and nobody is queued"""
+        with self._cond:
+            now = time.monotonic()
+            if self._next_ticket != self._serving or now < self.blocked_until:
+                return False
+            if self.requests.wait_time(1, now) > 0 or self.tokens.wait_time(tokens, now) > 0:
+                return False
+            self.requests.consume(1)
+            self.tokens.consume(tokens)
+            self._next_ticket += 1
+            self._serving += 1
+            self.stats["calls"] += 1
+            return True
+
+    def _apply_scale(self):
+        self.requests.set_rate(self.base_rpm * self.scale)
+        self.tokens.set_rate(self.base_tpm * self.scale)
+
+    def record_success(self):
+        """Additive increase back towards the configured quota"""
+        with self._cond:
+            self.consecutive_429s = 0
+            if self.scale < 1.0:
+                self.scale = min(1.0, self.scale + RATE_INCREASE_STEP)
+                self._apply_scale()
+
+    def record_rate_limited(self, retry_after: Optional[float] = None):
+        """Multiplicative decrease and pause the queue until the provider allows traffic again"""
+        with self._cond:
+            self.consecutive_429s += 1
+            self.stats["rate_limited"] += 1
+            self.scale = max(MIN_RATE_SCALE, self.scale * 0.5)
+            self._apply_scale()
+            # Drain the buckets so the queue restarts at the reduced rate
+            self.requests.tokens = 0
+            self.tokens.tokens = 0
+            delay = retry_after if retry_after is not None else min(60.0, 2.0 ** self.consecutive_429s)
+            self.blocked_until = max(self.blocked_until, time.monotonic() + delay)
+            self._cond.notify_all()
+        print(f"--- RateLimiter[{self.provider}]: 429 received, backing off {delay:.1f}s "
+              f"(rate now {self.scale:.0%} of quota) ---")
+
+    def call(self, fn: Callable, *args, estimated_tokens: int = DEFAULT_COMPLETION_TOKENS,
+             max_retries: int = 3, **kwargs):
+        """Run fn(*args, **kwargs) under the limiter, retrying on 429s"""
+        for attempt in range(max_retries + 1):
+            self.acquire(estimated_tokens)
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                if is_rate_limit_error(e) and attempt < max_retries:
+                    self.record_rate_limited(parse_retry_after(e))
+                    continue
+                raise
+            self.record_success()
+            return result
+
+
+_limiters: Dict[str, ProviderLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(provider: str) -> ProviderLimiter:
+    """Get or create the process-wide limiter for a provider"""
+    provider = provider.lower()
+    with _limiters_lock:
+        if provider not in _limiters:
+            rpm, tpm = DEFAULT_LIMITS.get(provider, (60, 100000))
+            rpm = float(os.getenv(f"{provider.upper()}_RPM", rpm))
+            tpm = float(os.getenv(f"{provider.upper()}_TPM", tpm))
+            _limiters[provider] = ProviderLimiter(provider, rpm, tpm)
+        return _limiters[provider]
+
+
+def rate_limited_call(provider: str, fn: Callable, *args, estimated_tokens: int = DEFAULT_COMPLETION_TOKENS, **kwargs):
+    """Convenience wrapper: get_limiter(provider).call(...)"""
+    return get_limiter(provider).call(fn, *args, estimated_tokens=estimated_tokens, **kwargs)
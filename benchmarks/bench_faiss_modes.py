@@ -0,0 +1,102 @@
+"""
+FAISS index modes: recall vs latency for flat, HNSW and IVF-PQ.
+
+Each mode indexes the same vectors; HNSW is swept over efSearch and IVF-PQ over
+nprobe so the recall/latency trade-off is visible. Recall@k is measured against
+exact brute-force cosine search.
+
+    python benchmarks/bench_faiss_modes.py --synthetic 200000 --dim 384
+    python benchmarks/bench_faiss_modes.py --corpus knowledge_base
+"""
+import sys
+import time
+import random
+import argparse
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from bench_vector_index import exact_neighbours, load_corpus, percentile, synthetic_corpus, ADD_BATCH
+from rag_services.vector_index import FaissVectorIndex
+
+EF_SEARCH_SWEEP = (16, 32, 64, 128, 256)
+NPROBE_SWEEP = (1, 4, 16, 64)
+
+
+def build(kind, documents, vectors, workdir):
+    ids = [str(i) for i in range(len(documents))]
+    index = FaissVectorIndex(f"{workdir}/{kind}", embeddings=None, index_type=kind)
+    start = time.perf_counter()
+    for i in range(0, len(documents), ADD_BATCH):
+        index.add(documents[i:i + ADD_BATCH], ids[i:i + ADD_BATCH], vectors[i:i + ADD_BATCH])
+    index.wait_for_build()
+    return index, time.perf_counter() - start
+
+
+def measure(index, query_vectors, truth, k):
+    latencies, hits = [], 0
+    for query_vector, expected in zip(query_vectors, truth):
+        start = time.perf_counter()
+        results = index.search_by_vector(query_vector, k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += len({int(doc.id) for doc, _ in results} & set(expected.tolist()))
+    return percentile(latencies, 50), percentile(latencies, 95), hits / (len(truth) * k)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default="knowledge_base", help="PDF/TXT file or directory")
+    parser.add_argument("--provider", default=None, help="Embedding provider (default: EMBEDDING_PROVIDER)")
+    parser.add_argument("--synthetic", type=int, default=0, help="Use N random vectors instead of a corpus")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--modes", default="flat,hnsw,ivfpq")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        documents, vectors, query_vectors = synthetic_corpus(args.synthetic, args.dim, args.queries, args.seed)
+    else:
+        from rag_services.embeddings import get_embeddings
+
+        documents = load_corpus(args.corpus)
+        if not documents:
+            sys.exit(f"No chunks found in {args.corpus}")
+        embeddings = get_embeddings(args.provider)
+        vectors = np.asarray(embeddings.embed_documents([d.page_content for d in documents]), dtype=np.float32)
+        rng = random.Random(args.seed)
+        sample = [rng.choice(documents).page_content.split(". ")[0][:200] for _ in range(args.queries)]
+        query_vectors = np.asarray([embeddings.embed_query(q) for q in sample], dtype=np.float32)
+
+    k = min(args.k, len(documents))
+    truth = exact_neighbours(vectors, query_vectors, k)
+    print(f"Corpus: {len(documents)} vectors, dim {vectors.shape[1]}, {len(query_vectors)} queries, k={k}\n")
+
+    header = f"{'mode':<6} {'param':<14} {'build s':>8} {'p50 ms':>8} {'p95 ms':>8} {f'recall@{k}':>10} {'index MB':>9}"
+    print(header)
+    print("-" * len(header))
+    with tempfile.TemporaryDirectory(prefix="bench_faiss_modes_") as workdir:
+        for kind in [m.strip() for m in args.modes.split(",") if m.strip()]:
+            index, build_seconds = build(kind, documents, vectors, workdir)
+            if index.active_type != kind:
+                print(f"{kind:<6} build failed (too few vectors to train?)")
+                continue
+            sweep = {"hnsw": [("efSearch", v) for v in EF_SEARCH_SWEEP],
+                     "ivfpq": [("nprobe", v) for v in NPROBE_SWEEP]}.get(kind, [("exact", None)])
+            for name, value in sweep:
+                if name == "efSearch":
+                    index.set_search_params(ef_search=value)
+                elif name == "nprobe":
+                    index.set_search_params(nprobe=value)
+                p50, p95, recall = measure(index, query_vectors, truth, k)
+                param = name if value is None else f"{name}={value}"
+                print(f"{kind:<6} {param:<14} {build_seconds:>8.2f} {p50:>8.3f} {p95:>8.3f} {recall:>10.3f} "
+                      f"{index.stats()['index_bytes'] / 1e6:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
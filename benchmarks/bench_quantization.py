@@ -0,0 +1,109 @@
+"""
+FAISS quantization: memory vs recall for float32, int8 (sq8) and binary codes.
+
+Each index mode is built with every quantization setting over the same vectors.
+Recall@k is measured against exact brute-force cosine search twice: from the
+compressed first pass alone and after the exact float re-scoring of the short
+list. Memory columns are the bytes the search scans (index or codes), the float
+vectors kept on disk for re-scoring, and the growth of this process's RSS.
+
+    python benchmarks/bench_quantization.py --synthetic 200000 --dim 384
+    python benchmarks/bench_quantization.py --corpus knowledge_base --modes flat
+"""
+import gc
+import sys
+import time
+import random
+import argparse
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from bench_vector_index import exact_neighbours, load_corpus, rss_bytes, synthetic_corpus, ADD_BATCH
+from bench_faiss_modes import measure
+from rag_services.vector_index import FaissVectorIndex
+
+QUANTIZATIONS = ("none", "sq8", "binary")
+
+
+def build(kind, quantization, documents, vectors, workdir):
+    ids = [str(i) for i in range(len(documents))]
+    directory = f"{workdir}/{kind}-{quantization}"
+    index = FaissVectorIndex(directory, embeddings=None, index_type=kind, quantization=quantization)
+    start = time.perf_counter()
+    for i in range(0, len(documents), ADD_BATCH):
+        index.add(documents[i:i + ADD_BATCH], ids[i:i + ADD_BATCH], vectors[i:i + ADD_BATCH])
+    index.wait_for_build()
+    index.persist()
+    build_seconds = time.perf_counter() - start
+    index.close()
+    # Reopen so searches run from the mapped files, as they do after a restart
+    gc.collect()
+    rss_before = rss_bytes()
+    index = FaissVectorIndex(directory, embeddings=None, index_type=kind, quantization=quantization)
+    index.warm()
+    return index, build_seconds, rss_before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default="knowledge_base", help="PDF/TXT file or directory")
+    parser.add_argument("--provider", default=None, help="Embedding provider (default: EMBEDDING_PROVIDER)")
+    parser.add_argument("--synthetic", type=int, default=0, help="Use N random vectors instead of a corpus")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--modes", default="flat,hnsw")
+    parser.add_argument("--quantizations", default=",".join(QUANTIZATIONS))
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        documents, vectors, query_vectors = synthetic_corpus(args.synthetic, args.dim, args.queries, args.seed)
+    else:
+        from rag_services.embeddings import get_embeddings
+
+        documents = load_corpus(args.corpus)
+        if not documents:
+            sys.exit(f"No chunks found in {args.corpus}")
+        embeddings = get_embeddings(args.provider)
+        vectors = np.asarray(embeddings.embed_documents([d.page_content for d in documents]), dtype=np.float32)
+        rng = random.Random(args.seed)
+        sample = [rng.choice(documents).page_content.split(". ")[0][:200] for _ in range(args.queries)]
+        query_vectors = np.asarray([embeddings.embed_query(q) for q in sample], dtype=np.float32)
+
+    k = min(args.k, len(documents))
+    truth = exact_neighbours(vectors, query_vectors, k)
+    print(f"Corpus: {len(documents)} vectors, dim {vectors.shape[1]}, {len(query_vectors)} queries, k={k}\n")
+
+    header = (f"{'mode':<6} {'quant':<7} {'rescore':>7} {'build s':>8} {'p50 ms':>8} {'p95 ms':>8} "
+              f"{'1st pass':>9} {f'recall@{k}':>10} {'scan MB':>8} {'float MB':>9} {'disk MB':>8} {'RSS MB':>7}")
+    print(header)
+    print("-" * len(header))
+    with tempfile.TemporaryDirectory(prefix="bench_quantization_") as workdir:
+        for kind in [m.strip() for m in args.modes.split(",") if m.strip()]:
+            for quantization in [q.strip() for q in args.quantizations.split(",") if q.strip()]:
+                index, build_seconds, rss_before = build(kind, quantization, documents, vectors, workdir)
+                if index.active_type != kind:
+                    print(f"{kind:<6} {quantization:<7} build failed (too few vectors to train?)")
+                    index.close()
+                    continue
+                rescore_factor = index.rescore_factor
+                index.set_search_params(rescore_factor=0)
+                _, _, first_pass = measure(index, query_vectors, truth, k)
+                index.set_search_params(rescore_factor=rescore_factor)
+                p50, p95, recall = measure(index, query_vectors, truth, k)
+                stats = index.stats()
+                rss_mb = (rss_bytes() - rss_before) / 1e6
+                print(f"{kind:<6} {quantization:<7} {stats['rescore_factor'] or '-':>7} {build_seconds:>8.2f} "
+                      f"{p50:>8.3f} {p95:>8.3f} {first_pass:>9.3f} {recall:>10.3f} "
+                      f"{stats['index_bytes'] / 1e6:>8.1f} {stats['vector_bytes'] / 1e6:>9.1f} "
+                      f"{stats['disk_bytes'] / 1e6:>8.1f} {rss_mb:>7.1f}")
+                index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""
+Offline retrieval benchmark: quality and speed of the RAG stack on a fixed labelled query set.
+
+Chunks knowledge_base/ and NoteBookLMProject/data with the ingestion chunker,
+embeds them once with local embeddings, and runs benchmarks/retrieval_queries.json
+against every configuration (vector search per backend, plus vector + BM25
+hybrid). A retrieved chunk is relevant when it comes from the query's source
+file and contains one of its answer phrases, so labels survive chunking changes.
+
+Reports recall@k, MRR, index build time, query p50/p95 and index memory, and
+compares against a JSON baseline so a chunking or index change can be judged:
+
+    python benchmarks/bench_retrieval.py --save-baseline benchmarks/retrieval_baseline.json
+    python benchmarks/bench_retrieval.py --baseline benchmarks/retrieval_baseline.json   # exit 1 on regression
+    python benchmarks/bench_retrieval.py --chunk-size 600 --overlap 80 --baseline benchmarks/retrieval_baseline.json
+"""
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from bench_vector_index import ADD_BATCH, load_corpus, percentile, rss_bytes
+from rag_services.bm25 import BM25Index, hybrid_search
+from rag_services.vector_index import BACKENDS, open_vector_index
+
+ROOT = Path(__file__).parent.parent
+DEFAULT_CORPUS = [str(ROOT / "knowledge_base"), str(ROOT / "NoteBookLMProject" / "data")]
+DEFAULT_QUERIES = str(Path(__file__).parent / "retrieval_queries.json")
+# Latency is machine-dependent, so only quality metrics fail the comparison
+QUALITY_METRICS = ("recall", "mrr")
+
+
+def normalize_text(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def label_queries(queries, documents):
+    """Attach the ids of relevant chunks (same source, contains an answer phrase) to each query"""
+    texts = [normalize_text(doc.page_content) for doc in documents]
+    labelled = []
+    for query in queries:
+        answers = [normalize_text(a) for a in query["answers"]]
+        relevant = {
+            str(i) for i, doc in enumerate(documents)
+            if os.path.basename(doc.metadata.get("source", "")) == query["source"]
+            and any(answer in texts[i] for answer in answers)
+        }
+        if relevant:
+            labelled.append({**query, "relevant": relevant})
+        else:
+            print(f"Skipping query '{query['id']}': no chunk of {query['source']} contains its answer")
+    return labelled
+
+
+def score_results(result_ids, relevant, k):
+    """(recall@k, reciprocal rank) for one query"""
+    top = result_ids[:k]
+    recall = len(relevant.intersection(top)) / len(relevant)
+    rank = next((i for i, doc_id in enumerate(top, start=1) if doc_id in relevant), None)
+    return recall, (1.0 / rank if rank else 0.0)
+
+
+def build_index(backend, documents, vectors, workdir):
+    ids = [str(i) for i in range(len(documents))]
+    rss_before = rss_bytes()
+    start = time.perf_counter()
+    index = open_vector_index(backend, embeddings=None, persist_directory=os.path.join(workdir, backend),
+                              collection_name="bench_retrieval")
+    for i in range(0, len(documents), ADD_BATCH):
+        index.add(documents[i:i + ADD_BATCH], ids[i:i + ADD_BATCH], vectors[i:i + ADD_BATCH])
+    if hasattr(index, "wait_for_build"):
+        index.wait_for_build()
+    index.persist()
+    build_seconds = time.perf_counter() - start
+    index.warm()
+    return index, build_seconds, rss_bytes() - rss_before
+
+
+def run_queries(search, labelled, query_vectors, k):
+    latencies, recalls, reciprocal_ranks = [], [], []
+    for query in labelled:
+        start = time.perf_counter()
+        result_ids = search(query, query_vectors[query["id"]])
+        latencies.append((time.perf_counter() - start) * 1000)
+        recall, rr = score_results(result_ids, query["relevant"], k)
+        recalls.append(recall)
+        reciprocal_ranks.append(rr)
+    return {
+        "recall": float(np.mean(recalls)),
+        "mrr": float(np.mean(reciprocal_ranks)),
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+    }
+
+
+def evaluate(backends, documents, vectors, labelled, query_vectors, k, hybrid):
+    keyword_index = None
+    if hybrid:
+        keyword_index = BM25Index()
+        keyword_index.add([str(i) for i in range(len(documents))], [d.page_content for d in documents])
+
+    results = {}
+    workdir = tempfile.mkdtemp(prefix="bench_retrieval_")
+    try:
+        for backend in backends:
+            try:
+                index, build_seconds, rss_delta = build_index(backend, documents, vectors, workdir)
+            except ImportError as e:
+                print(f"Skipping {backend}: {e}")
+                continue
+            stats = index.stats()
+            common = {"build_s": build_seconds, "rss_mb": rss_delta / 1e6, "disk_mb": stats.get("disk_bytes", 0) / 1e6}
+
+            def vector_ids(query, vector):
+                return [doc.id for doc, _ in index.search_by_vector(vector, k)]
+
+            results[backend] = {**run_queries(vector_ids, labelled, query_vectors, k), **common}
+            if keyword_index is not None:
+                # Keyword hits are read from the index under test, as in the retriever
+                keyword_index.lookup = index.get_documents
+
+                def hybrid_ids(query, vector):
+                    docs = hybrid_search(
+                        lambda q, n: [doc for doc, _ in index.search_by_vector(vector, n)],
+                        keyword_index, query["query"], k=k
+                    )
+                    return [doc.id for doc in docs]
+
+                results[f"{backend}+bm25"] = {**run_queries(hybrid_ids, labelled, query_vectors, k), **common}
+            index.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Print deltas against a baseline; returns the names of regressed configurations"""
+    regressed = []
+    print(f"\nAgainst baseline ({baseline.get('created', 'unknown date')}, {baseline.get('chunks')} chunks):")
+    for name, row in results.items():
+        base = baseline["results"].get(name)
+        if base is None:
+            print(f"  {name:<14} (not in baseline)")
+            continue
+        deltas = [f"{metric} {row[metric] - base[metric]:+.3f}" for metric in QUALITY_METRICS]
+        deltas.append(f"p95 {row['p95_ms'] - base['p95_ms']:+.2f} ms")
+        worse = [metric for metric in QUALITY_METRICS if row[metric] < base[metric] - tolerance]
+        if worse:
+            regressed.append(name)
+        print(f"  {name:<14} {'  '.join(deltas)}{'  REGRESSION' if worse else ''}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", nargs="+", default=DEFAULT_CORPUS, help="PDF/TXT files or directories")
+    parser.add_argument("--queries", default=DEFAULT_QUERIES, help="Labelled query set (JSON)")
+    parser.add_argument("--provider", default="local", help="Embedding provider (default: local model)")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--overlap", type=int, default=100)
+    parser.add_argument("--backends", default=",".join(BACKENDS))
+    parser.add_argument("--no-hybrid", action="store_true", help="Skip the vector + BM25 configurations")
+    parser.add_argument("--baseline", help="Compare against this baseline JSON (exit 1 if recall/MRR regress)")
+    parser.add_argument("--tolerance", type=float, default=0.02, help="Allowed recall/MRR drop vs the baseline")
+    parser.add_argument("--save-baseline", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    documents = [doc for path in args.corpus if os.path.exists(path)
+                 for doc in load_corpus(path, args.chunk_size, args.overlap)]
+    if not documents:
+        sys.exit(f"No chunks found in {args.corpus}")
+    with open(args.queries, "r", encoding="utf-8") as f:
+        queries = json.load(f)
+    labelled = label_queries(queries, documents)
+    if not labelled:
+        sys.exit("No query has a relevant chunk in the corpus")
+
+    if args.provider == "local":
+        # Uncached model, so the embedding time is real on every run
+        from rag_services.embeddings import LocalEmbeddings
+        embeddings = LocalEmbeddings()
+    else:
+        from rag_services.embeddings import get_embeddings
+        embeddings = get_embeddings(args.provider)
+    start = time.perf_counter()
+    vectors = np.asarray(embeddings.embed_documents([d.page_content for d in documents]), dtype=np.float32)
+    embed_seconds = time.perf_counter() - start
+    query_latencies, query_vectors = [], {}
+    for query in labelled:
+        start = time.perf_counter()
+        query_vectors[query["id"]] = embeddings.embed_query(query["query"])
+        query_latencies.append((time.perf_counter() - start) * 1000)
+
+    k = min(args.k, len(documents))
+    print(f"Corpus: {len(documents)} chunks (size {args.chunk_size}, overlap {args.overlap}), "
+          f"{len(labelled)} labelled queries, k={k}")
+    print(f"Embedding: {embed_seconds:.1f}s for chunks, query p50 {percentile(query_latencies, 50):.1f} ms "
+          f"(not included in the search latencies below)\n")
+
+    backends = [b.strip() for b in args.backends.split(",") if b.strip()]
+    results = evaluate(backends, documents, vectors, labelled, query_vectors, k, not args.no_hybrid)
+
+    header = (f"{'config':<14} {f'recall@{k}':>9} {'MRR':>6} {'build s':>8} {'p50 ms':>7} {'p95 ms':>7} "
+              f"{'RSS MB':>7} {'disk MB':>8}")
+    print(header)
+    print("-" * len(header))
+    for name, row in results.items():
+        print(f"{name:<14} {row['recall']:>9.3f} {row['mrr']:>6.3f} {row['build_s']:>8.2f} {row['p50_ms']:>7.2f} "
+              f"{row['p95_ms']:>7.2f} {row['rss_mb']:>7.1f} {row['disk_mb']:>8.1f}")
+
+    report = {
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "machine": platform.platform(),
+        "provider": args.provider,
+        "chunk_size": args.chunk_size,
+        "overlap": args.overlap,
+        "chunks": len(documents),
+        "queries": len(labelled),
+        "k": k,
+        "embed_s": embed_seconds,
+        "results": results,
+    }
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved baseline to {args.save_baseline}")
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("k") != k:
+            print(f"\nBaseline was measured at k={baseline.get('k')}; recall is not comparable")
+        elif compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
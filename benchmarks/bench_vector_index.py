@@ -0,0 +1,169 @@
+"""
+Vector index benchmark: build time, query latency, memory and recall per backend.
+
+Every backend indexes the same chunks with the same precomputed vectors, so the
+numbers only reflect the index itself. Recall@k is measured against exact
+brute-force cosine search.
+
+    python benchmarks/bench_vector_index.py                      # knowledge_base/ with local embeddings
+    python benchmarks/bench_vector_index.py --corpus notes.pdf --queries 200
+    python benchmarks/bench_vector_index.py --synthetic 100000 --dim 384   # no model needed
+"""
+import os
+import sys
+import time
+import random
+import shutil
+import argparse
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from langchain_core.documents import Document
+from rag_services.chunking import iter_chunks, iter_file_pages
+from rag_services.vector_index import BACKENDS, open_vector_index
+
+ADD_BATCH = 256
+
+
+def rss_bytes() -> int:
+    """Current resident set size of this process"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def load_corpus(path: str, chunk_size: int = 1000, overlap: int = 100):
+    files = [path] if os.path.isfile(path) else [
+        str(p) for p in sorted(Path(path).rglob("*")) if p.suffix.lower() in (".pdf", ".txt")
+    ]
+    documents = []
+    for file_path in files:
+        for text, metadata in iter_chunks(iter_file_pages(file_path), chunk_size=chunk_size, overlap=overlap):
+            documents.append(Document(page_content=text, metadata={"source": os.path.basename(file_path), **metadata}))
+    return documents
+
+
+def synthetic_corpus(count: int, dim: int, queries: int, seed: int):
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((count, dim)).astype(np.float32)
+    documents = [Document(page_content=f"synthetic chunk {i}", metadata={"source": "synthetic"}) for i in range(count)]
+    # Queries are perturbed corpus vectors so nearest neighbours are meaningful
+    picks = rng.choice(count, size=queries, replace=count < queries)
+    query_vectors = vectors[picks] + 0.1 * rng.standard_normal((queries, dim)).astype(np.float32)
+    return documents, vectors, query_vectors
+
+
+def exact_neighbours(vectors: np.ndarray, query_vectors: np.ndarray, k: int):
+    def unit(m):
+        return m / np.maximum(np.linalg.norm(m, axis=1, keepdims=True), 1e-12)
+    scores = unit(query_vectors) @ unit(vectors).T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def percentile(values, p):
+    return float(np.percentile(values, p)) if values else 0.0
+
+
+def bench_backend(backend, documents, vectors, query_vectors, truth, k, workdir):
+    ids = [str(i) for i in range(len(documents))]
+    directory = os.path.join(workdir, backend)
+    rss_before = rss_bytes()
+
+    start = time.perf_counter()
+    index = open_vector_index(backend, embeddings=None, persist_directory=directory, collection_name="bench")
+    for i in range(0, len(documents), ADD_BATCH):
+        index.add(documents[i:i + ADD_BATCH], ids[i:i + ADD_BATCH], vectors[i:i + ADD_BATCH])
+    if hasattr(index, "wait_for_build"):
+        index.wait_for_build()  # include background HNSW/IVF builds in the build time
+    index.persist()
+    build_seconds = time.perf_counter() - start
+    rss_after = rss_bytes()
+
+    index.warm()
+    latencies, hits = [], 0
+    for query_vector, expected in zip(query_vectors, truth):
+        start = time.perf_counter()
+        results = index.search_by_vector(query_vector, k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        found = {int(doc.id) for doc, _ in results}
+        hits += len(found & set(expected.tolist()))
+
+    stats = index.stats()
+    index.close()
+    return {
+        "backend": backend,
+        "build_s": build_seconds,
+        "docs_per_s": len(documents) / build_seconds if build_seconds else 0.0,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "recall": hits / (len(truth) * k) if len(truth) else 0.0,
+        "rss_mb": (rss_after - rss_before) / 1e6,
+        "disk_mb": stats.get("disk_bytes", 0) / 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default="knowledge_base", help="PDF/TXT file or directory")
+    parser.add_argument("--provider", default=None, help="Embedding provider (default: EMBEDDING_PROVIDER)")
+    parser.add_argument("--synthetic", type=int, default=0, help="Use N random vectors instead of a corpus")
+    parser.add_argument("--dim", type=int, default=384, help="Dimension of synthetic vectors")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--backends", default=",".join(BACKENDS))
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        documents, vectors, query_vectors = synthetic_corpus(args.synthetic, args.dim, args.queries, args.seed)
+    else:
+        from rag_services.embeddings import get_embeddings
+
+        documents = load_corpus(args.corpus)
+        if not documents:
+            sys.exit(f"No chunks found in {args.corpus}")
+        embeddings = get_embeddings(args.provider)
+        print(f"Embedding {len(documents)} chunks...")
+        vectors = np.asarray(embeddings.embed_documents([d.page_content for d in documents]), dtype=np.float32)
+        # Queries: the first sentence of randomly sampled chunks
+        rng = random.Random(args.seed)
+        sample = [rng.choice(documents).page_content.split(". ")[0][:200] for _ in range(args.queries)]
+        query_vectors = np.asarray([embeddings.embed_query(q) for q in sample], dtype=np.float32)
+
+    k = min(args.k, len(documents))
+    truth = exact_neighbours(vectors, query_vectors, k)
+    print(f"Corpus: {len(documents)} chunks, dim {vectors.shape[1]}, {len(query_vectors)} queries, k={k}\n")
+
+    workdir = tempfile.mkdtemp(prefix="bench_vector_index_")
+    try:
+        rows = []
+        for backend in [b.strip() for b in args.backends.split(",") if b.strip()]:
+            try:
+                rows.append(bench_backend(backend, documents, vectors, query_vectors, truth, k, workdir))
+            except ImportError as e:
+                print(f"Skipping {backend}: {e}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    header = f"{'backend':<8} {'build s':>8} {'docs/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'recall':>7} {'RSS MB':>8} {'disk MB':>8}"
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        print(f"{row['backend']:<8} {row['build_s']:>8.2f} {row['docs_per_s']:>9.0f} {row['p50_ms']:>8.2f} "
+              f"{row['p95_ms']:>8.2f} {row['recall']:>7.3f} {row['rss_mb']:>8.1f} {row['disk_mb']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
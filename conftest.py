@@ -0,0 +1,90 @@
+"""
+Shared pytest fixtures for the offline unit tests (test_phase*.py are run as scripts).
+"""
+import hashlib
+
+import numpy as np
+import pytest
+from langchain_core.embeddings import Embeddings
+
+HASH_DIM = 64
+
+
+class HashEmbeddings(Embeddings):
+    """Deterministic bag-of-words embeddings: each word adds 1 to a hashed dimension"""
+
+    def __init__(self, dim: int = HASH_DIM):
+        self.dim = dim
+        self.calls = 0
+
+    def _embed(self, text: str):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for word in text.lower().split():
+            vector[int(hashlib.md5(word.encode()).hexdigest(), 16) % self.dim] += 1
+        return vector.tolist()
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        self.calls += 1
+        return self._embed(text)
+
+
+@pytest.fixture
+def hash_embeddings():
+    return HashEmbeddings()
+
+
+@pytest.fixture
+def kb_env(tmp_path, monkeypatch):
+    """
+    Run in tmp_path (knowledge_base/, faiss_kb/ and the caches resolve there) with the FAISS
+    backend and HashEmbeddings as the "local" provider. Returns the knowledge_base directory.
+    """
+    import ingestion
+    from rag_services import config, embeddings
+    from rag_services.embedding_cache import CachedEmbeddings, QueryEmbeddingCache
+
+    monkeypatch.chdir(tmp_path)
+    knowledge_base = tmp_path / ingestion.KNOWLEDGE_BASE_DIR
+    knowledge_base.mkdir()
+    for module in (config, embeddings, ingestion):
+        monkeypatch.setattr(module, "KB_INDEX_BACKEND", "faiss")
+    monkeypatch.setattr(embeddings, "EMBEDDING_PROVIDER", "local")
+    # Extraction runs in worker processes; one is enough for a handful of small files
+    monkeypatch.setattr(ingestion, "INGEST_WORKERS", 1)
+    model = CachedEmbeddings(HashEmbeddings(), model_name="test/hash",
+                             cache=QueryEmbeddingCache(str(tmp_path / "query_cache")), symmetric=True)
+    monkeypatch.setitem(embeddings._embeddings, "local", model)
+    return knowledge_base
+
+
+@pytest.fixture
+def make_pdf(tmp_path):
+    """make_pdf(name, pages) writes a PDF with one page per string ("" for a blank page) and returns its path"""
+    import pymupdf
+
+    def make(name, pages):
+        document = pymupdf.open()
+        for text in pages:
+            page = document.new_page()
+            for line_number, line in enumerate(text.splitlines()):
+                page.insert_text((72, 72 + 14 * line_number), line)
+        path = tmp_path / name
+        document.save(str(path))
+        document.close()
+        return str(path)
+
+    return make
+
+
+@pytest.fixture
+def pdf_cache(tmp_path, monkeypatch):
+    """Fresh extracted-text cache under tmp_path instead of ./pdf_cache"""
+    from rag_services import pdf_extract
+
+    cache = pdf_extract.PdfTextCache(str(tmp_path / "pdf_cache"))
+    monkeypatch.setattr(pdf_extract, "_cache", cache)
+    return cache
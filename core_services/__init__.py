@@ -1,7 +1,8 @@
 # Core Services - Business logic layer
 from .ppt_service import generate_ppt
 from .quiz_service import generate_quiz_from_pdf, generate_flashcards_from_pdf
-from .notebook_service import process_notebook_document, ask_question_about_document
+from .notebook_service import (process_notebook_document, ask_question_about_document,
+                               list_notebook_documents, remove_notebook_document)
 from .chat_service import chat_with_ai, stream_chat
 
 __all__ = [
@@ -10,6 +11,8 @@ __all__ = [
     'generate_flashcards_from_pdf',
     'process_notebook_document',
     'ask_question_about_document',
+    'list_notebook_documents',
+    'remove_notebook_document',
     'chat_with_ai',
     'stream_chat'
 ]
@@ -34,7 +34,7 @@ def chat_with_ai(message: str, use_document: bool = False, model_provider: str =
             
             # Search for relevant context
             try:
-                docs = processor.vector_store.similarity_search(message, k=5)
+                docs = processor.search(message, k=4)
                 vector_results = [doc.page_content for doc in docs if doc.page_content.strip()]
                 
                 if vector_results:
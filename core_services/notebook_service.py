@@ -8,6 +8,14 @@ sys.path.insert(0, str(current_dir / "NoteBookLMProject"))
 from document_processor import DocumentProcessor
 from podcast_generator import PodcastGenerator
 from ai_services.GroqClient import generate_completion
+from rag_services.reranker import get_reranker
+from rag_services.context_packing import pack_context
+
+# Q&A retrieval: candidates fetched from the index, chunks kept after reranking,
+# passages left after merging overlaps and MMR
+RERANK_CANDIDATES = 20
+RERANK_TOP_N = 6
+CONTEXT_PASSAGES = 3
 
 # Global processor and generator (singleton pattern)
 _processor = None
@@ -28,14 +36,14 @@ def get_podcast_generator():
         _podcast_gen = PodcastGenerator()
     return _podcast_gen
 
-def process_notebook_document(file_path: str, model_provider: str = "groq") -> dict:
+def process_notebook_document(file_path: str, model_provider: str = "groq", user_id: str = None) -> dict:
     """Process PDF document for NotebookLM-style Q&A and audio generation"""
     try:
         processor = get_processor()
         podcast_gen = get_podcast_generator()
         
         # Process document
-        result = processor.process_document(file_path)
+        result = processor.process_document(file_path, user_id=user_id)
         
         if "Error" in result:
             raise Exception(result)
@@ -46,7 +54,7 @@ def process_notebook_document(file_path: str, model_provider: str = "groq") -> d
         
         # Generate podcast/audio summary
         if processor.vector_store:
-            docs = processor.vector_store.similarity_search("key concepts and main topics", k=7)
+            docs = processor.overview_context(k=7)
             context = "\n".join([d.page_content[:300] for d in docs])
             
             # Generate unique filenames
@@ -76,26 +84,45 @@ def process_notebook_document(file_path: str, model_provider: str = "groq") -> d
     except Exception as e:
         raise Exception(f"NotebookLM processing error: {str(e)}")
 
-def ask_question_about_document(question: str, model_provider: str = "groq") -> dict:
-    """Ask question about uploaded document"""
+def list_notebook_documents() -> dict:
+    """List the documents currently in the notebook"""
+    processor = get_processor()
+    return {"success": True, "documents": processor.list_documents()}
+
+def remove_notebook_document(doc_id: str) -> dict:
+    """Remove a document (by doc_id from list_notebook_documents) from the notebook"""
+    try:
+        result = get_processor().remove_document(doc_id)
+        if result.startswith("Unknown"):
+            raise Exception(result)
+        return {"success": True, "message": result}
+    except Exception as e:
+        raise Exception(f"NotebookLM remove error: {str(e)}")
+
+def ask_question_about_document(question: str, model_provider: str = "groq", filters: dict = None) -> dict:
+    """
+    Ask question about uploaded document.
+    `filters` scope retrieval, e.g. {"source": "notes.pdf", "page_start": 10, "page_end": 20} (see rag_services.filters)
+    """
     try:
         processor = get_processor()
         
         # Ensure vector store is loaded
-        if not processor.vector_store:
+        if processor.vector_store is None:
             processor.load_vector_store()
         
-        if not processor.vector_store:
-            raise Exception("No document uploaded. Please upload a PDF first.")
-        
-        # Check if vector store has content
-        test_docs = processor.vector_store.similarity_search("test", k=1)
-        if not test_docs or (len(test_docs) == 1 and test_docs[0].page_content.strip() == ""):
+        # Chunk count from the index itself (no probe query to embed and search)
+        if processor.vector_store is None or len(processor.vector_store) == 0:
             raise Exception("No document uploaded. Please upload a PDF first.")
         
-        # Search relevant documents
-        docs = processor.vector_store.similarity_search(question, k=5)
-        context = "\n".join([d.page_content for d in docs])
+        # Over-retrieve (vector + keyword), then keep only the best few by cross-encoder score
+        candidates = processor.search(question, k=RERANK_CANDIDATES, filters=filters)
+        reranked = get_reranker().rerank(question, candidates, top_n=RERANK_TOP_N)
+        # Merge overlapping neighbours and drop near-duplicates so the prompt carries more distinct text;
+        # the store is pinned so a concurrent upload can't close it mid-read
+        with processor.reading() as live:
+            docs = pack_context(question, reranked, k=CONTEXT_PASSAGES, index=live.store)
+        context = "\n\n".join([d.page_content for d in docs])
         
         # Generate answer using selected model
         prompt = f"""Answer based on the provided context.
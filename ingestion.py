@@ -1,85 +1,318 @@
 import os
-import asyncio
+import time
 import glob
-from pypdf import PdfReader
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_chroma import Chroma
+import queue
+import threading
+from multiprocessing import Manager
+from concurrent.futures import ProcessPoolExecutor
 from langchain_core.documents import Document
 from dotenv import load_dotenv
+from rag_services.config import (KB_INDEX_BACKEND, EMBEDDING_BATCH_SIZE, INGEST_WORKERS, EMBED_CONCURRENCY,
+                                 INGEST_QUEUE_SIZE)
+from rag_services.embeddings import kb_collection_name, kb_files
+from rag_services.vector_index import open_kb_index
+from rag_services.manifest import IngestManifest, chunk_ids_for
+from rag_services.index_version import kb_versions
+from rag_services.chunking import iter_chunks, iter_file_pages
+from rag_services.bm25 import BM25Index
+from rag_services.retriever import retriever
 
 load_dotenv()
 
 KNOWLEDGE_BASE_DIR = "knowledge_base"
-CHROMA_PATH = "./chroma_db"
-
-def ingest_documents():
-    print(f"--- Starting Ingestion (ChromaDB) from '{KNOWLEDGE_BASE_DIR}' ---")
-    
-    if not os.path.exists(KNOWLEDGE_BASE_DIR):
-        os.makedirs(KNOWLEDGE_BASE_DIR)
-        print(f"Created directory: {KNOWLEDGE_BASE_DIR}")
-        return
+SUPPORTED_EXTENSIONS = (".pdf", ".txt")
 
-    # Initialize Embeddings
-    embeddings_model = GoogleGenerativeAIEmbeddings(
-        model="models/embedding-001", 
-        google_api_key=os.getenv("GEMINI_API_KEY")
-    )
-    
-    # Initialize Chroma
-    vector_store = Chroma(
-        collection_name="knowledge_base",
-        embedding_function=embeddings_model,
-        persist_directory=CHROMA_PATH
-    )
-
-    files = glob.glob(os.path.join(KNOWLEDGE_BASE_DIR, "*.*"))
-    print(f"Found {len(files)} files.")
-
-    documents_to_add = []
-
-    for file_path in files:
-        filename = os.path.basename(file_path)
-        print(f"Processing: {filename}")
-        
-        content = ""
-        try:
-            if file_path.lower().endswith(".pdf"):
-                reader = PdfReader(file_path)
-                for page in reader.pages:
-                    text = page.extract_text()
-                    if text:
-                        content += text + "\n"
-            elif file_path.lower().endswith(".txt"):
-                with open(file_path, "r", encoding="utf-8") as f:
-                    content = f.read()
-            else:
-                continue
-                
-            if not content.strip():
-                continue
-
-            # Simple Chunking
-            chunk_size = 1000
-            overlap = 100
-            
-            for i in range(0, len(content), chunk_size - overlap):
-                chunk_text = content[i:i + chunk_size]
-                doc = Document(
-                    page_content=chunk_text,
-                    metadata={"source": filename, "chunk_index": i}
-                )
-                documents_to_add.append(doc)
+def iter_file_chunks(file_path: str, source: str, doc_id: str = None):
+    """Stream a PDF/TXT file page by page into sentence-aware chunk Documents"""
+    # Already running in an extraction process, so don't split the PDF across more of them
+    pages = iter_file_pages(file_path, workers=1)
+    file_metadata = {"source": source, **({"doc_id": doc_id} if doc_id else {})}
+    for chunk_text, metadata in iter_chunks(pages, chunk_size=1000, overlap=100):
+        yield Document(page_content=chunk_text, metadata={**file_metadata, **metadata})
+
+def send_file_chunks(file_path: str, source: str, key: str, chunk_queue, batch_size: int,
+                     doc_id: str = None) -> int:
+    """
+    Extraction process body: put (key, documents) batches of batch_size chunks on chunk_queue
+    as they are produced and return the chunk count, so a worker holds one batch, not the file.
+    """
+    count = 0
+    batch = []
+    for document in iter_file_chunks(file_path, source, doc_id):
+        batch.append(document)
+        if len(batch) == batch_size:
+            chunk_queue.put((key, batch))
+            count += len(batch)
+            batch = []
+    if batch:
+        chunk_queue.put((key, batch))
+        count += len(batch)
+    return count
+
+def list_knowledge_files(root: str = None, base: str = None):
+    """
+    Recursively list supported files under root as (rel_path, abs_path) pairs, relative to base.
+    Both default to KNOWLEDGE_BASE_DIR; base defaults to root when only root is given.
+    """
+    root = root or KNOWLEDGE_BASE_DIR
+    base = base or root
+    files = []
+    for path in glob.glob(os.path.join(root, "**", "*"), recursive=True):
+        if os.path.isfile(path) and path.lower().endswith(SUPPORTED_EXTENSIONS):
+            files.append((os.path.relpath(path, base), path))
+    return sorted(files)
 
+def scoped_knowledge_files(scope, root: str = None):
+    """Supported files at or under the given paths, relative to root (default KNOWLEDGE_BASE_DIR)"""
+    root = root or KNOWLEDGE_BASE_DIR
+    files = {}
+    for rel_path in scope:
+        path = os.path.join(root, rel_path)
+        if os.path.isdir(path):
+            files.update(list_knowledge_files(path, root))
+        elif os.path.isfile(path) and path.lower().endswith(SUPPORTED_EXTENSIONS):
+            files[os.path.relpath(path, root)] = path
+    return sorted(files.items())
+
+class StageTimer:
+    """Accumulates busy time and item counts for one pipeline stage"""
+    def __init__(self, name: str, unit: str):
+        self.name = name
+        self.unit = unit
+        self.items = 0
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, items: int, seconds: float):
+        with self._lock:
+            self.items += items
+            self.seconds += seconds
+
+    def report(self, wall_seconds: float) -> str:
+        rate = self.items / wall_seconds if wall_seconds > 0 else 0.0
+        return f"{self.name}: {self.items} {self.unit} in {self.seconds:.1f}s busy ({rate:.1f} {self.unit}/s wall)"
+
+def _embed_worker(vector_store, batches: "queue.Queue", on_done, timer: StageTimer):
+    """Stage 3: embed + upsert batches until a None sentinel arrives"""
+    while True:
+        batch = batches.get()
+        if batch is None:
+            break
+        rel_path, documents, ids = batch
+        start = time.perf_counter()
+        try:
+            vector_store.add(documents, ids)
+            timer.add(len(documents), time.perf_counter() - start)
+            on_done(rel_path, documents, ids, None)
         except Exception as e:
-            print(f"Error processing {filename}: {e}")
+            on_done(rel_path, documents, ids, e)
 
-    if documents_to_add:
-        print(f"Adding {len(documents_to_add)} chunks to ChromaDB...")
-        vector_store.add_documents(documents_to_add)
-        print("--- Ingestion Complete ---")
+def ingest_documents(paths=None, root: str = None):
+    """
+    Bring the knowledge-base index in line with root (default KNOWLEDGE_BASE_DIR). With `paths`
+    (relative to root; files or directories) only those are checked, which is what kb_watcher.py uses.
+    Changes are built into a new version directory and published by an atomic pointer swap,
+    so retrievers never see a half-updated index.
+    """
+    root = root or KNOWLEDGE_BASE_DIR
+    print(f"--- Starting Ingestion ({KB_INDEX_BACKEND}) from '{root}' ---")
+    start = time.perf_counter()
+
+    if not os.path.exists(root):
+        os.makedirs(root)
+        print(f"Created directory: {root}")
+        return
+
+    collection_name = kb_collection_name()
+    versions = kb_versions(collection_name)
+    current_version, current_dir = versions.current()
+    if current_dir is None:
+        # First versioned build: index everything into v1 (unchanged chunks reuse cached embeddings)
+        manifest = IngestManifest(os.path.join(versions.root, "manifest.json"))
+        paths = None
+    else:
+        manifest = IngestManifest(kb_files(collection_name, current_dir)["manifest"])
+
+    if paths is None:
+        files = list_knowledge_files(root)
+        print(f"Found {len(files)} files.")
     else:
-        print("No new documents to add.")
+        scope = sorted({os.path.normpath(path) for path in paths})
+        files = scoped_knowledge_files(scope, root)
+        print(f"Checking {len(scope)} changed paths ({len(files)} files).")
+
+    # Only new/changed files are re-chunked; unchanged ones are skipped on size + mtime
+    changed, deleted = manifest.diff(files, scope=None if paths is None else scope)
+    if not changed and not deleted:
+        if current_dir is not None:
+            # Only refreshes size/mtime of touched-but-identical files; readers never read the manifest
+            manifest.save()
+        print(f"Knowledge base up to date ({(time.perf_counter() - start) * 1000:.1f} ms).")
+        return
+
+    # Blue/green: apply the changes to a copy of the published version; readers keep
+    # using the current one until the pointer moves
+    version, build_dir = versions.stage(copy_from=current_dir)
+    build_files = kb_files(collection_name, build_dir)
+    manifest.path = build_files["manifest"]
+    staged = versions.last_stage
+    print(f"Building version {version} (from {current_version if current_version is not None else 'scratch'}; "
+          f"staged in {staged['seconds'] * 1000:.0f} ms: {staged['copied_bytes'] / 1e6:.1f} MB copied, "
+          f"{staged['linked_bytes'] / 1e6:.1f} MB linked)")
+
+    # Open the KB index (KB_INDEX_BACKEND: chroma or faiss; EMBEDDING_PROVIDER: local or gemini)
+    vector_store = open_kb_index(version_dir=build_dir)
+
+    # BM25 keyword index kept in step with the collection (used for hybrid retrieval)
+    keyword_index = BM25Index.load(build_files["bm25"])
+
+    for rel_path in deleted:
+        stale_ids = manifest.chunk_ids(rel_path)
+        if stale_ids:
+            vector_store.delete(stale_ids)
+            keyword_index.remove(stale_ids)
+        manifest.remove(rel_path)
+        print(f"Removed: {rel_path} ({len(stale_ids)} chunks)")
+
+    # Per-file bookkeeping: a file is committed to the manifest once it is fully extracted
+    # and all of its batches land
+    pending = {}
+    failed = set()
+    embed_failed = set()
+    lock = threading.Lock()
+
+    def commit_if_complete(rel_path):
+        entry = pending[rel_path]
+        if entry["count"] is not None and entry["remaining"] == 0 and rel_path not in failed:
+            ids = chunk_ids_for(rel_path, entry["sha256"], entry["count"])
+            # Only now is the new version of the file complete: drop the previous version's chunks
+            stale_ids = set(manifest.chunk_ids(rel_path)) - set(ids)
+            if stale_ids:
+                vector_store.delete(list(stale_ids))
+                keyword_index.remove(stale_ids)
+            manifest.update(rel_path, entry["abs_path"], entry["sha256"], ids)
+
+    def on_batch_done(rel_path, documents, ids, error):
+        with lock:
+            if error is not None:
+                if rel_path not in failed:
+                    print(f"Error embedding {rel_path}: {error}")
+                failed.add(rel_path)
+                embed_failed.add(rel_path)
+            else:
+                keyword_index.add(ids, [d.page_content for d in documents])
+            pending[rel_path]["remaining"] -= 1
+            commit_if_complete(rel_path)
+
+    extract_timer = StageTimer("Extraction", "files")
+    embed_timer = StageTimer("Embedding+upsert", "chunks")
+
+    # Stage 3: concurrent embedding workers fed by a bounded queue (backpressure on extraction)
+    batches = queue.Queue(maxsize=INGEST_QUEUE_SIZE)
+    workers = [
+        threading.Thread(target=_embed_worker, args=(vector_store, batches, on_batch_done, embed_timer), daemon=True)
+        for _ in range(EMBED_CONCURRENCY)
+    ]
+    for worker in workers:
+        worker.start()
+
+    # Stage 1: extraction across processes, at most 2x workers files in flight. Workers send
+    # EMBEDDING_BATCH_SIZE-chunk batches through a bounded managed queue as they chunk, so
+    # neither they nor this process ever hold a whole file's chunks.
+    total_chunks = 0
+    todo = list(changed)
+    with Manager() as manager, ProcessPoolExecutor(max_workers=INGEST_WORKERS) as executor:
+        chunk_queue = manager.Queue(maxsize=INGEST_QUEUE_SIZE)
+        in_flight = {}
+        while todo or in_flight:
+            while todo and len(in_flight) < INGEST_WORKERS * 2:
+                rel_path, file_path, content_hash = todo.pop(0)
+                with lock:
+                    pending[rel_path] = {"remaining": 0, "streamed": 0, "count": None,
+                                         "abs_path": file_path, "sha256": content_hash}
+                # The source is the path relative to the knowledge base: same-named files in
+                # different folders stay apart, and it is what retrieve_knowledge_tool filters on.
+                # doc_id is the content hash prefix, as for notebook uploads.
+                future = executor.submit(send_file_chunks, file_path, rel_path, rel_path,
+                                         chunk_queue, EMBEDDING_BATCH_SIZE, content_hash[:16])
+                in_flight[future] = (rel_path, file_path, content_hash, time.perf_counter())
+
+            # A finished worker has queued all of its batches, so drain the queue before handling it
+            finished = [future for future in in_flight if future.done()]
+            block = not finished
+            while True:
+                try:
+                    rel_path, documents = chunk_queue.get(timeout=0.05) if block else chunk_queue.get_nowait()
+                except queue.Empty:
+                    break
+                block = False
+                # Stage 2: batches go straight to the bounded embedding queue
+                with lock:
+                    entry = pending[rel_path]
+                    ids = chunk_ids_for(rel_path, entry["sha256"], len(documents), start=entry["streamed"])
+                    entry["streamed"] += len(documents)
+                    entry["remaining"] += 1
+                batches.put((rel_path, documents, ids))
+
+            for future in finished:
+                rel_path, file_path, content_hash, submitted = in_flight.pop(future)
+                try:
+                    count = future.result()
+                except Exception as e:
+                    print(f"Error processing {rel_path}: {e}")
+                    with lock:
+                        failed.add(rel_path)
+                    continue
+                extract_timer.add(1, time.perf_counter() - submitted)
+                print(f"Processing: {rel_path} ({count} chunks)")
+                with lock:
+                    pending[rel_path]["count"] = count
+                    commit_if_complete(rel_path)
+                total_chunks += count
+
+    for _ in workers:
+        batches.put(None)
+    for worker in workers:
+        worker.join()
+
+    if embed_failed:
+        # Embedding errors are usually transient (model or API down): keep serving the current
+        # version and leave the manifest alone, so the next scan of these files retries them
+        vector_store.close()
+        versions.discard(version)
+        print(f"--- Ingestion aborted: embedding failed for {len(embed_failed)} files; "
+              f"version {current_version if current_version is not None else '(none)'} stays published ---")
+        return
+
+    # A file that failed part-way may already have batches in the build; keep its previous chunks only
+    for rel_path in failed:
+        entry = pending.get(rel_path)
+        if entry and entry["streamed"]:
+            orphan_ids = (set(chunk_ids_for(rel_path, entry["sha256"], entry["streamed"]))
+                          - set(manifest.chunk_ids(rel_path)))
+            if orphan_ids:
+                vector_store.delete(list(orphan_ids))
+                keyword_index.remove(orphan_ids)
+
+    # A published version is never written again, so finish any background index build first
+    if hasattr(vector_store, "wait_for_build"):
+        vector_store.wait_for_build()
+    vector_store.persist()
+    vector_store.close()
+    manifest.save()
+    keyword_index.save(build_files["bm25"])
+
+    # Retrievers in other processes switch when they see the new pointer;
+    # an in-process one is switched right away
+    versions.publish(version)
+    if retriever.is_open:
+        retriever.reload()
+
+    elapsed = time.perf_counter() - start
+    print(extract_timer.report(elapsed))
+    print(embed_timer.report(elapsed))
+    print(f"--- Ingestion Complete: {total_chunks} chunks from {len(changed) - len(failed)} files, "
+          f"{len(deleted)} files removed, {len(failed)} failed ({elapsed:.1f}s, version {version}) ---")
 
 if __name__ == "__main__":
     ingest_documents()
@@ -0,0 +1,175 @@
+"""
+Knowledge Base Watcher
+Keeps the knowledge-base index in step with knowledge_base/ without manual
+`python ingestion.py` runs. File events come from watchdog (inotify on Linux)
+or, when that is unavailable, from polling file sizes and mtimes. Events are
+debounced so a burst of copies turns into one incremental ingestion of just the
+touched paths, run on a background worker; each run publishes a new index
+version that running retrievers reload.
+
+    python kb_watcher.py
+"""
+import os
+import time
+import threading
+
+from rag_services.config import KB_WATCH_DEBOUNCE_SECONDS, KB_WATCH_MAX_DELAY_SECONDS, KB_WATCH_POLL_SECONDS
+from ingestion import KNOWLEDGE_BASE_DIR, SUPPORTED_EXTENSIONS, ingest_documents, list_knowledge_files
+
+# watchdog event types that never change file content
+IGNORED_EVENTS = {"opened", "closed_no_write"}
+
+
+class KnowledgeBaseWatcher:
+    """Watches root and runs ingest(paths, root=root) for each debounced batch of changes"""
+
+    def __init__(self, root: str = KNOWLEDGE_BASE_DIR, debounce: float = KB_WATCH_DEBOUNCE_SECONDS,
+                 max_delay: float = KB_WATCH_MAX_DELAY_SECONDS, poll_interval: float = KB_WATCH_POLL_SECONDS,
+                 ingest=ingest_documents):
+        self.root = root
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval
+        self.ingest = ingest
+        self._pending = set()
+        self._first_event = None
+        self._last_event = None
+        self._cond = threading.Condition()
+        self._stopped = threading.Event()
+        self._observer = None
+        self._threads = []
+        self.runs = 0
+
+    def notify(self, path: str, is_directory: bool = False):
+        """Queue a changed path (absolute or under root) for the next ingestion run"""
+        rel_path = os.path.relpath(os.path.abspath(path), os.path.abspath(self.root))
+        if rel_path.startswith(os.pardir):
+            return
+        # Deleted directories can't be stat'ed, so keep anything without a file extension too
+        if not (is_directory or rel_path == os.curdir or rel_path.lower().endswith(SUPPORTED_EXTENSIONS)
+                or not os.path.splitext(rel_path)[1]):
+            return
+        with self._cond:
+            now = time.monotonic()
+            if not self._pending:
+                self._first_event = now
+            self._pending.add(rel_path)
+            self._last_event = now
+            self._cond.notify()
+
+    def _next_batch(self):
+        """Block until changes have been quiet for `debounce` (or waited `max_delay`); None once stopped"""
+        with self._cond:
+            while not self._stopped.is_set():
+                if not self._pending:
+                    self._cond.wait()
+                    continue
+                now = time.monotonic()
+                ready_at = min(self._last_event + self.debounce, self._first_event + self.max_delay)
+                if now >= ready_at:
+                    batch, self._pending = self._pending, set()
+                    return batch
+                self._cond.wait(ready_at - now)
+        return None
+
+    def _worker(self):
+        """Runs ingestions one at a time; events arriving meanwhile form the next batch"""
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            paths = None if os.curdir in batch else sorted(batch)
+            print(f"--- KB watcher: {'full scan' if paths is None else f'{len(paths)} changed path(s)'} ---")
+            try:
+                self.ingest(paths, root=self.root)
+            except Exception as e:
+                print(f"--- KB watcher: ingestion failed: {e} ---")
+            self.runs += 1
+
+    def _snapshot(self):
+        snapshot = {}
+        for rel_path, path in list_knowledge_files(self.root, self.root):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            snapshot[rel_path] = (stat.st_size, stat.st_mtime_ns)
+        return snapshot
+
+    def _poll(self, previous):
+        """Fallback: compare file sizes and mtimes every poll_interval, starting from `previous`"""
+        while not self._stopped.wait(self.poll_interval):
+            current = self._snapshot()
+            for rel_path in set(previous) | set(current):
+                if previous.get(rel_path) != current.get(rel_path):
+                    self.notify(os.path.join(self.root, rel_path))
+            previous = current
+
+    def _start_observer(self) -> bool:
+        try:
+            from watchdog.observers import Observer
+            from watchdog.events import FileSystemEventHandler
+        except ImportError:
+            return False
+
+        watcher = self
+
+        class Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                # A directory's "modified" event only repeats what its children report
+                if event.event_type in IGNORED_EVENTS or (event.is_directory and event.event_type == "modified"):
+                    return
+                watcher.notify(event.src_path, event.is_directory)
+                if getattr(event, "dest_path", ""):
+                    watcher.notify(event.dest_path, event.is_directory)
+
+        observer = Observer()
+        try:
+            observer.schedule(Handler(), self.root, recursive=True)
+            observer.start()
+        except OSError as e:
+            # e.g. the inotify watch limit is exhausted
+            print(f"--- KB watcher: file events unavailable ({e}) ---")
+            return False
+        self._observer = observer
+        return True
+
+    def start(self, catch_up: bool = True):
+        """Start watching; catch_up first ingests whatever changed while nothing was watching"""
+        os.makedirs(self.root, exist_ok=True)
+        self._stopped.clear()
+        self._threads = [threading.Thread(target=self._worker, name="kb-ingest", daemon=True)]
+        if self._start_observer():
+            mode = "file events"
+        else:
+            # Baseline taken before start() returns, so files written right after it count as changes
+            self._threads.append(threading.Thread(target=self._poll, args=(self._snapshot(),), name="kb-poll",
+                                                  daemon=True))
+            mode = f"polling every {self.poll_interval:g}s"
+        for thread in self._threads:
+            thread.start()
+        if catch_up:
+            self.notify(self.root, is_directory=True)
+        print(f"--- KB watcher: watching '{self.root}' ({mode}, debounce {self.debounce:g}s) ---")
+
+    def stop(self):
+        self._stopped.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+
+if __name__ == "__main__":
+    watcher = KnowledgeBaseWatcher()
+    watcher.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        watcher.stop()
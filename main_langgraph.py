@@ -3,6 +3,8 @@ import uuid
 import sys
 from graph import create_graph
 from database import db
+from rag_services.retriever import retriever
+from rag_services.embedding_cache import get_query_cache
 
 async def main():
     print("Initializing LangGraph Chatbot (Phase 4: Persistence)...")
@@ -15,6 +17,9 @@ async def main():
         print("Please check your .env file and ensure DATABASE_URL is set.")
         return
 
+    # Open the knowledge base once (shared by all retrieval tool calls)
+    await asyncio.to_thread(retriever.warm)
+
     # Initialize Graph
     app = create_graph()
     
@@ -40,6 +45,7 @@ async def main():
         try:
             user_input = input("\nYou: ")
             if user_input.lower() in ["exit", "quit"]:
+                print(f"Query embedding cache: {get_query_cache().get_stats()}")
                 print("Goodbye!")
                 await db.close()
                 break
@@ -1,11 +1,14 @@
+import os
 import sys
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from ai_services.GroqClient import generate_completion
 from ai_services.GeminiClient import call_gemini
 from ai_services.PerplexityClient import call_perplexity_chat
+from ai_services.RateLimiter import get_limiter, estimate_tokens, is_rate_limit_error, parse_retry_after
+from ai_services.HedgedRequests import HEDGING_ENABLED, hedged_ainvoke
 from state import AgentState
 from langgraph.prebuilt import ToolNode
-from tools import ALL_TOOLS
+from tools import ALL_TOOLS, knowledge_prefetcher
 from database import db
 
 # Create Tool Node
@@ -19,6 +22,10 @@ async def input_session(state: AgentState) -> Dict[str, Any]:
     session_id = state.get("session_id")
     print(f"--- Node: input_session (Session: {session_id}) ---")
     
+    # Speculatively start the knowledge-base search; retrieve_knowledge_tool picks it up if asked
+    if os.getenv("RAG_PREFETCH", "1") == "1" and state.get("current_query"):
+        knowledge_prefetcher.start(state["current_query"])
+    
     # Initialize DB Session
     await db.create_session_if_not_exists(session_id, user_id=state.get("user_id", "guest"))
     
@@ -83,6 +90,37 @@ def model_selector(state: AgentState) -> Dict[str, Any]:
         print(f"Selector Error: {e}, defaulting to groq")
         return {"selected_model": "groq"}
 
+def _build_chat_model(model_name: str):
+    """Create the LangChain chat model for a provider (None for providers without tool support)"""
+    from langchain_groq import ChatGroq
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    import os
+
+    if model_name == "gemini":
+        return ChatGoogleGenerativeAI(model="gemini-2.5-flash", google_api_key=os.getenv("GEMINI_API_KEY"))
+    elif model_name == "perplexity":
+        # Placeholder for Perplexity
+        return None
+    return ChatGroq(model="llama-3.3-70b-versatile", api_key=os.getenv("GROQ_API_KEY"))
+
+def _hedge_secondary(model_name: str, tokens: int):
+    """Pick the hedge target for a primary model, or None if it has no key or no spare quota"""
+    import os
+
+    secondary = "gemini" if model_name == "groq" else "groq"
+    key = "GEMINI_API_KEY" if secondary == "gemini" else "GROQ_API_KEY"
+    if not os.getenv(key) or not get_limiter(secondary).try_acquire(tokens):
+        return None
+    return (secondary, _build_chat_model(secondary).bind_tools(ALL_TOOLS))
+
+def _record_outcome(provider: str, error: Optional[BaseException] = None):
+    """Feed a finished request back to its provider's limiter (429s slow that provider down)"""
+    limiter = get_limiter(provider)
+    if error is None:
+        limiter.record_success()
+    elif is_rate_limit_error(error):
+        limiter.record_rate_limited(parse_retry_after(error))
+
 async def chat_llm(state: AgentState) -> Dict[str, Any]:
     """
     Node 3: Chat LLM Generation
@@ -96,18 +134,7 @@ async def chat_llm(state: AgentState) -> Dict[str, Any]:
     corrections = state.get("corrections", {})
     
     # Prepare Tools & Model
-    from langchain_groq import ChatGroq
-    from langchain_google_genai import ChatGoogleGenerativeAI
-    import os
-    
-    llm = None
-    if model_name == "gemini":
-        llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", google_api_key=os.getenv("GEMINI_API_KEY"))
-    elif model_name == "perplexity":
-        # Placeholder for Perplexity
-        pass 
-    else:
-        llm = ChatGroq(model="llama-3.3-70b-versatile", api_key=os.getenv("GROQ_API_KEY"))
+    llm = _build_chat_model(model_name)
     
     if llm:
         llm_with_tools = llm.bind_tools(ALL_TOOLS)
@@ -133,10 +160,28 @@ async def chat_llm(state: AgentState) -> Dict[str, Any]:
     # Invoke
     response_msg = None
     if llm:
+        # Share the provider quota with the other ai_services callers
+        limiter = get_limiter(model_name)
+        tokens = estimate_tokens(*[str(m.content) for m in messages])
         try:
-            # Async invoke if possible, or fall back to sync invoke if client doesn't support async properly yet
-            # LangGraph handles async nodes well.
-            response_msg = await llm_with_tools.ainvoke(messages)
+            await limiter.acquire_async(tokens)
+            if HEDGING_ENABLED:
+                # Primary and secondary outcomes each go to their own provider's limiter
+                response_msg, answered_by = await hedged_ainvoke(
+                    (model_name, llm_with_tools), lambda: _hedge_secondary(model_name, tokens), messages,
+                    on_result=_record_outcome
+                )
+                if answered_by != model_name:
+                    print(f"--- Hedged response served by {answered_by} ---")
+            else:
+                # Async invoke if possible, or fall back to sync invoke if client doesn't support async properly yet
+                # LangGraph handles async nodes well.
+                try:
+                    response_msg = await llm_with_tools.ainvoke(messages)
+                except Exception as e:
+                    _record_outcome(model_name, e)
+                    raise
+                _record_outcome(model_name)
         except Exception as e:
             response_msg = AIMessage(content=f"Error calling LLM: {str(e)}")
     else:
@@ -0,0 +1,62 @@
+# RAG Services - Retrieval infrastructure shared by the agent tools and NotebookLM
+from .prefetch import SpeculativePrefetcher
+from .retriever import KnowledgeRetriever, retriever
+from .embedding_cache import (CachedEmbeddings, QueryEmbeddingCache, get_query_cache, ChunkEmbeddingStore,
+                              get_chunk_store)
+from .embeddings import LocalEmbeddings, get_embeddings, kb_collection_name
+from .chunking import iter_chunks, iter_file_pages, iter_pdf_pages
+from .bm25 import BM25Index, hybrid_search, reciprocal_rank_fusion
+from .reranker import CrossEncoderReranker, get_reranker
+from .chunk_store import ChunkStore
+from .ocr import OcrCache, ocr_pages
+from .pdf_extract import PdfTextCache, iter_pdf_text, extract_pdf_text
+from .filters import build_filters, normalize_filters
+from .index_version import VersionedDirectory, IndexSnapshot, kb_versions, read_version
+from .context_packing import pack_context, merge_overlapping, mmr_select
+from .vector_index import (VectorIndex, ChromaVectorIndex, FaissVectorIndex, open_vector_index, open_kb_index,
+                           merge_results)
+from .quantization import get_codec
+
+__all__ = [
+    'SpeculativePrefetcher',
+    'KnowledgeRetriever',
+    'retriever',
+    'CachedEmbeddings',
+    'QueryEmbeddingCache',
+    'get_query_cache',
+    'ChunkEmbeddingStore',
+    'get_chunk_store',
+    'LocalEmbeddings',
+    'get_embeddings',
+    'kb_collection_name',
+    'iter_chunks',
+    'iter_file_pages',
+    'iter_pdf_pages',
+    'BM25Index',
+    'hybrid_search',
+    'reciprocal_rank_fusion',
+    'CrossEncoderReranker',
+    'get_reranker',
+    'VectorIndex',
+    'ChromaVectorIndex',
+    'FaissVectorIndex',
+    'open_vector_index',
+    'open_kb_index',
+    'merge_results',
+    'get_codec',
+    'ChunkStore',
+    'OcrCache',
+    'ocr_pages',
+    'PdfTextCache',
+    'iter_pdf_text',
+    'extract_pdf_text',
+    'build_filters',
+    'normalize_filters',
+    'VersionedDirectory',
+    'IndexSnapshot',
+    'kb_versions',
+    'read_version',
+    'pack_context',
+    'merge_overlapping',
+    'mmr_select'
+]
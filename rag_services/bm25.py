@@ -0,0 +1,195 @@
+"""
+BM25 Keyword Index & Hybrid Search
+A small local inverted index built alongside the vector stores so exact terms
+(formula names, course codes) are matched even when embeddings miss them.
+Vector and keyword hits are merged with reciprocal-rank fusion.
+
+The index holds only postings and document lengths; the text and metadata of
+hits are fetched from the vector store's chunk table through `lookup`, so
+loading a version does not read every chunk into memory.
+"""
+import os
+import re
+import math
+import pickle
+import hashlib
+import threading
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from .filters import matches, normalize_filters
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+# RRF constant from Cormack et al.; larger values flatten the rank weighting
+RRF_K = 60
+# Ranked hits fetched per lookup while filling a filtered result
+FILTER_LOOKUP_BATCH = 64
+
+# ids -> {id: Document} for the ids that exist (e.g. VectorIndex.get_documents)
+DocumentLookup = Callable[[List[str]], Dict[str, Document]]
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Index:
+    """
+    Inverted index with BM25 scoring; supports incremental add/remove and pickling.
+    search() needs a `lookup` for the text and metadata of its hits.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75, lookup: Optional[DocumentLookup] = None):
+        self.k1 = k1
+        self.b = b
+        self.lookup = lookup
+        self.postings: Dict[str, Dict[str, int]] = defaultdict(dict)  # term -> {doc_id: tf}
+        self.doc_lengths: Dict[str, int] = {}
+        self.total_length = 0
+        self._removed = set()  # ids still present in postings, dropped by the next _compact()
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    def add(self, ids: Iterable[str], texts: Iterable[str]):
+        ids, texts = list(ids), list(texts)
+        with self._lock:
+            self._discard(ids)
+            if self._removed.intersection(ids):
+                self._compact()
+            for doc_id, text in zip(ids, texts):
+                terms = tokenize(text)
+                for term, tf in Counter(terms).items():
+                    self.postings[term][doc_id] = tf
+                self.doc_lengths[doc_id] = len(terms)
+                self.total_length += len(terms)
+
+    def _discard(self, ids: Iterable[str]):
+        for doc_id in ids:
+            if doc_id in self.doc_lengths:
+                self.total_length -= self.doc_lengths.pop(doc_id)
+                self._removed.add(doc_id)
+
+    def _compact(self):
+        """Drop removed ids from the postings: one pass over them for any number of removals"""
+        if not self._removed:
+            return
+        removed = self._removed
+        for term in list(self.postings):
+            postings = self.postings[term]
+            for doc_id in removed.intersection(postings):
+                del postings[doc_id]
+            if not postings:
+                del self.postings[term]
+        self._removed = set()
+
+    def remove(self, ids: Iterable[str]):
+        with self._lock:
+            self._discard(ids)
+
+    def _ranked(self, query: str) -> List[Tuple[str, float]]:
+        n = len(self.doc_lengths)
+        avg_length = self.total_length / n
+        scores: Dict[str, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, tf in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / avg_length)
+                scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+
+    def search(self, query: str, k: int = 4,
+               filters: Optional[Dict[str, Any]] = None) -> List[Tuple[Document, float]]:
+        filters = normalize_filters(filters)
+        with self._lock:
+            if len(self.doc_lengths) == 0:
+                return []
+            self._compact()
+            ranked = self._ranked(query)
+        if self.lookup is None:
+            raise ValueError("BM25Index.search needs a document lookup")
+        results = []
+        # Fetch the top k at once, or with filters batches in rank order until k match
+        batch = max(k, FILTER_LOOKUP_BATCH) if filters else k
+        for i in range(0, len(ranked), batch):
+            hits = ranked[i:i + batch]
+            documents = self.lookup([doc_id for doc_id, _ in hits])
+            for doc_id, score in hits:
+                doc = documents.get(doc_id)
+                if doc is not None and matches(doc.metadata, filters):
+                    results.append((doc, score))
+                    if len(results) == k:
+                        return results
+        return results
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._lock:
+            self._compact()
+            state = {
+                "k1": self.k1, "b": self.b, "postings": dict(self.postings),
+                "doc_lengths": self.doc_lengths, "total_length": self.total_length,
+            }
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, lookup: Optional[DocumentLookup] = None) -> "BM25Index":
+        """Load a saved index (chunk text stored by older versions is dropped), or return an empty one"""
+        index = cls(lookup=lookup)
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                state = pickle.load(f)
+            index.k1, index.b = state["k1"], state["b"]
+            index.postings = defaultdict(dict, state["postings"])
+            index.doc_lengths = state["doc_lengths"]
+            index.total_length = state["total_length"]
+        return index
+
+
+def doc_key(doc: Document) -> str:
+    """Identity for fusion: a content hash, so the same chunk from either index collapses"""
+    return hashlib.sha1(doc.page_content.encode("utf-8")).hexdigest()
+
+
+def reciprocal_rank_fusion(result_lists: List[List[Document]], k: int = 4, rrf_k: int = RRF_K) -> List[Document]:
+    """Merge ranked lists: score(d) = sum over lists of 1 / (rrf_k + rank)"""
+    scores: Dict[str, float] = defaultdict(float)
+    docs: Dict[str, Document] = {}
+    for results in result_lists:
+        for rank, doc in enumerate(results, start=1):
+            key = doc_key(doc)
+            scores[key] += 1.0 / (rrf_k + rank)
+            docs.setdefault(key, doc)
+    ranked = sorted(scores, key=scores.get, reverse=True)[:k]
+    return [docs[key] for key in ranked]
+
+
+_search_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="hybrid-search")
+
+
+def hybrid_search(vector_search: Callable[[str, int], List[Document]], keyword_index: Optional[BM25Index],
+                  query: str, k: int = 4, candidates: Optional[int] = None,
+                  filters: Optional[Dict[str, Any]] = None) -> List[Document]:
+    """
+    Run vector and BM25 search in parallel and fuse the rankings.
+    Each side contributes `candidates` hits (default 2*k); the fused top-k is returned.
+    `filters` restrict the keyword side; `vector_search` must apply the same filters itself.
+    """
+    candidates = candidates or k * 2
+    if keyword_index is None or len(keyword_index) == 0:
+        return vector_search(query, k)
+    keyword_future = _search_pool.submit(keyword_index.search, query, candidates, filters)
+    vector_hits = vector_search(query, candidates)
+    keyword_hits = [doc for doc, _ in keyword_future.result()]
+    return reciprocal_rank_fusion([vector_hits, keyword_hits], k=k)
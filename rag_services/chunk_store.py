@@ -0,0 +1,153 @@
+"""
+FAISS Chunk Store
+On-disk layout for FaissVectorIndex: raw vectors in an append-only float32 file
+(row == FAISS id) and chunk text/metadata in SQLite. persist() writes only what
+changed since the last call: new vector rows are appended, new chunks inserted
+and deleted chunks removed, so adding one PDF to a large notebook is cheap.
+With quantization enabled, compressed codes of the same rows are appended to
+codes.<codec> the same way (see quantization.py).
+
+Nothing is read eagerly except the id mapping: vectors are memory-mapped (pages
+are shared between processes through the OS cache) and chunk text/metadata is
+fetched by primary key only for search hits.
+
+Index versions hardlink vectors.f32 and codes files (see index_version.py), so a
+file may be shared with older versions: rows are never rewritten in place, and
+whole-file rewrites go through a temp file + os.replace.
+"""
+import os
+import json
+import sqlite3
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from .filters import MATCH_FIELDS, sql_where
+
+
+class ChunkStore:
+    VECTORS_FILE = "vectors.f32"
+    CODES_FILE = "codes.{}"
+    DB_FILE = "chunks.sqlite3"
+    # Stay below SQLite's default limit on bound parameters
+    LOOKUP_BATCH = 900
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.vectors_path = os.path.join(directory, self.VECTORS_FILE)
+        self.db_path = os.path.join(directory, self.DB_FILE)
+        self._conn = None
+
+    def exists(self) -> bool:
+        return os.path.exists(self.db_path)
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+            self._conn.executescript(
+                "CREATE TABLE IF NOT EXISTS chunks ("
+                "  faiss_id INTEGER PRIMARY KEY, chunk_id TEXT NOT NULL UNIQUE,"
+                "  text TEXT NOT NULL, metadata TEXT NOT NULL);"
+                "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);"
+                + "".join(
+                    f"CREATE INDEX IF NOT EXISTS chunks_{field} ON chunks (json_extract(metadata, '$.{field}'));"
+                    for field in MATCH_FIELDS
+                )
+            )
+        return self._conn
+
+    def read_meta(self) -> Dict[str, Any]:
+        return {key: json.loads(value) for key, value in self.conn.execute("SELECT key, value FROM meta")}
+
+    def read_ids(self) -> Iterator[Tuple[int, str]]:
+        """(faiss_id, chunk_id) of every stored chunk"""
+        yield from self.conn.execute("SELECT faiss_id, chunk_id FROM chunks")
+
+    def get_chunks(self, faiss_ids: List[int]) -> Dict[int, Tuple[str, dict]]:
+        """faiss_id -> (text, metadata) for the given ids (missing ids are left out)"""
+        found = {}
+        for i in range(0, len(faiss_ids), self.LOOKUP_BATCH):
+            batch = [int(faiss_id) for faiss_id in faiss_ids[i:i + self.LOOKUP_BATCH]]
+            rows = self.conn.execute(
+                f"SELECT faiss_id, text, metadata FROM chunks WHERE faiss_id IN ({','.join('?' * len(batch))})", batch
+            )
+            for faiss_id, text, metadata in rows:
+                found[faiss_id] = (text, json.loads(metadata))
+        return found
+
+    def filter_ids(self, filters: Dict[str, Any]) -> List[int]:
+        """faiss ids of stored chunks whose metadata matches `filters` (see filters.py)"""
+        clause, params = sql_where(filters)
+        return [faiss_id for faiss_id, in self.conn.execute(f"SELECT faiss_id FROM chunks WHERE {clause}", params)]
+
+    def map_vectors(self, rows: int, dim: int) -> Optional[np.memmap]:
+        """Read-only memory map of the first `rows` vectors (rows past the last committed one are ignored)"""
+        if rows == 0 or not os.path.exists(self.vectors_path):
+            return None
+        return np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(rows, dim))
+
+    def codes_path(self, codec_name: str) -> str:
+        return os.path.join(self.directory, self.CODES_FILE.format(codec_name))
+
+    def map_codes(self, codec_name: str, rows: int, width: int) -> Optional[np.memmap]:
+        """Read-only map of the first `rows` codes; None if the file holds fewer (written without this codec)"""
+        path = self.codes_path(codec_name)
+        if rows == 0 or not os.path.exists(path) or os.path.getsize(path) < rows * width:
+            return None
+        return np.memmap(path, dtype=np.uint8, mode="r", shape=(rows, width))
+
+    def replace_codes(self, codec_name: str, codes: np.ndarray):
+        """Rewrite the whole codes file (enabling a codec on an existing store)"""
+        path = self.codes_path(codec_name)
+        with open(path + ".tmp", "wb") as f:
+            f.write(np.ascontiguousarray(codes, dtype=np.uint8).tobytes())
+        os.replace(path + ".tmp", path)
+
+    @staticmethod
+    def _append_rows(path: str, rows: np.ndarray, first_row: int):
+        row_bytes = rows.shape[1] * rows.dtype.itemsize
+        with open(path, "ab") as f:
+            # Only shrink when a crash (or a discarded build sharing this file) left extra rows:
+            # the committed rows may be memory-mapped here or by an older version
+            if os.path.getsize(path) > first_row * row_bytes:
+                f.truncate(first_row * row_bytes)
+            f.write(np.ascontiguousarray(rows).tobytes())
+
+    def write(self, vectors: np.ndarray, first_row: int, added: Iterable[Tuple[int, str, str, dict]],
+              deleted: Iterable[int], meta: Dict[str, Any], codes: Optional[Tuple[str, np.ndarray]] = None):
+        """
+        Append `vectors` (and `codes`, as (codec name, rows)) as rows first_row.. and apply chunk
+        inserts/deletes plus meta in one transaction. Rows go first: a crash before the commit
+        leaves extra rows that the next write truncates.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        if len(vectors):
+            self._append_rows(self.vectors_path, np.asarray(vectors, dtype=np.float32), first_row)
+        if codes is not None and len(codes[1]):
+            self._append_rows(self.codes_path(codes[0]), np.asarray(codes[1], dtype=np.uint8), first_row)
+        with self.conn:
+            self.conn.executemany("DELETE FROM chunks WHERE faiss_id = ?", [(int(i),) for i in deleted])
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO chunks (faiss_id, chunk_id, text, metadata) VALUES (?, ?, ?, ?)",
+                [(int(i), chunk_id, text, json.dumps(metadata)) for i, chunk_id, text, metadata in added]
+            )
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                [(key, json.dumps(value)) for key, value in meta.items()]
+            )
+
+    def clear(self):
+        """Drop every chunk and vector"""
+        with self.conn:
+            self.conn.execute("DELETE FROM chunks")
+            self.conn.execute("DELETE FROM meta")
+        for name in os.listdir(self.directory):
+            if name == self.VECTORS_FILE or name.startswith(self.CODES_FILE.format("")):
+                os.remove(os.path.join(self.directory, name))
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
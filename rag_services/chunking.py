@@ -0,0 +1,105 @@
+"""
+Streaming Extraction & Chunking
+Pages are read one at a time and fed through a sentence-aware chunker that only
+buffers about one chunk of text, so memory stays flat for 800-page textbooks.
+Chunks carry page provenance and their character offset in the document stream
+(chunk text == stream[start_index:start_index + len(text)]).
+"""
+import re
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+# End of a sentence (plus closing quotes/brackets and trailing whitespace) or a line break
+SENTENCE_BOUNDARY = re.compile(r"[.!?]+[\"')\]]*\s+|\n\s*")
+
+TEXT_BLOCK_CHARS = 1 << 16
+
+
+def iter_pdf_pages(file_path: str, workers: Optional[int] = None) -> Iterator[Tuple[int, str]]:
+    """Yield (page_number, text) for each non-empty page of a PDF (see pdf_extract)"""
+    from .pdf_extract import iter_pdf_text
+
+    for page_number, text in iter_pdf_text(file_path, workers):
+        if text.strip():
+            yield page_number, text if text.endswith("\n") else text + "\n"
+
+
+def iter_text_blocks(file_path: str, block_chars: int = TEXT_BLOCK_CHARS) -> Iterator[Tuple[Optional[int], str]]:
+    """Yield a text file in fixed-size blocks (no page numbers)"""
+    with open(file_path, "r", encoding="utf-8") as f:
+        for block in iter(lambda: f.read(block_chars), ""):
+            yield None, block
+
+
+def iter_file_pages(file_path: str, workers: Optional[int] = None) -> Iterator[Tuple[Optional[int], str]]:
+    lowered = file_path.lower()
+    if lowered.endswith(".pdf"):
+        return iter_pdf_pages(file_path, workers)
+    if lowered.endswith(".txt"):
+        return iter_text_blocks(file_path)
+    return iter(())
+
+
+def split_sentences(text: str):
+    """Split text into sentence segments without dropping any characters"""
+    start = 0
+    for match in SENTENCE_BOUNDARY.finditer(text):
+        yield text[start:match.end()]
+        start = match.end()
+    if start < len(text):
+        yield text[start:]
+
+
+def iter_chunks(pages: Iterable[Tuple[Optional[int], str]], chunk_size: int = 1000,
+                overlap: int = 100) -> Iterator[Tuple[str, Dict]]:
+    """
+    Turn a stream of (page_number, text) into (chunk_text, metadata) pairs.
+
+    Chunks end on sentence boundaries where possible; sentences longer than
+    chunk_size are hard-split. Up to `overlap` characters of whole trailing
+    sentences are repeated at the start of the next chunk.
+    """
+    buffer = []  # (segment, page, start_offset)
+    buffered = 0
+    fresh = 0  # segments added since the last emitted chunk (excludes the carried overlap)
+    offset = 0
+    chunk_index = 0
+
+    def emit():
+        text = "".join(segment for segment, _, _ in buffer)
+        metadata = {"chunk_index": chunk_index, "start_index": buffer[0][2]}
+        pages = [page for _, page, _ in buffer if page is not None]
+        if pages:
+            metadata["page"] = pages[0]
+            metadata["page_end"] = pages[-1]
+        return text, metadata
+
+    for page, text in pages:
+        for sentence in split_sentences(text):
+            pieces = [sentence[i:i + chunk_size] for i in range(0, len(sentence), chunk_size)]
+            for piece in pieces:
+                if buffer and buffered + len(piece) > chunk_size:
+                    if fresh:
+                        chunk_text, metadata = emit()
+                        if chunk_text.strip():
+                            yield chunk_text, metadata
+                            chunk_index += 1
+                        # Carry whole trailing sentences (up to `overlap` chars) into the next chunk
+                        carried, carried_len = [], 0
+                        for item in reversed(buffer):
+                            if carried_len + len(item[0]) > overlap:
+                                break
+                            carried.insert(0, item)
+                            carried_len += len(item[0])
+                        buffer, buffered, fresh = carried, carried_len, 0
+                    if buffered + len(piece) > chunk_size:
+                        # The overlap does not fit next to this piece: start clean
+                        buffer, buffered = [], 0
+                buffer.append((piece, page, offset))
+                fresh += 1
+                buffered += len(piece)
+                offset += len(piece)
+
+    if buffer and fresh:
+        chunk_text, metadata = emit()
+        if chunk_text.strip():
+            yield chunk_text, metadata
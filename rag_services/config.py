@@ -0,0 +1,66 @@
+"""
+Shared RAG configuration
+Paths and collection names used by ingestion, the retriever and the agent tools.
+"""
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+CHROMA_PATH = os.getenv("CHROMA_PATH", "./chroma_db")
+FAISS_KB_PATH = os.getenv("FAISS_KB_PATH", "./faiss_kb")
+KB_COLLECTION = os.getenv("KB_COLLECTION", "knowledge_base")
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "./embedding_cache")
+
+# Embedding backend for the Chroma knowledge base: "local" (sentence-transformers on CPU) or "gemini"
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "local")
+LOCAL_EMBEDDING_MODEL = os.getenv("LOCAL_EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+
+# Vector store for the knowledge base: "chroma" or "faiss" (see benchmarks/bench_vector_index.py)
+KB_INDEX_BACKEND = os.getenv("KB_INDEX_BACKEND", "chroma").lower()
+
+# FAISS index type: "flat" (exact), "hnsw", "ivfpq" or "auto" (flat -> hnsw -> ivfpq as the corpus grows)
+FAISS_INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE", "auto").lower()
+FAISS_HNSW_MIN_VECTORS = int(os.getenv("FAISS_HNSW_MIN_VECTORS", "20000"))
+FAISS_IVFPQ_MIN_VECTORS = int(os.getenv("FAISS_IVFPQ_MIN_VECTORS", "200000"))
+FAISS_HNSW_M = int(os.getenv("FAISS_HNSW_M", "32"))
+FAISS_HNSW_EF_CONSTRUCTION = int(os.getenv("FAISS_HNSW_EF_CONSTRUCTION", "80"))
+FAISS_HNSW_EF_SEARCH = int(os.getenv("FAISS_HNSW_EF_SEARCH", "64"))
+FAISS_IVF_NPROBE = int(os.getenv("FAISS_IVF_NPROBE", "16"))
+FAISS_TRAIN_SAMPLE = int(os.getenv("FAISS_TRAIN_SAMPLE", "100000"))
+# Rebuild an HNSW index once this fraction of its entries are deleted
+FAISS_TOMBSTONE_RATIO = float(os.getenv("FAISS_TOMBSTONE_RATIO", "0.2"))
+# Compressed vectors for the first-pass search: "none", "sq8" (int8) or "binary" (see quantization.py);
+# candidates re-scored exactly per result (0 = the codec's default: sq8 4, binary 16, plain ivfpq 4)
+FAISS_QUANTIZATION = os.getenv("FAISS_QUANTIZATION", "none").lower()
+FAISS_RESCORE_FACTOR = int(os.getenv("FAISS_RESCORE_FACTOR", "0"))
+
+# Ingestion pipeline: extraction processes, concurrent embedding batches, queued batches
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "8"))
+
+# OCR for scanned PDF pages: worker processes, render DPI for vector-drawn pages, Tesseract language
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+OCR_DPI = int(os.getenv("OCR_DPI", "300"))
+OCR_LANG = os.getenv("OCR_LANG", "eng")
+OCR_CACHE_DIR = os.getenv("OCR_CACHE_DIR", "./ocr_cache")
+
+# PDF text extraction: processes for large files, page count that triggers the split, extracted-text cache
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "64"))
+PDF_CACHE_DIR = os.getenv("PDF_CACHE_DIR", "./pdf_cache")
+
+# Knowledge-base watcher: quiet time before ingesting a burst of changes, longest a burst can delay
+# ingestion, stat-poll interval when inotify is unavailable; how often retrievers check the index version
+KB_WATCH_DEBOUNCE_SECONDS = float(os.getenv("KB_WATCH_DEBOUNCE_SECONDS", "2.0"))
+KB_WATCH_MAX_DELAY_SECONDS = float(os.getenv("KB_WATCH_MAX_DELAY_SECONDS", "30"))
+KB_WATCH_POLL_SECONDS = float(os.getenv("KB_WATCH_POLL_SECONDS", "2.0"))
+KB_VERSION_CHECK_SECONDS = float(os.getenv("KB_VERSION_CHECK_SECONDS", "2.0"))
+
+# Versioned (blue/green) index builds: published versions kept on disk for readers still using them
+INDEX_KEEP_VERSIONS = int(os.getenv("INDEX_KEEP_VERSIONS", "3"))
+
+# Context packing: MMR trade-off between relevance (1.0) and diversity (0.0)
+CONTEXT_MMR_LAMBDA = float(os.getenv("CONTEXT_MMR_LAMBDA", "0.7"))
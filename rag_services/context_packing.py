@@ -0,0 +1,142 @@
+"""
+Context Packing
+Post-retrieval stage that turns ranked chunks into prompt context with less
+repetition. Chunks of the same document whose character ranges overlap or touch
+(neighbouring chunks share 100-200 characters) are merged into one passage, then
+MMR picks passages that are relevant to the query but unlike the ones already
+chosen. Both steps use the vectors already in the index; nothing is re-embedded
+unless a chunk has no stored vector.
+"""
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from langchain_core.documents import Document
+
+from .config import CONTEXT_MMR_LAMBDA
+
+
+def _group_key(doc: Document):
+    # doc_id (content hash) is unique per file; source is only the fallback for chunks without one
+    return doc.metadata.get("doc_id") or doc.metadata.get("source")
+
+
+def merge_overlapping(docs: List[Document]) -> List[List[Document]]:
+    """
+    Group chunks into passages: chunks of one document whose [start_index, start_index + len)
+    ranges overlap or touch end up in the same group. Groups keep the rank of their best chunk;
+    chunks without offsets stay alone (exact duplicates are dropped).
+    """
+    groups: List[List[Document]] = []
+    spans: Dict[object, List[list]] = {}  # document -> [[start, end, group], ...]
+    seen_texts = set()
+    for doc in docs:
+        if doc.page_content in seen_texts:
+            continue
+        seen_texts.add(doc.page_content)
+        start = doc.metadata.get("start_index")
+        key = _group_key(doc)
+        if start is None or key is None:
+            groups.append([doc])
+            continue
+        end = start + len(doc.page_content)
+        touching = [span for span in spans.setdefault(key, []) if span[0] <= end and start <= span[1]]
+        if not touching:
+            group = [doc]
+            groups.append(group)
+            spans[key].append([start, end, group])
+            continue
+        # Join every passage this chunk bridges into the highest-ranked one
+        target = touching[0]
+        target[2].append(doc)
+        target[0], target[1] = min(target[0], start), max(target[1], end)
+        for other in touching[1:]:
+            target[2].extend(other[2])
+            target[0], target[1] = min(target[0], other[0]), max(target[1], other[1])
+            groups[:] = [group for group in groups if group is not other[2]]
+            spans[key] = [span for span in spans[key] if span is not other]
+    return groups
+
+
+def merge_group(group: List[Document]) -> Document:
+    """One Document for a group of overlapping chunks (text reassembled in document order)"""
+    if len(group) == 1:
+        return group[0]
+    ordered = sorted(group, key=lambda d: d.metadata["start_index"])
+    text, end = "", None
+    for doc in ordered:
+        start = doc.metadata["start_index"]
+        if end is None:
+            text, end = doc.page_content, start + len(doc.page_content)
+        elif start + len(doc.page_content) > end:
+            text += doc.page_content[end - start:]
+            end = start + len(doc.page_content)
+    metadata = dict(group[0].metadata)
+    pages = [d.metadata[field] for d in group for field in ("page", "page_end") if d.metadata.get(field) is not None]
+    if pages:
+        metadata["page"], metadata["page_end"] = min(pages), max(pages)
+    metadata["start_index"] = ordered[0].metadata["start_index"]
+    metadata["merged_chunks"] = len(group)
+    return Document(page_content=text, metadata=metadata, id=group[0].id)
+
+
+def mmr_select(query_vector: np.ndarray, vectors: np.ndarray, k: int,
+               lambda_mult: float = CONTEXT_MMR_LAMBDA) -> List[int]:
+    """
+    Maximal marginal relevance: greedily pick rows maximizing
+    lambda * sim(query, row) - (1 - lambda) * max sim(row, already picked). Returns row indices.
+    """
+    if len(vectors) == 0 or k <= 0:
+        return []
+    vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    query_vector = query_vector / max(float(np.linalg.norm(query_vector)), 1e-12)
+    relevance = vectors @ query_vector
+    pairwise = vectors @ vectors.T
+    redundancy = np.zeros(len(vectors))  # max similarity to any picked row
+    available = np.ones(len(vectors), dtype=bool)
+    picked = []
+    for _ in range(min(k, len(vectors))):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        redundancy = np.maximum(redundancy, pairwise[best]) if picked else pairwise[best].copy()
+        picked.append(best)
+        available[best] = False
+    return picked
+
+
+def _chunk_vectors(docs: Sequence[Document], index, embeddings) -> np.ndarray:
+    """Stored vectors for docs (by id) from the index; any missing ones are embedded"""
+    stored = index.get_vectors([doc.id for doc in docs if doc.id]) if index is not None else {}
+    missing = [i for i, doc in enumerate(docs) if doc.id not in stored]
+    embedded = embeddings.embed_documents([docs[i].page_content for i in missing]) if missing else []
+    vectors = [None] * len(docs)
+    for i, doc in enumerate(docs):
+        if doc.id in stored:
+            vectors[i] = np.asarray(stored[doc.id], dtype=np.float32)
+    for i, vector in zip(missing, embedded):
+        vectors[i] = np.asarray(vector, dtype=np.float32)
+    return np.vstack(vectors)
+
+
+def pack_context(query: str, docs: List[Document], k: int, index=None, embeddings=None,
+                 lambda_mult: float = CONTEXT_MMR_LAMBDA,
+                 query_vector: Optional[Sequence[float]] = None) -> List[Document]:
+    """
+    Merge overlapping chunks, then MMR-select up to k passages from ranked `docs`.
+    `index` (a VectorIndex) supplies stored chunk vectors; `embeddings` defaults to its model.
+    """
+    groups = merge_overlapping(docs)
+    if len(groups) <= k:
+        return [merge_group(group) for group in groups]
+    embeddings = embeddings or index.embeddings
+    flat = [doc for group in groups for doc in group]
+    vectors = _chunk_vectors(flat, index, embeddings)
+    # A passage is represented by the mean of its chunks' (unit) vectors
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    bounds = np.cumsum([0] + [len(group) for group in groups])
+    passage_vectors = np.add.reduceat(vectors, bounds[:-1], axis=0)
+    if query_vector is None:
+        query_vector = embeddings.embed_query(query)
+    picked = mmr_select(np.asarray(query_vector, dtype=np.float32), passage_vectors, k, lambda_mult)
+    # Keep the retrieval order among the picked passages
+    return [merge_group(groups[i]) for i in sorted(picked)]
@@ -0,0 +1,285 @@
+"""
+Embedding Cache
+Two-tier cache for query embeddings: an in-memory LRU in front of an on-disk
+SQLite store of float32 vectors keyed by (model, normalized text hash).
+Chunk embeddings are cached separately per model in a memory-mapped float32
+matrix indexed by content hash, so re-uploaded or lightly edited documents only
+embed the chunks that actually changed.
+CachedEmbeddings wraps any LangChain embeddings model so every retrieval call
+site shares the same caches.
+"""
+import os
+import re
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from .config import EMBEDDING_CACHE_DIR
+
+
+def normalize_text(text: str) -> str:
+    """Unicode-normalize and collapse whitespace so trivially different queries share a key"""
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+def cache_key(model_name: str, text: str) -> str:
+    return hashlib.sha256(f"{model_name}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+class QueryEmbeddingCache:
+    """In-memory LRU + persistent SQLite store, safe to share between threads"""
+
+    def __init__(self, cache_dir: str = EMBEDDING_CACHE_DIR, max_memory_entries: int = 2048):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, "query_embeddings.sqlite3")
+        self.max_memory_entries = max_memory_entries
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, model TEXT, vector BLOB)"
+        )
+        self._conn.commit()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+    def _remember(self, key: str, vector: np.ndarray):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return vector
+            row = self._conn.execute("SELECT vector FROM embeddings WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            vector = np.frombuffer(row[0], dtype=np.float32)
+            self._remember(key, vector)
+            self.stats["disk_hits"] += 1
+            return vector
+
+    def put(self, key: str, model_name: str, vector: List[float]):
+        array = np.asarray(vector, dtype=np.float32)
+        with self._lock:
+            self._remember(key, array)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO embeddings (key, model, vector) VALUES (?, ?, ?)",
+                (key, model_name, array.tobytes())
+            )
+            self._conn.commit()
+
+    def hit_rate(self) -> float:
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        total = hits + self.stats["misses"]
+        return hits / total if total else 0.0
+
+    def get_stats(self) -> Dict[str, float]:
+        return {**self.stats, "memory_entries": len(self._memory), "hit_rate": round(self.hit_rate(), 3)}
+
+
+_query_cache: Optional[QueryEmbeddingCache] = None
+_query_cache_lock = threading.Lock()
+
+
+def get_query_cache() -> QueryEmbeddingCache:
+    """Get or create the process-wide query embedding cache"""
+    global _query_cache
+    if _query_cache is None:
+        with _query_cache_lock:
+            if _query_cache is None:
+                _query_cache = QueryEmbeddingCache()
+    return _query_cache
+
+
+def embed_queries(embeddings: Embeddings, texts: List[str]) -> List[List[float]]:
+    """Batch query embedding when the model supports it (embed_queries), else one call per query"""
+    if not texts:
+        return []
+    if hasattr(embeddings, "embed_queries"):
+        return embeddings.embed_queries(texts)
+    return [embeddings.embed_query(text) for text in texts]
+
+
+def chunk_key(text: str) -> str:
+    """Chunks are embedded verbatim, so the key is the exact text hash (no normalization)"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class ChunkEmbeddingStore:
+    """
+    Persistent chunk-hash -> vector store for one embedding model.
+    Vectors are float32 rows appended to vectors.f32 and read through np.memmap;
+    index.sqlite3 maps content hash -> row. Appends happen inside a SQLite write
+    transaction, so several processes can share the store.
+    """
+
+    LOOKUP_BATCH = 500
+
+    def __init__(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.vectors_path = os.path.join(directory, "vectors.f32")
+        self._conn = sqlite3.connect(os.path.join(directory, "index.sqlite3"), check_same_thread=False,
+                                     timeout=30, isolation_level=None)
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS rows (key TEXT PRIMARY KEY, row INTEGER NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);"
+        )
+        self._lock = threading.Lock()
+        self._matrix: Optional[np.memmap] = None
+        self.stats = {"hits": 0, "misses": 0}
+
+    def _meta(self, key: str) -> Optional[int]:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _view(self, rows_needed: int, dim: int) -> np.memmap:
+        """Memory-map the vector file, re-mapping when it has grown past the current view"""
+        if self._matrix is None or self._matrix.shape[0] < rows_needed:
+            rows = os.path.getsize(self.vectors_path) // (4 * dim)
+            self._matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(rows, dim))
+        return self._matrix
+
+    def _lookup(self, keys: List[str]) -> Dict[str, int]:
+        found = {}
+        unique = list(dict.fromkeys(keys))
+        for i in range(0, len(unique), self.LOOKUP_BATCH):
+            batch = unique[i:i + self.LOOKUP_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            found.update(self._conn.execute(f"SELECT key, row FROM rows WHERE key IN ({placeholders})", batch))
+        return found
+
+    def get_many(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """Cached vector for each text, or None where it has not been embedded yet"""
+        keys = [chunk_key(text) for text in texts]
+        with self._lock:
+            rows = self._lookup(keys)
+            dim = self._meta("dim")
+            if rows and dim:
+                matrix = self._view(max(rows.values()) + 1, dim)
+                results = [np.array(matrix[rows[key]]) if key in rows else None for key in keys]
+            else:
+                results = [None] * len(keys)
+            hits = sum(result is not None for result in results)
+            self.stats["hits"] += hits
+            self.stats["misses"] += len(keys) - hits
+            return results
+
+    def put_many(self, texts: List[str], vectors: List[List[float]]):
+        matrix = np.asarray(vectors, dtype=np.float32)
+        if matrix.ndim != 2 or not len(matrix):
+            return
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                dim = self._meta("dim") or matrix.shape[1]
+                if dim != matrix.shape[1]:
+                    raise ValueError(f"chunk cache holds {dim}-d vectors, got {matrix.shape[1]}-d")
+                existing = self._lookup([chunk_key(text) for text in texts])
+                new_rows = {}
+                for text, vector in zip(texts, matrix):
+                    key = chunk_key(text)
+                    if key not in existing and key not in new_rows:
+                        new_rows[key] = vector
+                start = self._meta("rows") or 0
+                if new_rows:
+                    # Rows past `start` can only be left over from a crashed writer; overwrite them
+                    with open(self.vectors_path, "r+b" if os.path.exists(self.vectors_path) else "wb") as f:
+                        f.seek(start * dim * 4)
+                        f.write(np.stack(list(new_rows.values())).astype(np.float32).tobytes())
+                    self._conn.executemany(
+                        "INSERT INTO rows (key, row) VALUES (?, ?)",
+                        [(key, start + i) for i, key in enumerate(new_rows)]
+                    )
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                        [("dim", dim), ("rows", start + len(new_rows))]
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def __len__(self) -> int:
+        return self._meta("rows") or 0
+
+
+_chunk_stores: Dict[str, ChunkEmbeddingStore] = {}
+
+
+def get_chunk_store(model_name: str) -> ChunkEmbeddingStore:
+    """Get or create the chunk embedding store for a model"""
+    slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name)
+    with _query_cache_lock:
+        if slug not in _chunk_stores:
+            _chunk_stores[slug] = ChunkEmbeddingStore(os.path.join(EMBEDDING_CACHE_DIR, "chunks", slug))
+        return _chunk_stores[slug]
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    LangChain embeddings wrapper that serves repeated queries from the shared query
+    cache and, when given a chunk store, only embeds document chunks it has not seen.
+    `symmetric` models embed queries like documents, so query batches use one
+    embed_documents call.
+    """
+
+    def __init__(self, base: Embeddings, model_name: str, cache: Optional[QueryEmbeddingCache] = None,
+                 chunk_store: Optional[ChunkEmbeddingStore] = None, symmetric: bool = False):
+        self.base = base
+        self.model_name = model_name
+        self.cache = cache or get_query_cache()
+        self.chunk_store = chunk_store
+        self.symmetric = symmetric
+
+    def embed_query(self, text: str) -> List[float]:
+        key = cache_key(self.model_name, text)
+        vector = self.cache.get(key)
+        if vector is not None:
+            return vector.tolist()
+        result = self.base.embed_query(text)
+        self.cache.put(key, self.model_name, result)
+        return result
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Several queries at once: cached ones from the query cache, the rest in one batched model call"""
+        keys = [cache_key(self.model_name, text) for text in texts]
+        found = {key: self.cache.get(key) for key in dict.fromkeys(keys)}
+        missing = [(key, text) for key, text in dict(zip(keys, texts)).items() if found[key] is None]
+        if missing:
+            texts_to_embed = [text for _, text in missing]
+            if self.symmetric:
+                vectors = self.base.embed_documents(texts_to_embed)
+            else:
+                vectors = embed_queries(self.base, texts_to_embed)
+            for (key, _), vector in zip(missing, vectors):
+                self.cache.put(key, self.model_name, vector)
+                found[key] = np.asarray(vector, dtype=np.float32)
+        return [found[key].tolist() for key in keys]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.chunk_store is None:
+            return self.base.embed_documents(texts)
+        cached = self.chunk_store.get_many(texts)
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, cached) if vector is None))
+        if missing:
+            computed = dict(zip(missing, self.base.embed_documents(missing)))
+            try:
+                self.chunk_store.put_many(missing, [computed[text] for text in missing])
+            except Exception as e:
+                print(f"--- Chunk embedding cache write failed: {e} ---")
+            return [vector.tolist() if vector is not None else list(computed[text])
+                    for text, vector in zip(texts, cached)]
+        return [vector.tolist() for vector in cached]
@@ -0,0 +1,111 @@
+"""
+Embedding Backends
+Pluggable embedding providers for the knowledge base. "local" runs a
+sentence-transformers model on CPU and encodes chunks in batches; "gemini"
+uses the Gemini embedding API. Vectors from different providers are not
+comparable, so each provider gets its own Chroma collection.
+"""
+import os
+import threading
+from typing import Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+from .config import (CHROMA_PATH, FAISS_KB_PATH, KB_INDEX_BACKEND, EMBEDDING_PROVIDER, LOCAL_EMBEDDING_MODEL,
+                     EMBEDDING_BATCH_SIZE, KB_COLLECTION)
+from .embedding_cache import CachedEmbeddings, get_chunk_store
+
+
+class LocalEmbeddings(Embeddings):
+    """sentence-transformers model on CPU with batched encoding"""
+
+    def __init__(self, model_name: str = LOCAL_EMBEDDING_MODEL, batch_size: int = EMBEDDING_BATCH_SIZE,
+                 device: str = "cpu", normalize: bool = True):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.device = device
+        self.normalize = normalize
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    from sentence_transformers import SentenceTransformer
+                    self._model = SentenceTransformer(self.model_name, device=self.device)
+        return self._model
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        vectors = self.model.encode(
+            texts,
+            batch_size=self.batch_size,
+            normalize_embeddings=self.normalize,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+        )
+        return vectors.tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+def _create(provider: str) -> CachedEmbeddings:
+    if provider == "local":
+        model_name = f"local/{LOCAL_EMBEDDING_MODEL}"
+        return CachedEmbeddings(LocalEmbeddings(), model_name=model_name, chunk_store=get_chunk_store(model_name),
+                                symmetric=True)
+    if provider == "gemini":
+        from langchain_google_genai import GoogleGenerativeAIEmbeddings
+        return CachedEmbeddings(
+            GoogleGenerativeAIEmbeddings(
+                model="models/embedding-001",
+                google_api_key=os.getenv("GEMINI_API_KEY")
+            ),
+            model_name="gemini/embedding-001",
+            chunk_store=get_chunk_store("gemini/embedding-001")
+        )
+    raise ValueError(f"Unknown embedding provider: {provider}")
+
+
+_embeddings: Dict[str, CachedEmbeddings] = {}
+_embeddings_lock = threading.Lock()
+
+
+def get_embeddings(provider: Optional[str] = None) -> CachedEmbeddings:
+    """Get the shared (cached) embeddings model for a provider"""
+    provider = (provider or EMBEDDING_PROVIDER).lower()
+    with _embeddings_lock:
+        if provider not in _embeddings:
+            _embeddings[provider] = _create(provider)
+        return _embeddings[provider]
+
+
+def kb_collection_name(provider: Optional[str] = None) -> str:
+    """Chroma collection holding knowledge-base vectors for a provider"""
+    provider = (provider or EMBEDDING_PROVIDER).lower()
+    return KB_COLLECTION if provider == "gemini" else f"{KB_COLLECTION}_{provider}"
+
+
+def kb_index_dir(backend: Optional[str] = None) -> str:
+    """Directory holding the knowledge-base index and its side files (manifest, BM25)"""
+    return FAISS_KB_PATH if (backend or KB_INDEX_BACKEND) == "faiss" else CHROMA_PATH
+
+
+def kb_files(collection_name: str, version_dir: Optional[str] = None, backend: Optional[str] = None) -> Dict[str, str]:
+    """
+    Paths of a knowledge-base collection's vector index directory, BM25 index and ingestion
+    manifest: inside a version directory (see index_version.py), or the flat layout used
+    before versioned builds when version_dir is None.
+    """
+    if version_dir is not None:
+        return {"index": os.path.join(version_dir, "index"), "bm25": os.path.join(version_dir, "bm25.pkl"),
+                "manifest": os.path.join(version_dir, "manifest.json")}
+    backend = (backend or KB_INDEX_BACKEND).lower()
+    root = kb_index_dir(backend)
+    return {"index": os.path.join(root, collection_name) if backend == "faiss" else root,
+            "bm25": os.path.join(root, f"{collection_name}_bm25.pkl"),
+            "manifest": os.path.join(root, f"{collection_name}_manifest.json")}
@@ -0,0 +1,105 @@
+"""
+Metadata Filters
+Scoped retrieval ("only lecture3.pdf", "pages 10-20") is expressed as a plain
+dict and evaluated inside each index: Chroma gets a `where` clause, FAISS an id
+set from its SQLite chunk table, BM25 checks the metadata of its ranked hits. So
+a scoped question never needs a large k followed by filtering in Python.
+
+    {"source": "lecture3.pdf", "page_start": 10, "page_end": 20}
+    {"doc_id": ["28540ab85f1514a6", "affe3a1093871564"], "user_id": "cli_user"}
+
+source/doc_id/user_id take one value or a list. A chunk matches a page range if
+any of its pages (page..page_end, page_end defaulting to page) fall inside it;
+chunks without pages don't. matches(), chroma_where() and sql_where() all apply
+this same rule.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+
+# Metadata keys matched by equality (one value or any of a list)
+MATCH_FIELDS = ("source", "doc_id", "user_id")
+PAGE_FIELDS = ("page_start", "page_end")
+
+
+def normalize_filters(filters: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Drop empty entries and turn single values into lists; None if nothing is left"""
+    if not filters:
+        return None
+    unknown = set(filters) - set(MATCH_FIELDS) - set(PAGE_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown filter fields: {sorted(unknown)} (expected {MATCH_FIELDS + PAGE_FIELDS})")
+    normalized = {}
+    for field in MATCH_FIELDS:
+        value = filters.get(field)
+        if value is not None and value != []:
+            normalized[field] = [str(v) for v in value] if isinstance(value, (list, tuple, set)) else [str(value)]
+    for field in PAGE_FIELDS:
+        if filters.get(field) is not None:
+            normalized[field] = int(filters[field])
+    return normalized or None
+
+
+def build_filters(source: Optional[str] = None, page_start: Optional[int] = None, page_end: Optional[int] = None,
+                  doc_id: Optional[str] = None, user_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Filter dict from keyword arguments (None when nothing is restricted)"""
+    return normalize_filters({"source": source, "page_start": page_start, "page_end": page_end,
+                              "doc_id": doc_id, "user_id": user_id})
+
+
+def matches(metadata: Dict[str, Any], filters: Optional[Dict[str, Any]]) -> bool:
+    """Python-side check (filters as returned by normalize_filters)"""
+    if not filters:
+        return True
+    for field in MATCH_FIELDS:
+        if field in filters and str(metadata.get(field)) not in filters[field]:
+            return False
+    if "page_start" in filters or "page_end" in filters:
+        page = metadata.get("page")
+        if page is None:
+            return False
+        page_end = metadata.get("page_end")
+        if page_end is None:
+            page_end = page
+        if "page_start" in filters and page_end < filters["page_start"]:
+            return False
+        if "page_end" in filters and page > filters["page_end"]:
+            return False
+    return True
+
+
+def chroma_where(filters: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Chroma `where` clause for a filter dict"""
+    filters = normalize_filters(filters)
+    if not filters:
+        return None
+    clauses: List[Dict[str, Any]] = []
+    for field in MATCH_FIELDS:
+        if field in filters:
+            values = filters[field]
+            clauses.append({field: values[0]} if len(values) == 1 else {field: {"$in": values}})
+    if "page_start" in filters:
+        # Chroma has no coalesce(page_end, page); page <= page_end, so either one reaching page_start is the same test
+        clauses.append({"$or": [{"page_end": {"$gte": filters["page_start"]}},
+                                {"page": {"$gte": filters["page_start"]}}]})
+    if "page_end" in filters:
+        clauses.append({"page": {"$lte": filters["page_end"]}})
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+def sql_where(filters: Optional[Dict[str, Any]], column: str = "metadata") -> Tuple[str, List[Any]]:
+    """SQLite WHERE clause (over a JSON metadata column) and its parameters"""
+    filters = normalize_filters(filters)
+    if not filters:
+        return "1", []
+    clauses, params = [], []
+    for field in MATCH_FIELDS:
+        if field in filters:
+            # Same expression as the indexes ChunkStore creates, so SQLite can use them
+            clauses.append(f"json_extract({column}, '$.{field}') IN ({','.join('?' * len(filters[field]))})")
+            params.extend(filters[field])
+    if "page_start" in filters:
+        clauses.append(f"coalesce(json_extract({column}, '$.page_end'), json_extract({column}, '$.page')) >= ?")
+        params.append(filters["page_start"])
+    if "page_end" in filters:
+        clauses.append(f"json_extract({column}, '$.page') <= ?")
+        params.append(filters["page_end"])
+    return " AND ".join(clauses), params
@@ -0,0 +1,147 @@
+"""
+Index Versions
+Blue/green storage for indexes that are rebuilt while being read. Each build
+goes into a fresh version directory (root/v000042) - a copy of the current one
+plus the changes - and is published by atomically replacing root/current.json.
+Files that writers only append to or replace with os.replace (LINKED_FILES) are
+hardlinked into the copy instead, so staging costs roughly the size of the
+SQLite/JSON files rather than of the whole index.
+Readers open whatever the pointer names and keep that directory until they are
+done; a version is only deleted once newer ones have been published for a while
+(INDEX_KEEP_VERSIONS). Retrievers in other processes (the agent, the API server)
+compare the published version with the one they opened and reload when it moves.
+"""
+import os
+import re
+import json
+import time
+import shutil
+import fnmatch
+from typing import Optional, Sequence, Tuple
+
+from .config import INDEX_KEEP_VERSIONS
+from .embeddings import kb_index_dir
+
+POINTER_FILE = "current.json"
+_VERSION_DIR = re.compile(r"^v(\d{6})$")
+# Never modified in place, so a staged version can share them with the published one:
+# vector/code rows are only appended (readers map just their committed rows) and the
+# rest is rewritten through a temp file + os.replace
+LINKED_FILES = ("vectors.f32", "codes.*", "vectors.index", "bm25.pkl", "manifest.json")
+
+
+class VersionedDirectory:
+    """root/current.json -> root/vNNNNNN; one writer at a time, any number of readers"""
+
+    def __init__(self, root: str, keep: int = INDEX_KEEP_VERSIONS):
+        self.root = root
+        self.keep = max(1, keep)
+        # Cost of the last stage(): bytes copied, bytes hardlinked and seconds taken
+        self.last_stage = {"copied_bytes": 0, "linked_bytes": 0, "seconds": 0.0}
+
+    @property
+    def pointer_path(self) -> str:
+        return os.path.join(self.root, POINTER_FILE)
+
+    def path(self, version: int) -> str:
+        return os.path.join(self.root, f"v{version:06d}")
+
+    def version(self) -> Optional[int]:
+        """Published version (None if nothing was published yet)"""
+        try:
+            with open(self.pointer_path, "r", encoding="utf-8") as f:
+                return int(json.load(f)["version"])
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def current(self) -> Tuple[Optional[int], Optional[str]]:
+        """(version, directory) of the published version, or (None, None)"""
+        version = self.version()
+        return (version, self.path(version)) if version is not None else (None, None)
+
+    def _existing(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(int(m.group(1)) for m in map(_VERSION_DIR.match, os.listdir(self.root)) if m)
+
+    def stage(self, copy_from: Optional[str] = None, ignore=None,
+              link: Sequence[str] = LINKED_FILES) -> Tuple[int, str]:
+        """
+        Create the next version directory (a copy of `copy_from`, else empty) for a build.
+        Files matching a `link` pattern are hardlinked (copied where the filesystem can't).
+        Nothing reads it until publish().
+        """
+        start = time.perf_counter()
+        version = max(self._existing() + [self.version() or 0]) + 1
+        path = self.path(version)
+        cost = {"copied_bytes": 0, "linked_bytes": 0}
+
+        def link_or_copy(src, dst):
+            size = os.path.getsize(src)
+            if any(fnmatch.fnmatch(os.path.basename(src), pattern) for pattern in link):
+                try:
+                    os.link(src, dst)
+                    cost["linked_bytes"] += size
+                    return dst
+                except OSError:
+                    pass
+            cost["copied_bytes"] += size
+            return shutil.copy2(src, dst)
+
+        if copy_from and os.path.isdir(copy_from):
+            shutil.copytree(copy_from, path, ignore=ignore, copy_function=link_or_copy)
+        else:
+            os.makedirs(path)
+        self.last_stage = {**cost, "seconds": time.perf_counter() - start}
+        return version, path
+
+    def publish(self, version: int):
+        """Point readers at `version` (atomic rename), then drop versions older than the last `keep`"""
+        tmp_path = f"{self.pointer_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": version, "path": os.path.basename(self.path(version)),
+                       "published": time.time()}, f)
+        os.replace(tmp_path, self.pointer_path)
+        self.prune()
+
+    def discard(self, version: int):
+        """Remove a staged version that failed to build"""
+        shutil.rmtree(self.path(version), ignore_errors=True)
+
+    def prune(self):
+        current = self.version()
+        existing = self._existing()
+        # Unpublished builds newer than the pointer are abandoned stages
+        stale = [v for v in existing if current is not None and v > current]
+        published = [v for v in existing if current is None or v <= current]
+        stale += published[:-self.keep]
+        for version in stale:
+            # Open files in another process keep a removed version readable on POSIX;
+            # where removal fails (Windows), the next prune tries again
+            shutil.rmtree(self.path(version), ignore_errors=True)
+
+
+class IndexSnapshot:
+    """One opened version: vector index + keyword index, with a count of queries using it"""
+
+    def __init__(self, version: Optional[int], store, keyword_index):
+        self.version = version
+        self.store = store
+        self.keyword_index = keyword_index
+        self.readers = 0
+        self.retired = False
+
+    def close_if_unused(self):
+        """Close the store once it has been replaced and its last query has finished"""
+        if self.retired and self.readers == 0 and self.store is not None:
+            self.store.close()
+
+
+def kb_versions(collection_name: str, backend: Optional[str] = None) -> VersionedDirectory:
+    """Versions of a knowledge-base collection"""
+    return VersionedDirectory(os.path.join(kb_index_dir(backend), f"{collection_name}_versions"))
+
+
+def read_version(collection_name: str, backend: Optional[str] = None) -> Optional[int]:
+    """Published version of a knowledge-base collection (None before the first versioned build)"""
+    return kb_versions(collection_name, backend).version()
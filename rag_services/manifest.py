@@ -0,0 +1,89 @@
+"""
+Ingestion Manifest
+Records, per source file, its size, mtime, content hash and the ids of the
+chunks it produced, so ingestion only re-embeds new or changed files and can
+remove the chunks of deleted ones.
+"""
+import os
+import json
+import hashlib
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_ids_for(rel_path: str, content_hash: str, count: int, start: int = 0) -> List[str]:
+    """Deterministic chunk ids: same file + same content -> same ids (chunks start..start+count-1)"""
+    path_key = hashlib.sha1(rel_path.encode("utf-8")).hexdigest()[:8]
+    return [f"{path_key}-{content_hash[:12]}-{i}" for i in range(start, start + count)]
+
+
+def in_scope(rel_path: str, scope: Iterable[str]) -> bool:
+    """True if rel_path is one of the scope paths or lies under one of them"""
+    return any(rel_path == path or rel_path.startswith(path.rstrip(os.sep) + os.sep) for path in scope)
+
+
+class IngestManifest:
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[str, dict] = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f).get("files", {})
+
+    def diff(self, files: Iterable[Tuple[str, str]], scope: Optional[Iterable[str]] = None):
+        """
+        Compare (rel_path, abs_path) pairs against the manifest.
+
+        Returns:
+            (changed, deleted): changed is a list of (rel_path, abs_path, sha256) for new or
+            modified files; deleted is a list of rel_paths no longer present.
+        Files whose size and mtime are unchanged are skipped without hashing. With `scope`
+        (rel paths of files or directories) only entries under those paths can be deleted.
+        """
+        changed = []
+        seen = set()
+        for rel_path, abs_path in files:
+            seen.add(rel_path)
+            stat = os.stat(abs_path)
+            entry = self.entries.get(rel_path)
+            if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+                continue
+            content_hash = file_sha256(abs_path)
+            if entry and entry["sha256"] == content_hash:
+                # Touched but identical: just refresh the stat fields
+                entry["size"], entry["mtime_ns"] = stat.st_size, stat.st_mtime_ns
+                continue
+            changed.append((rel_path, abs_path, content_hash))
+        deleted = [rel_path for rel_path in self.entries
+                   if rel_path not in seen and (scope is None or in_scope(rel_path, scope))]
+        return changed, deleted
+
+    def chunk_ids(self, rel_path: str) -> List[str]:
+        entry = self.entries.get(rel_path)
+        return list(entry["chunk_ids"]) if entry else []
+
+    def update(self, rel_path: str, abs_path: str, content_hash: str, chunk_ids: List[str]):
+        stat = os.stat(abs_path)
+        self.entries[rel_path] = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": content_hash,
+            "chunk_ids": chunk_ids,
+        }
+
+    def remove(self, rel_path: str):
+        self.entries.pop(rel_path, None)
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"files": self.entries}, f, indent=1)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,106 @@
+"""
+Parallel OCR for Scanned PDFs
+Text-less pages are OCR'd across a process pool, one page per task. Each
+embedded image is OCR'd once and cached by a hash of its bytes, so uploading
+the same lecture notes again skips Tesseract. Pages whose text is vector-drawn
+(no embedded images, or images without readable text) are rendered at OCR_DPI
+and the rendered page is OCR'd instead.
+"""
+import io
+import os
+import sqlite3
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Optional, Tuple
+
+from .config import OCR_CACHE_DIR, OCR_DPI, OCR_LANG, OCR_WORKERS
+
+
+class OcrCache:
+    """SQLite map of image-bytes hash -> OCR text (safe to open from several processes)"""
+
+    def __init__(self, cache_dir: str = OCR_CACHE_DIR):
+        os.makedirs(cache_dir, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(cache_dir, "ocr.sqlite3"), timeout=30)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS ocr (key TEXT PRIMARY KEY, text TEXT NOT NULL)")
+        self._conn.commit()
+
+    @staticmethod
+    def key(image_bytes: bytes, lang: str) -> str:
+        return hashlib.sha256(image_bytes).hexdigest() + ":" + lang
+
+    def get(self, key: str) -> Optional[str]:
+        row = self._conn.execute("SELECT text FROM ocr WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def put(self, key: str, text: str):
+        self._conn.execute("INSERT OR REPLACE INTO ocr (key, text) VALUES (?, ?)", (key, text))
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+
+def _ocr_image(image_bytes: bytes, cache: OcrCache, lang: str, counts: Dict[str, int]) -> str:
+    key = OcrCache.key(image_bytes, lang)
+    text = cache.get(key)
+    if text is not None:
+        counts["cached"] += 1
+        return text
+    import pytesseract
+    from PIL import Image
+
+    text = pytesseract.image_to_string(Image.open(io.BytesIO(image_bytes)), lang=lang)
+    cache.put(key, text)
+    counts["ocr"] += 1
+    return text
+
+
+def ocr_page(file_path: str, page_number: int, dpi: int = OCR_DPI, lang: str = OCR_LANG,
+             cache_dir: str = OCR_CACHE_DIR) -> Tuple[int, str, Dict[str, int]]:
+    """OCR one page (1-based); returns (page_number, text, {"ocr": n, "cached": n, "rendered": 0/1})"""
+    import fitz
+
+    counts = {"ocr": 0, "cached": 0, "rendered": 0}
+    cache = OcrCache(cache_dir)
+    try:
+        with fitz.open(file_path) as doc:
+            page = doc.load_page(page_number - 1)
+            texts = []
+            for image in page.get_images(full=True):
+                extracted = doc.extract_image(image[0])
+                if extracted and extracted.get("image"):
+                    texts.append(_ocr_image(extracted["image"], cache, lang, counts))
+            text = "\n".join(t for t in texts if t.strip())
+            if not text.strip():
+                # Vector-drawn text (or unreadable images): OCR the rendered page instead
+                pixmap = page.get_pixmap(dpi=dpi)
+                text = _ocr_image(pixmap.tobytes("png"), cache, lang, counts)
+                counts["rendered"] = 1
+            return page_number, text, counts
+    finally:
+        cache.close()
+
+
+def ocr_pages(file_path: str, page_numbers: Iterable[int], workers: int = OCR_WORKERS,
+              dpi: int = OCR_DPI, lang: str = OCR_LANG) -> Dict[int, str]:
+    """OCR several pages of one PDF in parallel; returns {page_number: text}"""
+    page_numbers = list(page_numbers)
+    if not page_numbers:
+        return {}
+    if workers <= 1 or len(page_numbers) == 1:
+        outputs = [ocr_page(file_path, n, dpi, lang) for n in page_numbers]
+    else:
+        count = len(page_numbers)
+        with ProcessPoolExecutor(max_workers=min(workers, count)) as executor:
+            outputs = list(executor.map(ocr_page, [file_path] * count, page_numbers, [dpi] * count, [lang] * count))
+
+    results = {}
+    totals = {"ocr": 0, "cached": 0, "rendered": 0}
+    for page_number, text, counts in outputs:
+        results[page_number] = text
+        for name, value in counts.items():
+            totals[name] += value
+    print(f"--- OCR: {len(page_numbers)} pages, {totals['ocr']} images OCR'd, {totals['cached']} from cache, "
+          f"{totals['rendered']} rendered at {dpi} DPI ---")
+    return results
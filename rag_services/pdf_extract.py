@@ -0,0 +1,155 @@
+"""
+PDF Text Extraction
+Single PDF text layer for ingestion, the quiz/flashcard services and the
+notebook. Uses PyMuPDF (much faster than pypdf on large files), splits the page
+range of big PDFs across worker processes, and caches the extracted pages in
+SQLite by file content hash so the same upload is never parsed twice.
+Sequential extraction and cache reads stream one page at a time; cache rows
+are written as pages are produced.
+"""
+import os
+import sqlite3
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from .config import PDF_CACHE_DIR, PDF_EXTRACT_WORKERS, PDF_PARALLEL_MIN_PAGES
+from .manifest import file_sha256
+
+# Bump when extraction output changes so stale cache entries are ignored
+EXTRACTOR_VERSION = "pymupdf-1"
+# Pages per cache read / write transaction
+CACHE_BATCH_PAGES = 32
+
+
+class PdfTextCache:
+    """file hash -> per-page text; a file is only served once all of its pages were stored"""
+
+    def __init__(self, cache_dir: str = PDF_CACHE_DIR):
+        os.makedirs(cache_dir, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(cache_dir, "pdf_text.sqlite3"), check_same_thread=False,
+                                     timeout=30)
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS files (key TEXT PRIMARY KEY, pages INTEGER NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS pages (key TEXT NOT NULL, page INTEGER NOT NULL, text TEXT NOT NULL,"
+            "  PRIMARY KEY (key, page));"
+        )
+        self._lock = threading.Lock()
+
+    def has(self, key: str) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM files WHERE key = ?", (key,)).fetchone() is not None
+
+    def iter_pages(self, key: str) -> Iterator[Tuple[int, str]]:
+        """Stored pages in order, read from the cursor a batch at a time"""
+        with self._lock:
+            cursor = self._conn.execute("SELECT page, text FROM pages WHERE key = ? ORDER BY page", (key,))
+        try:
+            while True:
+                with self._lock:
+                    rows = cursor.fetchmany(CACHE_BATCH_PAGES)
+                if not rows:
+                    return
+                yield from rows
+        finally:
+            cursor.close()
+
+    def _write(self, key: str, rows: List[Tuple[int, str]]):
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO pages (key, page, text) VALUES (?, ?, ?)",
+                                   [(key, page, text) for page, text in rows])
+
+    def store_pages(self, key: str, pages: Iterable[Tuple[int, str]]) -> Iterator[Tuple[int, str]]:
+        """
+        Pass `pages` through while writing them to the cache; the file is only marked complete
+        (and served by has/iter_pages) once the last page was stored.
+        """
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM files WHERE key = ?", (key,))
+            self._conn.execute("DELETE FROM pages WHERE key = ?", (key,))
+        batch, count = [], 0
+        for page, text in pages:
+            batch.append((page, text))
+            count += 1
+            if len(batch) == CACHE_BATCH_PAGES:
+                self._write(key, batch)
+                batch = []
+            yield page, text
+        self._write(key, batch)
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO files (key, pages) VALUES (?, ?)", (key, count))
+
+
+_cache: Optional[PdfTextCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_pdf_cache() -> PdfTextCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = PdfTextCache()
+        return _cache
+
+
+def page_count(file_path: str) -> int:
+    import fitz
+
+    with fitz.open(file_path) as doc:
+        return doc.page_count
+
+
+def iter_page_range(file_path: str, start: int, end: int) -> Iterator[Tuple[int, str]]:
+    """Yield (page_number, text) for 1-based pages start..end-1, one page at a time"""
+    import fitz
+
+    with fitz.open(file_path) as doc:
+        for number in range(start, end):
+            yield number, doc.load_page(number - 1).get_text()
+
+
+def extract_page_range(file_path: str, start: int, end: int) -> List[Tuple[int, str]]:
+    """(page_number, text) for 1-based pages start..end-1 (the body of a worker process)"""
+    return list(iter_page_range(file_path, start, end))
+
+
+def _page_ranges(count: int, parts: int) -> List[Tuple[int, int]]:
+    step = -(-count // parts)
+    return [(start, min(start + step, count + 1)) for start in range(1, count + 1, step)]
+
+
+def iter_pdf_text(file_path: str, workers: Optional[int] = None,
+                  use_cache: bool = True) -> Iterator[Tuple[int, str]]:
+    """
+    Yield (page_number, text) for every page of a PDF in order (text may be empty
+    for scanned pages). Large files are split into page ranges across `workers`
+    processes (each range is yielded once its process is done); otherwise pages
+    are read and yielded one at a time. Pass workers=1 when already running inside
+    a worker process.
+    """
+    key = f"{file_sha256(file_path)}:{EXTRACTOR_VERSION}" if use_cache else None
+    if key and get_pdf_cache().has(key):
+        yield from get_pdf_cache().iter_pages(key)
+        return
+
+    pages = _extract_pages(file_path, PDF_EXTRACT_WORKERS if workers is None else workers)
+    if key:
+        pages = get_pdf_cache().store_pages(key, pages)
+    yield from pages
+
+
+def _extract_pages(file_path: str, workers: int) -> Iterator[Tuple[int, str]]:
+    count = page_count(file_path)
+    if workers > 1 and count >= PDF_PARALLEL_MIN_PAGES:
+        ranges = _page_ranges(count, workers)
+        with ProcessPoolExecutor(max_workers=len(ranges)) as executor:
+            futures = [executor.submit(extract_page_range, file_path, start, end) for start, end in ranges]
+            for future in futures:
+                yield from future.result()
+    else:
+        yield from iter_page_range(file_path, 1, count + 1)
+
+
+def extract_pdf_text(file_path: str, workers: Optional[int] = None) -> str:
+    """Whole-document text (pages joined in order)"""
+    return "".join(text if text.endswith("\n") else text + "\n" for _, text in iter_pdf_text(file_path, workers))
@@ -0,0 +1,98 @@
+"""
+Speculative RAG Prefetch
+Starts the knowledge-base search for a query while the router nodes run, so the
+retrieval tool can answer instantly if the model asks for the same (or a
+near-same) query. Unused results simply expire.
+"""
+import re
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+STOPWORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "be", "of", "in", "on", "at", "to", "for",
+    "and", "or", "what", "who", "whom", "which", "how", "why", "when", "where", "do", "does",
+    "did", "can", "could", "please", "tell", "me", "about", "explain", "i", "you", "it", "this",
+    "that", "with", "from", "by", "my", "your", "give", "find", "search", "information",
+}
+
+
+def query_terms(query: str) -> frozenset:
+    """Normalize a query into its set of content words"""
+    words = re.findall(r"\w+", query.lower())
+    return frozenset(w for w in words if w not in STOPWORDS)
+
+
+def similarity(a: frozenset, b: frozenset) -> float:
+    """Jaccard similarity of two term sets"""
+    if not a or not b:
+        return 1.0 if a == b else 0.0
+    return len(a & b) / len(a | b)
+
+
+class SpeculativePrefetcher:
+    """Runs `search_fn(query)` ahead of time and hands the result to a matching later request"""
+
+    def __init__(self, search_fn: Callable[[str], Any], max_entries: int = 32,
+                 ttl_seconds: float = 120.0, min_similarity: float = 0.6, min_terms: int = 2):
+        self.search_fn = search_fn
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.min_similarity = min_similarity
+        self.min_terms = min_terms
+        self._entries: "OrderedDict[frozenset, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="rag-prefetch")
+        self.stats = {"started": 0, "hits": 0, "misses": 0, "expired": 0}
+
+    def _evict(self, now: float):
+        for key in [k for k, (_, created) in self._entries.items() if now - created > self.ttl_seconds]:
+            self._entries.pop(key)
+            self.stats["expired"] += 1
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats["expired"] += 1
+
+    def start(self, query: str) -> bool:
+        """Kick off a background search for `query` (no-op for greetings / trivial queries)"""
+        terms = query_terms(query)
+        if len(terms) < self.min_terms:
+            return False
+        with self._lock:
+            now = time.monotonic()
+            self._evict(now)
+            if terms in self._entries:
+                return True
+            future = self._executor.submit(self.search_fn, query)
+            self._entries[terms] = (future, now)
+            self.stats["started"] += 1
+        return True
+
+    def take(self, query: str, timeout: float = 10.0) -> Optional[Any]:
+        """
+        Return the prefetched result for a near-same query, or None.
+        A matching entry is consumed; if its search failed, None is returned.
+        """
+        terms = query_terms(query)
+        with self._lock:
+            self._evict(time.monotonic())
+            best_key, best_score = None, 0.0
+            for key in self._entries:
+                score = similarity(terms, key)
+                if score > best_score:
+                    best_key, best_score = key, score
+            if best_key is None or best_score < self.min_similarity:
+                self.stats["misses"] += 1
+                return None
+            future: Future = self._entries.pop(best_key)[0]
+
+        try:
+            result = future.result(timeout=timeout)
+        except Exception as e:
+            print(f"--- RAG Prefetch failed, searching again: {e} ---")
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        return result
@@ -0,0 +1,81 @@
+"""
+Cross-Encoder Reranker
+Scores (query, chunk) pairs with a cross-encoder in one batched forward pass
+and keeps only the best few, so the LLM prompt gets fewer, better chunks.
+Scores are cached per (query, chunk) hash.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+
+from langchain_core.documents import Document
+
+DEFAULT_RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+
+def _pair_key(query: str, text: str) -> str:
+    return hashlib.sha1(f"{query}\0{text}".encode("utf-8")).hexdigest()
+
+
+class CrossEncoderReranker:
+    def __init__(self, model_name: str = DEFAULT_RERANK_MODEL, max_cache_entries: int = 8192):
+        self.model_name = model_name
+        self.max_cache_entries = max_cache_entries
+        self._model = None
+        self._cache: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    from sentence_transformers import CrossEncoder
+                    self._model = CrossEncoder(self.model_name)
+        return self._model
+
+    def score(self, query: str, docs: List[Document]) -> List[float]:
+        """Relevance scores for each doc; uncached pairs go through the model in a single batch"""
+        keys = [_pair_key(query, doc.page_content) for doc in docs]
+        scores = []
+        with self._lock:
+            for key in keys:
+                value = self._cache.get(key)
+                if value is not None:
+                    self._cache.move_to_end(key)  # LRU: a hit makes the pair recent again
+                scores.append(value)
+        missing = [i for i, s in enumerate(scores) if s is None]
+        if missing:
+            pairs = [(query, docs[i].page_content) for i in missing]
+            predicted = self.model.predict(pairs, batch_size=len(pairs), show_progress_bar=False)
+            with self._lock:
+                for i, value in zip(missing, predicted):
+                    scores[i] = float(value)
+                    self._cache[keys[i]] = float(value)
+                while len(self._cache) > self.max_cache_entries:
+                    self._cache.popitem(last=False)
+        return scores
+
+    def rerank(self, query: str, docs: List[Document], top_n: int = 3) -> List[Document]:
+        """
+        Return the top_n docs by cross-encoder score, as copies with the score in
+        metadata['rerank_score'] (the input docs may be shared with other callers)
+        """
+        if not docs:
+            return []
+        scores = self.score(query, docs)
+        ranked = sorted(zip(docs, scores), key=lambda item: item[1], reverse=True)[:top_n]
+        return [Document(page_content=doc.page_content, metadata={**doc.metadata, "rerank_score": score}, id=doc.id)
+                for doc, score in ranked]
+
+
+_reranker: Optional[CrossEncoderReranker] = None
+
+
+def get_reranker() -> CrossEncoderReranker:
+    """Get or create the shared reranker (the model loads on first use)"""
+    global _reranker
+    if _reranker is None:
+        _reranker = CrossEncoderReranker()
+    return _reranker
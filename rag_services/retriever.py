@@ -0,0 +1,130 @@
+"""
+Knowledge Base Retriever
+Process-wide handle on the knowledge-base vector index (Chroma or FAISS, see
+KB_INDEX_BACKEND). The embeddings model and the index are opened once and
+shared by all tool calls, and reopened when ingestion (possibly in another
+process, e.g. kb_watcher.py) publishes a new index version. Each query holds
+the version it started on; a replaced version is closed once its last query
+finishes.
+"""
+import time
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+from .embeddings import kb_collection_name, kb_files
+from .bm25 import BM25Index, hybrid_search
+from .vector_index import VectorIndex, open_kb_index
+from .context_packing import pack_context
+from .index_version import IndexSnapshot, kb_versions
+from .config import KB_VERSION_CHECK_SECONDS
+
+
+class KnowledgeRetriever:
+    def __init__(self, provider: Optional[str] = None, backend: Optional[str] = None):
+        self.provider = provider
+        self.backend = backend
+        self.collection_name = kb_collection_name(provider)
+        self._snapshot: Optional[IndexSnapshot] = None
+        self._lock = threading.RLock()
+        self._version_checked = 0.0
+
+    def _open(self) -> IndexSnapshot:
+        # Read the pointer once so the vector and keyword indexes come from the same version
+        version, directory = kb_versions(self.collection_name, self.backend).current()
+        files = kb_files(self.collection_name, directory, self.backend)
+        store = open_kb_index(self.provider, self.backend, version_dir=directory)
+        print(f"--- Retriever: opened {store.backend} index '{self.collection_name}' "
+              f"(version {version if version is not None else 'legacy'}) ---")
+        return IndexSnapshot(version, store, BM25Index.load(files["bm25"], lookup=store.get_documents))
+
+    @property
+    def is_open(self) -> bool:
+        return self._snapshot is not None
+
+    def _check_version(self):
+        """Swap in a newer published version (checked at most every KB_VERSION_CHECK_SECONDS)"""
+        now = time.monotonic()
+        if now - self._version_checked < KB_VERSION_CHECK_SECONDS:
+            return
+        self._version_checked = now
+        if kb_versions(self.collection_name, self.backend).version() != self._snapshot.version:
+            self.reload()
+
+    def _current(self) -> IndexSnapshot:
+        with self._lock:
+            if self._snapshot is not None:
+                self._check_version()
+            if self._snapshot is None:
+                self._snapshot = self._open()
+                self._version_checked = time.monotonic()
+            return self._snapshot
+
+    @contextmanager
+    def _reading(self):
+        """Pin the current version for the duration of one query"""
+        with self._lock:
+            snapshot = self._current()
+            snapshot.readers += 1
+        try:
+            yield snapshot
+        finally:
+            with self._lock:
+                snapshot.readers -= 1
+                snapshot.close_if_unused()
+
+    @property
+    def store(self) -> VectorIndex:
+        """The shared vector index, opened on first use (pinned only by the search methods)"""
+        return self._current().store
+
+    def warm(self):
+        """Open the collection and load its index segments into memory (call at startup)"""
+        try:
+            with self._reading() as snapshot:
+                snapshot.store.warm()
+                print(f"--- Retriever: warmed '{self.collection_name}' ({len(snapshot.store)} chunks) ---")
+        except Exception as e:
+            print(f"--- Retriever warm-up failed: {e} ---")
+
+    @staticmethod
+    def _hybrid(snapshot: IndexSnapshot, query: str, k: int, filters: Optional[Dict[str, Any]]) -> List:
+        store = snapshot.store
+        return hybrid_search(
+            lambda q, n: store.similarity_search(q, k=n, filters=filters), snapshot.keyword_index, query, k=k,
+            filters=filters
+        )
+
+    def search(self, query: str, k: int = 3, filters: Optional[Dict[str, Any]] = None) -> List:
+        """
+        Top-k chunks for `query` by vector + BM25 rank fusion (safe from concurrent tool threads).
+        `filters` (source, page range, ...; see filters.py) are applied inside both indexes.
+        """
+        with self._reading() as snapshot:
+            return self._hybrid(snapshot, query, k, filters)
+
+    def search_context(self, query: str, k: int = 3, candidates: int = 8,
+                       filters: Optional[Dict[str, Any]] = None) -> List:
+        """Up to k prompt-ready passages: `candidates` hits with overlapping chunks merged and MMR applied"""
+        with self._reading() as snapshot:
+            docs = self._hybrid(snapshot, query, candidates, filters)
+            return pack_context(query, docs, k=k, index=snapshot.store)
+
+    def batch_search(self, queries: List[str], k: int = 3,
+                     filters: Optional[Dict[str, Any]] = None) -> List[List]:
+        """Vector-only top-k for many sub-topic queries (one embedding batch, one index search)"""
+        with self._reading() as snapshot:
+            return [[doc for doc, _ in hits] for hits in snapshot.store.batch_search(queries, k=k, filters=filters)]
+
+    def reload(self):
+        """Retire the open version; the next search opens the latest published one"""
+        with self._lock:
+            snapshot, self._snapshot = self._snapshot, None
+            if snapshot is not None:
+                snapshot.retired = True
+                snapshot.close_if_unused()
+        print(f"--- Retriever: reloaded '{self.collection_name}' ---")
+
+
+# Singleton instance
+retriever = KnowledgeRetriever()
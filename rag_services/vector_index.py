@@ -0,0 +1,964 @@
+"""
+Vector Index Backends
+One interface over the two vector stores in the project: Chroma (knowledge base)
+and FAISS (NotebookLM documents). Callers add/delete/search through VectorIndex
+and pick the backend per workload; benchmarks/bench_vector_index.py compares them.
+Scores are always higher-is-better. Searches take optional metadata filters
+(see filters.py) that each backend evaluates inside the index.
+"""
+import os
+import math
+import time
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from .chunk_store import ChunkStore
+from .embedding_cache import embed_queries
+from .filters import chroma_where, matches, normalize_filters
+from .quantization import encode_blocks, get_codec, scan
+from .config import (FAISS_INDEX_TYPE, FAISS_HNSW_MIN_VECTORS, FAISS_IVFPQ_MIN_VECTORS, FAISS_HNSW_M,
+                     FAISS_HNSW_EF_CONSTRUCTION, FAISS_HNSW_EF_SEARCH, FAISS_IVF_NPROBE, FAISS_TRAIN_SAMPLE,
+                     FAISS_TOMBSTONE_RATIO, FAISS_QUANTIZATION, FAISS_RESCORE_FACTOR)
+
+BACKENDS = ("chroma", "faiss")
+# Extra hits fetched per query in batch_search to cover dropped duplicates
+BATCH_DEDUP_SLACK = 2
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _unique_texts(hits: List[Tuple[Document, float]]) -> List[Tuple[Document, float]]:
+    seen, unique = set(), []
+    for doc, score in hits:
+        if doc.page_content not in seen:
+            seen.add(doc.page_content)
+            unique.append((doc, score))
+    return unique
+
+
+def merge_results(results: List[List[Tuple[Document, float]]], limit: Optional[int] = None) -> List[Document]:
+    """
+    Flatten batch_search results into one document list, taking each query's next best
+    hit in turn so every query contributes; chunks found by several queries appear once.
+    """
+    merged, seen = [], set()
+    for rank in range(max((len(hits) for hits in results), default=0)):
+        for hits in results:
+            if rank < len(hits):
+                doc = hits[rank][0]
+                key = doc.id or doc.page_content
+                if key not in seen:
+                    seen.add(key)
+                    merged.append(doc)
+    return merged[:limit] if limit is not None else merged
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+
+class VectorIndex(ABC):
+    """Common operations every vector backend supports"""
+
+    backend = ""
+
+    def __init__(self, embeddings: Embeddings):
+        self.embeddings = embeddings
+
+    @abstractmethod
+    def add(self, documents: List[Document], ids: List[str], vectors: Optional[Sequence[Sequence[float]]] = None):
+        """Insert or replace documents; pass precomputed `vectors` to skip embedding"""
+
+    @abstractmethod
+    def delete(self, ids: List[str]):
+        """Remove documents by id (unknown ids are ignored)"""
+
+    @abstractmethod
+    def search_by_vector(self, vector: Sequence[float], k: int = 4,
+                         filters: Optional[Dict[str, Any]] = None) -> List[Tuple[Document, float]]:
+        """Top-k (document, score) for an already embedded query, among chunks matching `filters`"""
+
+    def search_by_vectors(self, vectors: Sequence[Sequence[float]], k: int = 4,
+                          filters: Optional[Dict[str, Any]] = None) -> List[List[Tuple[Document, float]]]:
+        """Top-k per query vector; backends override this to search all of them in one call"""
+        return [self.search_by_vector(vector, k, filters) for vector in vectors]
+
+    @abstractmethod
+    def get_vectors(self, ids: List[str]) -> Dict[str, np.ndarray]:
+        """Stored vectors by document id (unknown ids are left out)"""
+
+    @abstractmethod
+    def get_documents(self, ids: List[str]) -> Dict[str, Document]:
+        """Stored chunks (text and metadata) by document id (unknown ids are left out)"""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """Number of stored documents"""
+
+    @abstractmethod
+    def stats(self) -> Dict[str, Any]:
+        """Backend name, size and memory/disk footprint"""
+
+    @abstractmethod
+    def persist(self):
+        """Flush the index to disk"""
+
+    def search(self, query: str, k: int = 4, filters: Optional[Dict[str, Any]] = None) -> List[Tuple[Document, float]]:
+        if len(self) == 0:
+            return []
+        return self.search_by_vector(self.embeddings.embed_query(query), k, filters)
+
+    def batch_search(self, queries: List[str], k: int = 4,
+                     filters: Optional[Dict[str, Any]] = None) -> List[List[Tuple[Document, float]]]:
+        """
+        Top-k for many queries: one batched embedding call and one matrix search.
+        Each query's list has no repeated chunk text (the same passage stored under two ids).
+        """
+        if not queries or len(self) == 0:
+            return [[] for _ in queries]
+        vectors = embed_queries(self.embeddings, list(queries))
+        # Over-fetch a little so dropping duplicate texts still leaves k results
+        results = self.search_by_vectors(vectors, k + BATCH_DEDUP_SLACK, filters)
+        return [_unique_texts(hits)[:k] for hits in results]
+
+    def similarity_search(self, query: str, k: int = 4, filters: Optional[Dict[str, Any]] = None) -> List[Document]:
+        """LangChain-style helper returning documents only"""
+        return [doc for doc, _ in self.search(query, k, filters)]
+
+    def warm(self):
+        """Load index structures into memory ahead of the first query"""
+
+    def close(self):
+        """Release backend resources"""
+
+
+class ChromaVectorIndex(VectorIndex):
+    """Persistent Chroma collection; scores are negated distances"""
+
+    backend = "chroma"
+
+    def __init__(self, collection_name: str, embeddings: Embeddings, persist_directory: str):
+        super().__init__(embeddings)
+        from langchain_chroma import Chroma
+
+        self.collection_name = collection_name
+        self.persist_directory = persist_directory
+        self.store = Chroma(
+            collection_name=collection_name,
+            embedding_function=embeddings,
+            persist_directory=persist_directory
+        )
+
+    @property
+    def collection(self):
+        return self.store._collection
+
+    def add(self, documents, ids, vectors=None):
+        if not documents:
+            return
+        texts = [doc.page_content for doc in documents]
+        if vectors is None:
+            vectors = self.embeddings.embed_documents(texts)
+        self.collection.upsert(
+            ids=list(ids),
+            embeddings=[list(map(float, v)) for v in vectors],
+            documents=texts,
+            metadatas=[doc.metadata or None for doc in documents]
+        )
+
+    def delete(self, ids):
+        if ids:
+            self.collection.delete(ids=list(ids))
+
+    def search_by_vector(self, vector, k=4, filters=None):
+        return self.search_by_vectors([vector], k, filters)[0]
+
+    def search_by_vectors(self, vectors, k=4, filters=None):
+        if not len(vectors):
+            return []
+        result = self.collection.query(
+            query_embeddings=[list(map(float, vector)) for vector in vectors],
+            n_results=k,
+            where=chroma_where(filters),
+            include=["documents", "metadatas", "distances"]
+        )
+        return [
+            [
+                (Document(page_content=text or "", metadata=metadata or {}, id=doc_id), -float(distance))
+                for doc_id, text, metadata, distance in zip(ids, texts, metadatas, distances)
+            ]
+            for ids, texts, metadatas, distances in zip(
+                result["ids"], result["documents"], result["metadatas"], result["distances"]
+            )
+        ]
+
+    def get_vectors(self, ids):
+        if not ids:
+            return {}
+        result = self.collection.get(ids=list(ids), include=["embeddings"])
+        return {doc_id: np.asarray(vector, dtype=np.float32)
+                for doc_id, vector in zip(result["ids"], result["embeddings"])}
+
+    def get_documents(self, ids):
+        if not ids:
+            return {}
+        result = self.collection.get(ids=list(ids), include=["documents", "metadatas"])
+        return {doc_id: Document(page_content=text or "", metadata=metadata or {}, id=doc_id)
+                for doc_id, text, metadata in zip(result["ids"], result["documents"], result["metadatas"])}
+
+    def __len__(self):
+        return self.collection.count()
+
+    def stats(self):
+        return {
+            "backend": self.backend,
+            "collection": self.collection_name,
+            "documents": len(self),
+            "disk_bytes": _dir_size(self.persist_directory) if os.path.exists(self.persist_directory) else 0,
+        }
+
+    def persist(self):
+        # Chroma's persistent client writes through on every call
+        pass
+
+    def warm(self):
+        sample = self.collection.get(limit=1, include=["embeddings"])
+        if len(sample["ids"]) > 0:
+            # Querying with a stored vector loads the HNSW segment without an embedding call
+            self.collection.query(query_embeddings=[sample["embeddings"][0]], n_results=1)
+
+    def close(self):
+        try:
+            # Chroma caches one client per path; clear it so writes from other processes are seen
+            from chromadb.api.client import SharedSystemClient
+            SharedSystemClient.clear_system_cache()
+        except Exception:
+            pass
+
+
+# 8-bit PQ learns 256 centroids per sub-vector; FAISS wants ~39 training points each
+IVFPQ_MIN_TRAIN = 256 * 39
+# A background build swaps in once at most this many new vectors are left to add under the lock
+ADD_BATCH_CATCHUP = 1024
+# Filtered searches score matching rows exactly up to this many; larger sets use a FAISS IDSelector
+FILTER_EXACT_MAX = 50000
+# Candidates re-scored per result for IVF-PQ without a codec (its PQ scores are approximate too)
+IVFPQ_RESCORE_FACTOR = 4
+
+
+def pq_subquantizers(dim: int) -> int:
+    """Number of PQ sub-vectors: the largest divisor of dim giving sub-vectors of >= 8 dims"""
+    target = max(1, dim // 8)
+    return max(m for m in range(1, target + 1) if dim % m == 0)
+
+
+def ivf_nlist(count: int) -> int:
+    """Coarse clusters for IVF: ~4*sqrt(n), with at least ~39 training points per cluster"""
+    return int(max(16, min(16384, 4 * math.sqrt(count), count // 39)))
+
+
+def _mmap_flag(kind: str) -> int:
+    """faiss.read_index flag that maps an index file instead of reading it (0 if unsupported)"""
+    import faiss
+
+    # IVF inverted lists and (faiss >= 1.11) HNSW's flat storage can be served from the page cache
+    name = {"ivfpq": "IO_FLAG_MMAP", "hnsw": "IO_FLAG_MMAP_IFC"}.get(kind, "")
+    return getattr(faiss, name, 0)
+
+
+class _MappedFlatIndex:
+    """
+    Brute-force inner-product search directly over FaissVectorIndex's rows (the
+    memory-mapped vectors.f32 plus rows added since the last persist, or their
+    quantized codes), so a flat index holds no copy of the vectors. Implements the
+    part of the faiss index API that FaissVectorIndex uses.
+    """
+
+    is_trained = True
+
+    def __init__(self, owner: "FaissVectorIndex"):
+        self.owner = owner
+        self.present = np.zeros(0, dtype=bool)
+        self.ntotal = 0
+
+    def add_with_ids(self, vectors, ids):
+        # The vectors themselves already live in the owner's rows (row == id)
+        ids = np.asarray(ids, dtype=np.int64)
+        if not len(ids):
+            return
+        top = int(ids.max()) + 1
+        if len(self.present) < top:
+            grown = np.zeros(max(top, 2 * len(self.present)), dtype=bool)
+            grown[:len(self.present)] = self.present
+            self.present = grown
+        self.ntotal += int(len(ids) - self.present[ids].sum())
+        self.present[ids] = True
+
+    def remove_ids(self, ids):
+        ids = np.asarray(ids, dtype=np.int64)
+        ids = ids[ids < len(self.present)]
+        removed = int(self.present[ids].sum())
+        self.present[ids] = False
+        self.ntotal -= removed
+        return removed
+
+    def search(self, queries: np.ndarray, k: int):
+        scores = self.owner._score_rows(queries)
+        rows = scores.shape[1]
+        alive = np.zeros(rows, dtype=bool)
+        alive[:min(rows, len(self.present))] = self.present[:rows]
+        scores[:, ~alive] = -np.inf
+        k = min(k, rows)
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        ids = np.take_along_axis(top, order, axis=1).astype(np.int64)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+        ids[~np.isfinite(top_scores)] = -1
+        return top_scores, ids
+
+
+class FaissVectorIndex(VectorIndex):
+    """
+    FAISS index over normalized vectors (inner product = cosine similarity).
+    index_type is "flat" (exact), "hnsw", "ivfpq" or "auto" (chosen from the corpus size).
+
+    Raw vectors are kept next to the index (row == FAISS id), so approximate indexes are
+    built/trained in a background thread while the current index keeps serving queries.
+    HNSW cannot delete in place: deleted ids are tombstoned, over-fetched and filtered out.
+
+    On disk (see ChunkStore): vectors.f32 + chunks.sqlite3, written incrementally by
+    persist(). Loading only reads the id mapping: vectors.f32 is memory-mapped and the
+    flat index searches it in place, approximate indexes (vectors.index, saved so they
+    need no retraining) are mapped where FAISS supports it, and chunk text/metadata is
+    fetched from SQLite for search hits only.
+
+    quantization ("sq8" or "binary", see quantization.py) keeps compressed codes next to
+    vectors.f32: the flat index scans the codes and HNSW stores int8 vectors in its graph.
+    The first pass (also IVF-PQ's) fetches rescore_factor * k candidates, which are then
+    re-scored exactly against the float rows, so only their pages of vectors.f32 are read.
+    """
+
+    backend = "faiss"
+    INDEX_FILE = "vectors.index"
+    INDEX_TYPES = ("flat", "hnsw", "ivfpq")
+
+    def __init__(self, persist_directory: str, embeddings: Embeddings, index_type: str = FAISS_INDEX_TYPE,
+                 quantization: str = FAISS_QUANTIZATION):
+        super().__init__(embeddings)
+        if index_type != "auto" and index_type not in self.INDEX_TYPES:
+            raise ValueError(f"Unknown FAISS index type: {index_type}")
+        self.persist_directory = persist_directory
+        self.index_type = index_type
+        self.codec = get_codec(quantization)
+        self.rescore_factor = FAISS_RESCORE_FACTOR or (
+            self.codec.rescore_factor if self.codec is not None else IVFPQ_RESCORE_FACTOR)
+        self.active_type: Optional[str] = None  # type of the index currently serving queries
+        self.ef_search = FAISS_HNSW_EF_SEARCH
+        self.nprobe = FAISS_IVF_NPROBE
+        self.index = None
+        self.dim: Optional[int] = None
+        self.next_id = 0
+        self.id_map: Dict[str, int] = {}  # doc id -> faiss id
+        self.live: Dict[int, str] = {}  # faiss id -> doc id
+        self.tombstones: Set[int] = set()
+        self.built_count = 0  # vectors in the index when it was last (re)built
+        self.store = ChunkStore(persist_directory)
+        # Rows [0, _persisted_rows) are memory-mapped from vectors.f32, later rows are in _tail
+        self._mapped: Optional[np.ndarray] = None
+        self._tail = np.zeros((0, 0), dtype=np.float32)
+        # The same split for the codes when quantized
+        self._codes_mapped: Optional[np.ndarray] = None
+        self._codes_tail = np.zeros((0, 0), dtype=np.uint8)
+        self._index_mapped = False  # self.index is served from a read-only file mapping
+        # Changes since the last persist()
+        self._persisted_rows = 0
+        self._pending_docs: Dict[int, Tuple[str, dict]] = {}  # faiss id -> (text, metadata)
+        self._pending_delete: Set[int] = set()
+        self._index_dirty = False
+        self._cleared = False
+        self._build_thread: Optional[threading.Thread] = None
+        self._generation = 0
+        self._lock = threading.RLock()
+        self._load()
+
+    def _target_type(self, count: int) -> str:
+        if self.index_type == "ivfpq":
+            # PQ codebooks need ~39 points per centroid to train; stay exact until then
+            return "ivfpq" if count >= IVFPQ_MIN_TRAIN else "flat"
+        if self.index_type != "auto":
+            return self.index_type
+        if count >= max(FAISS_IVFPQ_MIN_VECTORS, IVFPQ_MIN_TRAIN):
+            return "ivfpq"
+        if count >= FAISS_HNSW_MIN_VECTORS:
+            return "hnsw"
+        return "flat"
+
+    def _new_index(self, kind: str, dim: int, count: int):
+        import faiss
+
+        if kind == "flat":
+            return _MappedFlatIndex(self)
+        if kind == "hnsw":
+            if self.codec is not None:
+                # FAISS has no float-query HNSW over sign bits, so binary also gets int8 graph storage
+                inner = faiss.IndexHNSWSQ(dim, faiss.ScalarQuantizer.QT_8bit, FAISS_HNSW_M,
+                                          faiss.METRIC_INNER_PRODUCT)
+            else:
+                inner = faiss.IndexHNSWFlat(dim, FAISS_HNSW_M, faiss.METRIC_INNER_PRODUCT)
+            inner.hnsw.efConstruction = FAISS_HNSW_EF_CONSTRUCTION
+        elif kind == "ivfpq":
+            # IVF stores ids itself; an IndexIDMap2 around it misnumbers entries after remove_ids
+            index = faiss.IndexIVFPQ(faiss.IndexFlatIP(dim), dim, ivf_nlist(count), pq_subquantizers(dim), 8,
+                                     faiss.METRIC_INNER_PRODUCT)
+            self._apply_search_params(index)
+            return index
+        index = faiss.IndexIDMap2(inner)
+        self._apply_search_params(index)
+        return index
+
+    @staticmethod
+    def _inner(index):
+        import faiss
+
+        index = faiss.downcast_index(index)
+        return faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else index
+
+    def _apply_search_params(self, index):
+        import faiss
+
+        if isinstance(index, _MappedFlatIndex):
+            return
+        inner = self._inner(index)
+        if isinstance(inner, faiss.IndexHNSW):
+            inner.hnsw.efSearch = self.ef_search
+        elif isinstance(inner, faiss.IndexIVF):
+            inner.nprobe = self.nprobe
+
+    def set_search_params(self, ef_search: Optional[int] = None, nprobe: Optional[int] = None,
+                          rescore_factor: Optional[int] = None):
+        """Trade recall for latency: HNSW efSearch / IVF nprobe / candidates re-scored per result (0 = off)"""
+        with self._lock:
+            self.ef_search = ef_search or self.ef_search
+            self.nprobe = nprobe or self.nprobe
+            if rescore_factor is not None:
+                self.rescore_factor = rescore_factor
+            if self.index is not None:
+                self._apply_search_params(self.index)
+
+    @staticmethod
+    def _append(tail: np.ndarray, start: int, rows: np.ndarray) -> np.ndarray:
+        """Write rows at tail[start:], growing the buffer geometrically"""
+        needed = start + len(rows)
+        if tail.shape[0] < needed:
+            grown = np.zeros((max(needed, 2 * tail.shape[0]), rows.shape[1]), dtype=rows.dtype)
+            if start:
+                grown[:start] = tail[:start]
+            tail = grown
+        tail[start:needed] = rows
+        return tail
+
+    def _store_vectors(self, matrix: np.ndarray):
+        start = self.next_id - self._persisted_rows
+        self._tail = self._append(self._tail, start, matrix)
+        if self.codec is not None:
+            self._codes_tail = self._append(self._codes_tail, start, self.codec.encode(matrix))
+
+    @property
+    def _rescoring(self) -> bool:
+        """Whether first-pass scores are approximate and get re-scored against the float rows"""
+        return self.rescore_factor > 0 and (self.codec is not None or self.active_type == "ivfpq")
+
+    def _rescore(self, queries: np.ndarray, scores: np.ndarray, faiss_ids: np.ndarray):
+        """Exact scores for first-pass candidates (-1 ids stay last), re-sorted per query"""
+        found = faiss_ids >= 0
+        candidates = np.unique(faiss_ids[found])
+        if not len(candidates):
+            return scores, faiss_ids
+        rows = self._rows(candidates)
+        exact = np.full(scores.shape, -np.inf, dtype=np.float32)
+        for i in range(len(queries)):
+            positions = np.searchsorted(candidates, faiss_ids[i][found[i]])
+            exact[i, found[i]] = rows[positions] @ queries[i]
+        order = np.argsort(-exact, axis=1, kind="stable")
+        return np.take_along_axis(exact, order, axis=1), np.take_along_axis(faiss_ids, order, axis=1)
+
+    def _rows(self, faiss_ids: np.ndarray) -> np.ndarray:
+        """Vectors for the given FAISS ids, gathered from the mapped file and the unpersisted tail"""
+        out = np.empty((len(faiss_ids), self.dim or 0), dtype=np.float32)
+        mapped = faiss_ids < self._persisted_rows
+        if mapped.any():
+            out[mapped] = self._mapped[faiss_ids[mapped]]
+        if not mapped.all():
+            out[~mapped] = self._tail[faiss_ids[~mapped] - self._persisted_rows]
+        return out
+
+    def _score_rows(self, queries: np.ndarray) -> np.ndarray:
+        """Inner product of each query with every row 0..next_id (used by the flat index; from codes if quantized)"""
+        parts = []
+        unpersisted = self.next_id - self._persisted_rows
+        if self.codec is not None:
+            if self._codes_mapped is not None:
+                parts.append(scan(self.codec, queries, self._codes_mapped))
+            if unpersisted:
+                parts.append(scan(self.codec, queries, self._codes_tail[:unpersisted]))
+            return np.hstack(parts) if len(parts) > 1 else parts[0]
+        if self._mapped is not None:
+            parts.append(queries @ self._mapped.T)
+        if unpersisted:
+            parts.append(queries @ self._tail[:unpersisted].T)
+        return np.asarray(np.hstack(parts) if len(parts) > 1 else parts[0], dtype=np.float32)
+
+    def _ensure_writable(self):
+        """Swap a file-mapped approximate index for an in-memory copy before its first mutation"""
+        if self._index_mapped:
+            import faiss
+
+            self.index = faiss.read_index(os.path.join(self.persist_directory, self.INDEX_FILE))
+            self._apply_search_params(self.index)
+            self._index_mapped = False
+
+    def _load(self):
+        if self.store.exists():
+            self._load_store()
+        elif os.path.exists(os.path.join(self.persist_directory, "index.pkl")):
+            self._migrate_langchain_store()
+
+    def _load_store(self):
+        import faiss
+
+        meta = self.store.read_meta()
+        if not meta.get("next_id"):
+            return
+        self.next_id, self.dim = meta["next_id"], meta["dim"]
+        self.tombstones = set(meta.get("tombstones", []))
+        self.built_count = meta.get("built_count", 0)
+        for faiss_id, doc_id in self.store.read_ids():
+            self.live[faiss_id] = doc_id
+            self.id_map[doc_id] = faiss_id
+        self._mapped = self.store.map_vectors(self.next_id, self.dim)
+        self._persisted_rows = self.next_id
+        self._tail = np.zeros((0, self.dim), dtype=np.float32)
+        if self.codec is not None:
+            self._load_codes()
+
+        index_path = os.path.join(self.persist_directory, self.INDEX_FILE)
+        kind = meta.get("index_type", "flat")
+        if kind != "flat" and os.path.exists(index_path):
+            flag = _mmap_flag(kind)
+            index = faiss.read_index(index_path, flag)
+            # An index written before a crash may not match the committed chunks. Rebuilt too: an HNSW
+            # graph built with another quantization setting, and IVF-PQ saved inside an IndexIDMap2
+            wrapped = isinstance(faiss.downcast_index(index), faiss.IndexIDMap)
+            expected = {"hnsw": (True, faiss.IndexHNSWSQ if self.codec is not None else faiss.IndexHNSWFlat),
+                        "ivfpq": (False, faiss.IndexIVFPQ)}[kind]
+            current = index.ntotal == len(self.live) + len(self.tombstones)
+            if current and (wrapped, type(self._inner(index))) == expected:
+                self.index, self.active_type, self._index_mapped = index, kind, bool(flag)
+                self._apply_search_params(index)
+        if self.index is None:
+            live = np.fromiter(self.live.keys(), dtype=np.int64, count=len(self.live))
+            self.index, self.active_type = self._new_index("flat", self.dim, len(live)), "flat"
+            self.index.add_with_ids(None, live)
+            self.tombstones = set()
+        self._maybe_rebuild()
+
+    def _load_codes(self):
+        """Map the codes for the persisted rows, encoding them from vectors.f32 when missing or short"""
+        width = self.codec.code_size(self.dim)
+        self._codes_tail = np.zeros((0, width), dtype=np.uint8)
+        self._codes_mapped = self.store.map_codes(self.codec.name, self.next_id, width)
+        if self._codes_mapped is None and self._mapped is not None:
+            start = time.perf_counter()
+            codes = encode_blocks(self.codec, self._mapped)
+            try:
+                self.store.replace_codes(self.codec.name, codes)
+                self._codes_mapped = self.store.map_codes(self.codec.name, self.next_id, width)
+            except OSError:
+                # Read-only directory: keep this process's copy in memory
+                self._codes_mapped = codes
+            print(f"--- FAISS: encoded {len(codes)} vectors as {self.codec.name} "
+                  f"in {time.perf_counter() - start:.1f}s ---")
+
+    def _migrate_langchain_store(self):
+        """Import a store saved by LangChain's FAISS.save_local (the previous on-disk format)"""
+        try:
+            from langchain_community.vectorstores import FAISS
+
+            legacy = FAISS.load_local(self.persist_directory, self.embeddings, allow_dangerous_deserialization=True)
+            vectors = legacy.index.reconstruct_n(0, legacy.index.ntotal)
+            documents, ids, keep = [], [], []
+            for position, docstore_id in legacy.index_to_docstore_id.items():
+                doc = legacy.docstore.search(docstore_id)
+                if isinstance(doc, Document) and doc.page_content.strip():
+                    documents.append(doc)
+                    ids.append(str(docstore_id))
+                    keep.append(position)
+            if documents:
+                self.add(documents, ids, vectors[keep])
+                self.persist()
+            print(f"--- FAISS: migrated {len(documents)} chunks from the LangChain store ---")
+        except Exception as e:
+            print(f"--- FAISS: could not migrate the LangChain store ({e}); starting empty ---")
+
+    def add(self, documents, ids, vectors=None):
+        if not documents:
+            return
+        if vectors is None:
+            vectors = self.embeddings.embed_documents([doc.page_content for doc in documents])
+        matrix = _normalize(np.asarray(vectors, dtype=np.float32))
+        with self._lock:
+            if self.index is None:
+                # New indexes start flat; approximate ones are built in the background once large enough
+                self.dim = matrix.shape[1]
+                self.active_type = "flat"
+                self.index = self._new_index("flat", self.dim, len(ids))
+            self._ensure_writable()
+            self._remove(ids)
+            faiss_ids = np.arange(self.next_id, self.next_id + len(ids), dtype=np.int64)
+            self._store_vectors(matrix)
+            self.next_id += len(ids)
+            self.index.add_with_ids(matrix, faiss_ids)
+            self._index_dirty = True
+            for faiss_id, doc_id, doc in zip(faiss_ids.tolist(), ids, documents):
+                self.id_map[doc_id] = faiss_id
+                self.live[faiss_id] = doc_id
+                self._pending_docs[faiss_id] = (doc.page_content, dict(doc.metadata))
+            self._maybe_rebuild()
+
+    def _remove(self, ids):
+        faiss_ids = [self.id_map.pop(doc_id) for doc_id in ids if doc_id in self.id_map]
+        if faiss_ids:
+            if self.active_type == "hnsw":
+                self.tombstones.update(faiss_ids)
+            else:
+                self._ensure_writable()
+                self.index.remove_ids(np.asarray(faiss_ids, dtype=np.int64))
+            for faiss_id in faiss_ids:
+                del self.live[faiss_id]
+                if self._pending_docs.pop(faiss_id, None) is None:
+                    self._pending_delete.add(faiss_id)
+            self._index_dirty = True
+
+    def delete(self, ids):
+        with self._lock:
+            if self.index is not None:
+                self._remove(ids)
+                self._maybe_rebuild()
+
+    def _maybe_rebuild(self):
+        """Start a background build if the corpus outgrew the active index type or tombstones pile up"""
+        if self._build_thread is not None and self._build_thread.is_alive():
+            return
+        target = self._target_type(len(self.live))
+        stale = len(self.tombstones) > FAISS_TOMBSTONE_RATIO * max(1, self.index.ntotal)
+        # IVF centroids trained on a much smaller corpus no longer partition it well
+        outgrown = self.active_type == "ivfpq" and len(self.live) > 4 * max(1, self.built_count)
+        if target != self.active_type or stale or outgrown:
+            self._build_thread = threading.Thread(
+                target=self._background_build, args=(target, self._generation), daemon=True, name="faiss-build"
+            )
+            self._build_thread.start()
+
+    def _background_build(self, kind: str, generation: int):
+        start = time.perf_counter()
+        with self._lock:
+            snapshot_ids = np.fromiter(self.live.keys(), dtype=np.int64, count=len(self.live))
+            snapshot = self._rows(snapshot_ids)
+            dim = self.dim
+        try:
+            index = self._new_index(kind, dim, len(snapshot_ids))
+            if not index.is_trained:
+                rng = np.random.default_rng(0)
+                sample = rng.choice(len(snapshot), size=min(len(snapshot), FAISS_TRAIN_SAMPLE), replace=False)
+                index.train(snapshot[np.sort(sample)])
+            index.add_with_ids(snapshot, snapshot_ids)
+            built = set(snapshot_ids.tolist())
+            # Catch up with vectors added meanwhile outside the lock, until only a few remain
+            while True:
+                with self._lock:
+                    arrived = np.asarray(sorted(set(self.live) - built), dtype=np.int64)
+                    vectors = self._rows(arrived)
+                if len(arrived) <= ADD_BATCH_CATCHUP:
+                    break
+                index.add_with_ids(vectors, arrived)
+                built.update(arrived.tolist())
+        except Exception as e:
+            print(f"--- FAISS: building {kind} index failed: {e} ---")
+            return
+
+        with self._lock:
+            if generation != self._generation:
+                return
+            # Apply the last adds/deletes that happened while building
+            live = set(self.live)
+            removed = built - live
+            added = sorted(live - built)
+            tombstones = set()
+            if removed:
+                if kind == "hnsw":
+                    tombstones = removed
+                else:
+                    index.remove_ids(np.asarray(sorted(removed), dtype=np.int64))
+            if added:
+                added_ids = np.asarray(added, dtype=np.int64)
+                index.add_with_ids(self._rows(added_ids), added_ids)
+            self.index, self.active_type, self.tombstones = index, kind, tombstones
+            self._index_mapped = False
+            self.built_count = len(live)
+            self._index_dirty = True
+            print(f"--- FAISS: switched to {kind} index ({len(live)} vectors, "
+                  f"built in {time.perf_counter() - start:.1f}s) ---")
+            if self.store.exists():
+                self.persist()
+            # The corpus may have kept growing while this build ran
+            self._build_thread = None
+            self._maybe_rebuild()
+
+    def wait_for_build(self, timeout: Optional[float] = None) -> bool:
+        """Block until pending background builds finish; returns False on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            thread = self._build_thread
+            if thread is None or (thread is threading.current_thread()):
+                return True
+            thread.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+            if thread.is_alive():
+                return False
+            if self._build_thread is thread:
+                return True
+
+    def _filter_ids(self, filters: Dict[str, Any]) -> np.ndarray:
+        """Live faiss ids whose metadata matches `filters`: SQLite for persisted chunks, memory for the rest"""
+        found = set(self.store.filter_ids(filters)) if self.store.exists() else set()
+        found.update(faiss_id for faiss_id, (_, metadata) in self._pending_docs.items() if matches(metadata, filters))
+        return np.asarray(sorted(faiss_id for faiss_id in found if faiss_id in self.live), dtype=np.int64)
+
+    def _filtered_search(self, queries: np.ndarray, k: int, allowed: np.ndarray):
+        """Top-k restricted to `allowed` ids: exact over their float rows when few, else an IDSelector search"""
+        import faiss
+
+        if (self.active_type == "flat" and self.codec is None) or len(allowed) <= FILTER_EXACT_MAX:
+            return self._top(queries @ self._rows(allowed).T, allowed, k)
+        if self.active_type == "flat":
+            # Scan the codes of every row, keep the allowed columns, re-score the best of them
+            scores, faiss_ids = self._top(self._score_rows(queries)[:, allowed], allowed, self._fetch(k, len(allowed)))
+            return self._rescore(queries, scores, faiss_ids) if self._rescoring else (scores, faiss_ids)
+        selector = faiss.IDSelectorBatch(allowed)
+        if self.active_type == "hnsw":
+            params = faiss.SearchParametersHNSW(sel=selector, efSearch=self.ef_search)
+        else:
+            params = faiss.SearchParametersIVF(sel=selector, nprobe=self.nprobe)
+        scores, faiss_ids = self.index.search(queries, self._fetch(k, len(allowed)), params=params)
+        return self._rescore(queries, scores, faiss_ids) if self._rescoring else (scores, faiss_ids)
+
+    @staticmethod
+    def _top(scores: np.ndarray, ids: np.ndarray, k: int):
+        """Best k columns of `scores` per query, sorted, as (scores, ids)"""
+        k = min(k, len(ids))
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top = np.take_along_axis(top, np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1), axis=1)
+        return np.take_along_axis(scores, top, axis=1), ids[top]
+
+    def _fetch(self, k: int, available: int) -> int:
+        """First-pass candidates for k results"""
+        return min(k * self.rescore_factor if self._rescoring else k, available)
+
+    def search_by_vector(self, vector, k=4, filters=None):
+        return self.search_by_vectors([vector], k, filters)[0]
+
+    def search_by_vectors(self, vectors, k=4, filters=None):
+        if not len(vectors):
+            return []
+        queries = _normalize(np.asarray(vectors, dtype=np.float32))
+        filters = normalize_filters(filters)
+        with self._lock:
+            if self.index is None or self.index.ntotal == 0:
+                return [[] for _ in range(len(queries))]
+            if filters:
+                # Only live ids are allowed, so tombstones need no over-fetch here
+                allowed = self._filter_ids(filters)
+                if not len(allowed):
+                    return [[] for _ in range(len(queries))]
+                scores, faiss_ids = self._filtered_search(queries, k, allowed)
+            else:
+                # Over-fetch so tombstoned hits do not shrink the result
+                fetch = min(self._fetch(k, self.index.ntotal) + len(self.tombstones), self.index.ntotal)
+                scores, faiss_ids = self.index.search(queries, fetch)
+                if self._rescoring:
+                    scores, faiss_ids = self._rescore(queries, scores, faiss_ids)
+            hits = [
+                [(int(faiss_id), float(score)) for score, faiss_id in zip(row_scores, row_ids)
+                 if int(faiss_id) in self.live][:k]
+                for row_scores, row_ids in zip(scores, faiss_ids)
+            ]
+            # One text lookup for every hit of every query
+            chunks = self._chunks(list({faiss_id for row in hits for faiss_id, _ in row}))
+            return [
+                [
+                    (Document(page_content=chunks[faiss_id][0], metadata=dict(chunks[faiss_id][1]),
+                              id=self.live[faiss_id]), score)
+                    for faiss_id, score in row if faiss_id in chunks
+                ]
+                for row in hits
+            ]
+
+    def _chunks(self, faiss_ids: List[int]) -> Dict[int, Tuple[str, dict]]:
+        """Text and metadata of live chunks: unpersisted ones from memory, the rest from SQLite"""
+        found = {faiss_id: self._pending_docs[faiss_id] for faiss_id in faiss_ids if faiss_id in self._pending_docs}
+        missing = [faiss_id for faiss_id in faiss_ids if faiss_id not in found]
+        if missing:
+            found.update(self.store.get_chunks(missing))
+        return found
+
+    def get_vectors(self, ids):
+        with self._lock:
+            known = [doc_id for doc_id in ids if doc_id in self.id_map]
+            rows = self._rows(np.asarray([self.id_map[doc_id] for doc_id in known], dtype=np.int64))
+            return dict(zip(known, rows))
+
+    def get_documents(self, ids):
+        with self._lock:
+            faiss_ids = {doc_id: self.id_map[doc_id] for doc_id in ids if doc_id in self.id_map}
+            chunks = self._chunks(list(faiss_ids.values()))
+            return {doc_id: Document(page_content=chunks[faiss_id][0], metadata=dict(chunks[faiss_id][1]), id=doc_id)
+                    for doc_id, faiss_id in faiss_ids.items() if faiss_id in chunks}
+
+    def __len__(self):
+        return len(self.live)
+
+    def _index_bytes(self) -> int:
+        if self.index is None:
+            return 0
+        n, d = self.index.ntotal, self.dim
+        if self.active_type == "hnsw":
+            return n * ((d if self.codec is not None else d * 4) + FAISS_HNSW_M * 2 * 4)
+        if self.active_type == "ivfpq":
+            return n * (pq_subquantizers(d) + 8) + ivf_nlist(n) * d * 4
+        return n * (self.codec.code_size(d) if self.codec is not None else d * 4)
+
+    def stats(self):
+        return {
+            "backend": self.backend,
+            "index_type": self.active_type,
+            "requested_type": self.index_type,
+            "building": self._build_thread is not None and self._build_thread.is_alive(),
+            "documents": len(self),
+            "tombstones": len(self.tombstones),
+            "dim": self.dim,
+            "quantization": self.codec.name if self.codec is not None else "none",
+            "rescore_factor": self.rescore_factor if self._rescoring else 0,
+            "index_bytes": self._index_bytes(),
+            "code_bytes": self.next_id * self.codec.code_size(self.dim) if self.codec and self.dim else 0,
+            "vector_bytes": self.next_id * (self.dim or 0) * 4,
+            "mapped_vector_bytes": self._persisted_rows * (self.dim or 0) * 4,
+            "disk_bytes": _dir_size(self.persist_directory) if os.path.exists(self.persist_directory) else 0,
+        }
+
+    def persist(self):
+        """Write only what changed since the last persist (new rows, added/removed chunks)"""
+        with self._lock:
+            if self._cleared:
+                self.store.clear()
+                self._cleared = False
+            if self.index is None:
+                return
+            first_row = self._persisted_rows
+            added = [(faiss_id, self.live[faiss_id], text, metadata)
+                     for faiss_id, (text, metadata) in sorted(self._pending_docs.items())]
+            meta = {"next_id": self.next_id, "dim": self.dim, "index_type": self.active_type,
+                    "tombstones": sorted(self.tombstones), "built_count": self.built_count}
+            codes = None
+            if self.codec is not None:
+                codes = (self.codec.name, self._codes_tail[:self.next_id - first_row])
+            self.store.write(self._tail[:self.next_id - first_row], first_row, added,
+                             sorted(self._pending_delete), meta, codes=codes)
+            # Persisted rows are served from the mapped file from now on
+            self._persisted_rows = self.next_id
+            self._mapped = self.store.map_vectors(self.next_id, self.dim)
+            self._tail = np.zeros((0, self.dim), dtype=np.float32)
+            if self.codec is not None:
+                self._codes_mapped = self.store.map_codes(self.codec.name, self.next_id,
+                                                          self.codec.code_size(self.dim))
+                self._codes_tail = np.zeros((0, self._codes_tail.shape[1]), dtype=np.uint8)
+            self._pending_docs.clear()
+            self._pending_delete.clear()
+
+            index_path = os.path.join(self.persist_directory, self.INDEX_FILE)
+            if self.active_type == "flat":
+                # Rebuilt from vectors.f32 on load; a stale approximate index must not be picked up
+                if os.path.exists(index_path):
+                    os.remove(index_path)
+            elif self._index_dirty or not os.path.exists(index_path):
+                import faiss
+
+                faiss.write_index(self.index, index_path + ".tmp")
+                os.replace(index_path + ".tmp", index_path)
+            self._index_dirty = False
+
+    def reset(self):
+        """Drop every document (the on-disk copy is cleared on the next persist)"""
+        with self._lock:
+            self._generation += 1
+            self.index = None
+            self.active_type = None
+            self.dim = None
+            self.next_id = 0
+            self.id_map.clear()
+            self.live.clear()
+            self.tombstones = set()
+            self.built_count = 0
+            self._mapped = None
+            self._tail = np.zeros((0, 0), dtype=np.float32)
+            self._codes_mapped = None
+            self._codes_tail = np.zeros((0, 0), dtype=np.uint8)
+            self._index_mapped = False
+            self._persisted_rows = 0
+            self._pending_docs.clear()
+            self._pending_delete.clear()
+            self._cleared = True
+
+    def close(self):
+        with self._lock:
+            self._mapped = None
+            self._codes_mapped = None
+            self.store.close()
+
+
+def open_vector_index(backend: str, embeddings: Embeddings, persist_directory: str,
+                      collection_name: Optional[str] = None) -> VectorIndex:
+    """Open a persistent index with the given backend ("chroma" or "faiss")"""
+    backend = backend.lower()
+    if backend == "chroma":
+        return ChromaVectorIndex(collection_name, embeddings, persist_directory)
+    if backend == "faiss":
+        return FaissVectorIndex(persist_directory, embeddings)
+    raise ValueError(f"Unknown vector index backend: {backend} (expected one of {BACKENDS})")
+
+
+def open_kb_index(provider: Optional[str] = None, backend: Optional[str] = None,
+                  version_dir: Optional[str] = None) -> VectorIndex:
+    """
+    Open the knowledge-base index for an embedding provider with the configured backend,
+    from `version_dir` (a build in progress or a published version) or the flat legacy layout
+    """
+    from .config import KB_INDEX_BACKEND
+    from .embeddings import get_embeddings, kb_collection_name, kb_files
+
+    backend = (backend or KB_INDEX_BACKEND).lower()
+    collection_name = kb_collection_name(provider)
+    directory = kb_files(collection_name, version_dir, backend)["index"]
+    return open_vector_index(backend, get_embeddings(provider), directory, collection_name)
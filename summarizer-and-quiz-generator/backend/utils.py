@@ -1,19 +1,17 @@
-from pypdf import PdfReader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 import sys
 from pathlib import Path
 
-# Add ai_services to path
+# Add project root (ai_services, rag_services) to path
 current_dir = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(current_dir))
 
 from ai_services.GroqClient import generate_completion
+from rag_services.pdf_extract import extract_pdf_text
 
 def extract_text_from_pdf(file_path: str) -> str:
-    reader = PdfReader(file_path)
-    text = ""
-    for page in reader.pages:
-        text += page.extract_text() or ""
+    # Shared PyMuPDF extraction (parallel for large files, cached by file hash)
+    text = extract_pdf_text(file_path)
     if not text.strip():
         raise ValueError("No text found in PDF")
     return text
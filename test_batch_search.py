@@ -0,0 +1,79 @@
+"""
+Batched multi-query retrieval tests: run with `python -m pytest test_batch_search.py`.
+"""
+import pytest
+from langchain_core.documents import Document
+
+from conftest import HashEmbeddings
+from rag_services.vector_index import FaissVectorIndex, merge_results
+
+FACTS = {
+    "a": ("the capital of mars is elon city", "mars.pdf"),
+    "b": ("mars has two small moons", "mars.pdf"),
+    "c": ("mitochondria power the cell", "cells.pdf"),
+    "d": ("ribosomes build proteins", "cells.pdf"),
+    "e": ("the capital of mars is elon city", "copy.pdf"),  # same passage under another id
+}
+
+
+class BatchHashEmbeddings(HashEmbeddings):
+    """Hash embeddings with the batched embed_queries hook; records the size of each batch"""
+
+    def __init__(self):
+        super().__init__()
+        self.query_batches = []
+
+    def embed_queries(self, texts):
+        self.query_batches.append(len(texts))
+        return [self._embed(text) for text in texts]
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = FaissVectorIndex(str(tmp_path), BatchHashEmbeddings(), index_type="flat")
+    index.add([Document(page_content=text, metadata={"source": source}) for text, source in FACTS.values()],
+              list(FACTS))
+    return index
+
+
+def test_batch_search_embeds_all_queries_at_once_and_matches_single_searches(index):
+    queries = ["capital of mars", "mitochondria cell", "ribosomes proteins"]
+    calls = index.embeddings.calls
+    results = index.batch_search(queries, k=2)
+    assert index.embeddings.query_batches == [3] and index.embeddings.calls == calls  # no per-query calls
+    assert [hits[0][0].id for hits in results[1:]] == ["c", "d"]
+    for query, hits in zip(queries, results):
+        single = [doc.page_content for doc, _ in index.search(query, k=2)]
+        assert [doc.page_content for doc, _ in hits][0] == single[0]
+
+
+def test_batch_search_drops_repeated_passages_but_still_returns_k(index):
+    (hits,) = index.batch_search(["capital of mars elon city"], k=3)
+    texts = [doc.page_content for doc, _ in hits]
+    assert len(texts) == 3 and len(set(texts)) == 3
+    assert texts[0] == FACTS["a"][0]
+
+
+def test_search_by_vectors_is_one_search_per_row_with_filters(index):
+    vectors = index.embeddings.embed_documents(["capital of mars", "mitochondria cell"])
+    batched = index.search_by_vectors(vectors, k=2, filters={"source": "cells.pdf"})
+    single = [index.search_by_vector(vector, k=2, filters={"source": "cells.pdf"}) for vector in vectors]
+    assert [[doc.id for doc, _ in hits] for hits in batched] == [[doc.id for doc, _ in hits] for hits in single]
+    assert all(doc.metadata["source"] == "cells.pdf" for hits in batched for doc, _ in hits)
+    assert index.search_by_vectors([], k=2) == []
+
+
+def test_batch_search_on_no_queries_or_an_empty_index(tmp_path):
+    empty = FaissVectorIndex(str(tmp_path), BatchHashEmbeddings(), index_type="flat")
+    assert empty.batch_search(["mars", "cells"], k=2) == [[], []]
+    assert empty.batch_search([], k=2) == [] and empty.embeddings.query_batches == []
+
+
+def test_merge_results_interleaves_queries_and_drops_repeats():
+    def hits(*ids):
+        return [(Document(page_content=f"text {doc_id}", id=doc_id), 1.0) for doc_id in ids]
+
+    results = [hits("a", "b", "c"), hits("d"), hits("b", "e")]
+    assert [doc.id for doc in merge_results(results)] == ["a", "d", "b", "e", "c"]
+    assert [doc.id for doc in merge_results(results, limit=3)] == ["a", "d", "b"]
+    assert merge_results([]) == [] and merge_results([[], []]) == []
@@ -0,0 +1,80 @@
+"""
+Retrieval benchmark helper tests: run with `python -m pytest test_bench_retrieval.py`.
+"""
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+from langchain_core.documents import Document
+
+sys.path.insert(0, str(Path(__file__).parent / "benchmarks"))
+
+from bench_retrieval import DEFAULT_QUERIES, compare, evaluate, label_queries, run_queries, score_results
+from bench_vector_index import exact_neighbours, percentile
+
+DOCUMENTS = [
+    Document(page_content="The capital of Mars is\n  ELONCITY.", metadata={"source": "kb/sample.txt"}),
+    Document(page_content="Mars uses Dogecoin as currency.", metadata={"source": "kb/sample.txt"}),
+    Document(page_content="ElonCity is also a city on Earth.", metadata={"source": "other.txt"}),
+    Document(page_content="Attention uses 8 parallel heads.", metadata={"source": "paper.pdf"}),
+]
+QUERIES = [
+    {"id": "capital", "query": "capital of Mars", "source": "sample.txt", "answers": ["is ElonCity"]},
+    {"id": "heads", "query": "attention heads", "source": "paper.pdf", "answers": ["8 parallel heads"]},
+    {"id": "unanswerable", "query": "moons", "source": "sample.txt", "answers": ["Phobos"]},
+]
+
+
+def test_labels_need_the_source_file_and_an_answer_phrase():
+    labelled = label_queries(QUERIES, DOCUMENTS)
+    # Whitespace/case-insensitive phrase match, only in the query's own source file
+    assert {q["id"]: q["relevant"] for q in labelled} == {"capital": {"0"}, "heads": {"3"}}
+
+
+def test_recall_and_reciprocal_rank():
+    assert score_results(["5", "1", "2"], {"1", "2"}, k=3) == (1.0, 0.5)
+    assert score_results(["5", "1", "2"], {"1", "2"}, k=1) == (0.0, 0.0)
+    assert score_results(["2", "9"], {"2", "7"}, k=2) == (0.5, 1.0)
+
+
+def test_run_queries_averages_per_query_scores():
+    labelled = [{"id": "a", "relevant": {"1"}}, {"id": "b", "relevant": {"2"}}]
+    results = {"a": ["1", "3"], "b": ["3", "2"]}
+    row = run_queries(lambda query, vector: results[query["id"]], labelled, {"a": None, "b": None}, k=2)
+    assert (row["recall"], row["mrr"]) == (1.0, 0.75)
+    assert 0 <= row["p50_ms"] <= row["p95_ms"]
+
+
+def test_compare_flags_quality_drops_beyond_the_tolerance():
+    baseline = {"results": {"faiss": {"recall": 0.9, "mrr": 0.8, "p95_ms": 1.0},
+                            "chroma": {"recall": 0.9, "mrr": 0.8, "p95_ms": 1.0}}}
+    results = {"faiss": {"recall": 0.89, "mrr": 0.8, "p95_ms": 9.0},  # within tolerance; latency never fails
+               "chroma": {"recall": 0.9, "mrr": 0.7, "p95_ms": 1.0},
+               "faiss+bm25": {"recall": 0.1, "mrr": 0.1, "p95_ms": 1.0}}  # not in the baseline
+    assert compare(results, baseline, tolerance=0.02) == ["chroma"]
+
+
+def test_exact_neighbours_and_percentile():
+    vectors = np.array([[1, 0], [0, 1], [1, 1]], dtype=np.float32)
+    assert exact_neighbours(vectors, np.array([[2, 0.1]], dtype=np.float32), 2).tolist() == [[0, 2]]
+    assert percentile([1, 2, 3, 4], 50) == 2.5 and percentile([], 95) == 0.0
+
+
+def test_evaluate_scores_each_configuration(hash_embeddings):
+    labelled = label_queries(QUERIES, DOCUMENTS)
+    vectors = np.asarray(hash_embeddings.embed_documents([d.page_content for d in DOCUMENTS]), dtype=np.float32)
+    query_vectors = {q["id"]: hash_embeddings.embed_query(q["query"]) for q in labelled}
+    results = evaluate(["faiss"], DOCUMENTS, vectors, labelled, query_vectors, k=2, hybrid=True)
+    assert set(results) == {"faiss", "faiss+bm25"}
+    assert results["faiss+bm25"]["recall"] == 1.0
+    assert all(0 <= row["mrr"] <= 1 and row["build_s"] >= 0 for row in results.values())
+
+
+def test_shipped_query_set_is_well_formed():
+    with open(DEFAULT_QUERIES, "r", encoding="utf-8") as f:
+        queries = json.load(f)
+    assert len({q["id"] for q in queries}) == len(queries)
+    for query in queries:
+        assert set(query) >= {"id", "query", "source", "answers"} and query["answers"], query["id"]
+
@@ -0,0 +1,125 @@
+"""
+BM25 and reciprocal-rank fusion tests: run with `python -m pytest test_bm25.py`.
+"""
+import math
+
+import pytest
+from langchain_core.documents import Document
+
+from rag_services import bm25
+from rag_services.bm25 import RRF_K, BM25Index, hybrid_search, reciprocal_rank_fusion, tokenize
+
+TEXTS = {
+    "newton": "Newton's second law: force equals mass times acceleration.",
+    "cells": "Mitochondria are the powerhouse of the cell.",
+    "course": "CS101 covers the basics of programming.",
+    "mass": "Mass is a measure of the amount of matter.",
+}
+
+
+class Chunks(dict):
+    """Stand-in for the vector store's chunk table: the BM25 index only holds postings"""
+
+    def __init__(self, texts):
+        super().__init__({doc_id: Document(page_content=text, metadata={"source": f"{doc_id}.txt"}, id=doc_id)
+                          for doc_id, text in texts.items()})
+        self.lookups = []
+
+    def get_documents(self, ids):
+        self.lookups.append(list(ids))
+        return {doc_id: self[doc_id] for doc_id in ids if doc_id in self}
+
+
+def build(chunks=None):
+    chunks = chunks if chunks is not None else Chunks(TEXTS)
+    index = BM25Index(lookup=chunks.get_documents)
+    index.add(list(TEXTS), list(TEXTS.values()))
+    return index
+
+
+def ids(results):
+    return [doc.id for doc, _ in results]
+
+
+def test_scores_match_the_bm25_formula():
+    index = build()
+    (doc, score), = index.search("CS101", k=1)
+    n, df, tf = 4, 1, 1
+    length = len(tokenize(TEXTS["course"]))
+    avg_length = sum(len(tokenize(text)) for text in TEXTS.values()) / n
+    idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+    expected = idf * tf * (index.k1 + 1) / (tf + index.k1 * (1 - index.b + index.b * length / avg_length))
+    assert doc.id == "course" and doc.metadata == {"source": "course.txt"}
+    assert score == pytest.approx(expected)
+
+
+def test_rare_terms_outweigh_common_ones():
+    index = build()
+    assert ids(index.search("mass acceleration", k=2)) == ["newton", "mass"]
+    assert ids(index.search("the powerhouse", k=1)) == ["cells"]
+    assert index.search("photosynthesis") == []
+
+
+def test_readding_and_removing_keep_postings_consistent():
+    chunks = Chunks(TEXTS)
+    index = build(chunks)
+    index.add(["cells"], ["Chloroplasts capture light."])
+    chunks["cells"] = Document(page_content="Chloroplasts capture light.", id="cells")
+    assert ids(index.search("mitochondria")) == []
+    assert ids(index.search("chloroplasts")) == ["cells"]
+    index.remove(["cells", "unknown"])
+    assert len(index) == 3 and index.total_length == sum(index.doc_lengths.values())
+    assert ids(index.search("chloroplasts")) == [] and "chloroplasts" not in index.postings
+
+
+def test_only_postings_are_stored_and_hits_are_looked_up(tmp_path):
+    chunks = Chunks(TEXTS)
+    build(chunks).save(str(tmp_path / "bm25.pkl"))
+    loaded = BM25Index.load(str(tmp_path / "bm25.pkl"), lookup=chunks.get_documents)
+    assert not hasattr(loaded, "documents")
+    assert ids(loaded.search("mass acceleration", k=2)) == ["newton", "mass"]
+    assert chunks.lookups == [["newton", "mass"]]  # one fetch for the top k only
+    with pytest.raises(ValueError):
+        BM25Index.load(str(tmp_path / "bm25.pkl")).search("mass")
+
+
+def test_save_and_load_round_trip(tmp_path):
+    index = build()
+    index.save(str(tmp_path / "bm25.pkl"))
+    loaded = BM25Index.load(str(tmp_path / "bm25.pkl"), lookup=index.lookup)
+    assert loaded.search("mass of matter") == index.search("mass of matter")
+    assert len(BM25Index.load(str(tmp_path / "missing.pkl"))) == 0
+
+
+def test_filters_restrict_keyword_hits(monkeypatch):
+    assert ids(build().search("mass", filters={"source": "mass.txt"})) == ["mass"]
+    # Ranked hits are fetched in batches until k of them match
+    monkeypatch.setattr(bm25, "FILTER_LOOKUP_BATCH", 1)
+    chunks = Chunks(TEXTS)
+    assert ids(build(chunks).search("the mass", k=1, filters={"source": "cells.txt"})) == ["cells"]
+    assert len(chunks.lookups) > 1 and all(len(batch) == 1 for batch in chunks.lookups)
+
+
+def test_rrf_prefers_documents_found_by_both_lists():
+    a, b, c = (Document(page_content=text) for text in ("alpha", "beta", "gamma"))
+    fused = reciprocal_rank_fusion([[a, b], [c, b]], k=3)
+    # b: 1/(k+2) twice beats a and c: 1/(k+1) once
+    assert 2 / (RRF_K + 2) > 1 / (RRF_K + 1)
+    assert [doc.page_content for doc in fused] == ["beta", "alpha", "gamma"]
+    # The same chunk returned by both indexes (different objects, same text) is merged
+    duplicate = Document(page_content="alpha", id="from-bm25")
+    assert [doc.page_content for doc in reciprocal_rank_fusion([[a], [duplicate]], k=4)] == ["alpha"]
+
+
+def test_hybrid_search_fuses_vector_and_keyword_candidates():
+    index = build()
+    requested = []
+
+    def vector_search(query, k):
+        requested.append(k)
+        return [Document(page_content=TEXTS["mass"]), Document(page_content=TEXTS["cells"])]
+
+    fused = hybrid_search(vector_search, index, "CS101 mass", k=2)
+    assert requested == [4]  # 2*k candidates per side
+    assert [doc.page_content for doc in fused] == [TEXTS["mass"], TEXTS["course"]]
+    assert hybrid_search(vector_search, BM25Index(), "CS101", k=1) == vector_search("CS101", 1)
@@ -0,0 +1,60 @@
+"""
+FAISS chunk store tests: run with `python -m pytest test_chunk_store.py`.
+"""
+import os
+
+import numpy as np
+
+from rag_services.chunk_store import ChunkStore
+
+
+def rows(start, count, dim=4):
+    return np.arange(start * dim, (start + count) * dim, dtype=np.float32).reshape(count, dim)
+
+
+def chunk(faiss_id, **metadata):
+    return faiss_id, f"chunk-{faiss_id}", f"text {faiss_id}", {"source": "a.pdf", **metadata}
+
+
+def test_writes_append_rows_and_apply_chunk_changes(tmp_path):
+    store = ChunkStore(str(tmp_path))
+    assert not store.exists()
+    store.write(rows(0, 3), 0, [chunk(0), chunk(1), chunk(2)], [], {"next_id": 3, "dim": 4})
+    store.write(rows(3, 2), 3, [chunk(3), chunk(4)], [1], {"next_id": 5})
+
+    assert os.path.getsize(store.vectors_path) == 5 * 4 * 4
+    assert np.array_equal(store.map_vectors(5, 4), rows(0, 5))
+    assert store.read_meta() == {"next_id": 5, "dim": 4}
+    assert sorted(store.read_ids()) == [(0, "chunk-0"), (2, "chunk-2"), (3, "chunk-3"), (4, "chunk-4")]
+    assert store.get_chunks([4, 1, 2]) == {4: ("text 4", {"source": "a.pdf"}), 2: ("text 2", {"source": "a.pdf"})}
+
+
+def test_rows_left_by_a_crashed_write_are_overwritten(tmp_path):
+    store = ChunkStore(str(tmp_path))
+    store.write(rows(0, 2), 0, [chunk(0), chunk(1)], [], {"next_id": 2})
+    # A writer appended rows 2-4 and died before committing
+    with open(store.vectors_path, "ab") as f:
+        f.write(rows(100, 3).tobytes())
+    store.write(rows(2, 1), 2, [chunk(2)], [], {"next_id": 3})
+    assert np.array_equal(store.map_vectors(3, 4), rows(0, 3))
+    assert os.path.getsize(store.vectors_path) == 3 * 4 * 4
+
+
+def test_filter_ids_use_the_metadata_columns(tmp_path):
+    store = ChunkStore(str(tmp_path))
+    store.write(rows(0, 3), 0, [chunk(0, page=1, user_id="u1"), chunk(1, page=2, page_end=4), chunk(2, page=9)],
+                [], {})
+    assert store.filter_ids({"user_id": "u1"}) == [0]
+    assert sorted(store.filter_ids({"page_start": 3, "page_end": 9})) == [1, 2]
+    assert store.filter_ids({"source": "b.pdf"}) == []
+
+
+def test_clear_drops_rows_chunks_and_codes(tmp_path):
+    store = ChunkStore(str(tmp_path))
+    store.write(rows(0, 2), 0, [chunk(0), chunk(1)], [], {"next_id": 2},
+                codes=("sq8", np.zeros((2, 4), dtype=np.uint8)))
+    assert store.map_codes("sq8", 2, 4) is not None and store.map_codes("binary", 2, 4) is None
+    store.clear()
+    assert list(store.read_ids()) == [] and store.read_meta() == {}
+    assert store.map_vectors(2, 4) is None and not os.path.exists(store.codes_path("sq8"))
+    store.close()
@@ -0,0 +1,96 @@
+"""
+Streaming chunker tests: run with `python -m pytest test_chunking.py`.
+"""
+import queue
+
+from ingestion import send_file_chunks
+from rag_services.chunking import iter_chunks, iter_file_pages, iter_text_blocks, split_sentences
+
+
+def sample_text(sentences: int = 200) -> str:
+    words = ["mars", "moons", "cells", "energy", "light", "orbit", "sugar", "atoms"]
+    parts = []
+    for i in range(sentences):
+        parts.append(" ".join(words[(i + j) % len(words)] for j in range(3 + i % 11)).capitalize())
+        parts.append(". " if i % 7 else ".\n\n")
+    return "".join(parts)
+
+
+def check_chunks(stream: str, chunks, chunk_size: int):
+    """Every chunk is the stream slice at its start_index, and together they cover all non-space text"""
+    covered = [False] * len(stream)
+    for text, metadata in chunks:
+        start = metadata["start_index"]
+        assert stream[start:start + len(text)] == text
+        assert len(text) <= chunk_size
+        covered[start:start + len(text)] = [True] * len(text)
+    assert all(done or char.isspace() for done, char in zip(covered, stream))
+    assert [metadata["chunk_index"] for _, metadata in chunks] == list(range(len(chunks)))
+
+
+def test_split_sentences_keeps_every_character():
+    text = 'He said "stop." Then left!\nNew line?  Yes'
+    assert "".join(split_sentences(text)) == text
+    assert list(split_sentences(text))[0] == 'He said "stop." '
+
+
+def test_chunks_lose_no_text_and_offsets_point_into_the_stream():
+    stream = sample_text()
+    chunks = list(iter_chunks([(None, stream)], chunk_size=300, overlap=60))
+    assert len(chunks) > 5
+    check_chunks(stream, chunks, 300)
+
+
+def test_offsets_hold_across_block_and_page_boundaries():
+    stream = sample_text()
+    # Blocks cut mid-sentence; the chunker must not care where the reader split the text
+    blocks = [(page, stream[i:i + 97]) for page, i in enumerate(range(0, len(stream), 97), start=1)]
+    chunks = list(iter_chunks(blocks, chunk_size=250, overlap=50))
+    check_chunks(stream, chunks, 250)
+    for text, metadata in chunks:
+        first_page = metadata["start_index"] // 97 + 1
+        last_page = (metadata["start_index"] + len(text) - 1) // 97 + 1
+        assert (metadata["page"], metadata["page_end"]) == (first_page, last_page)
+
+
+def test_overlap_repeats_whole_trailing_sentences():
+    sentences = [f"Sentence number {i} is here. " for i in range(30)]
+    chunks = [text for text, _ in iter_chunks([(None, "".join(sentences))], chunk_size=120, overlap=40)]
+    for previous, current in zip(chunks, chunks[1:]):
+        first_sentence = next(split_sentences(current))
+        assert first_sentence in sentences and previous.endswith(first_sentence)
+
+
+def test_long_sentences_are_hard_split():
+    stream = "x" * 2500 + ". Short tail."
+    chunks = list(iter_chunks([(None, stream)], chunk_size=1000, overlap=100))
+    check_chunks(stream, chunks, 1000)
+    assert [len(text) for text, _ in chunks][:2] == [1000, 1000]
+
+
+def test_text_files_are_read_in_blocks(tmp_path):
+    path = tmp_path / "notes.txt"
+    path.write_text(sample_text(50))
+    blocks = list(iter_text_blocks(str(path), block_chars=100))
+    assert all(len(text) <= 100 for _, text in blocks) and "".join(text for _, text in blocks) == path.read_text()
+
+
+def test_pdf_pages_carry_page_numbers(make_pdf, pdf_cache):
+    path = make_pdf("three_pages.pdf", ["The capital of Mars is ElonCity.", "", "Mitochondria power the cell."])
+    pages = list(iter_file_pages(path, workers=1))
+    assert [page for page, _ in pages] == [1, 3]  # the blank page is skipped
+    (text, metadata), = iter_chunks(pages)
+    assert "ElonCity" in text and "Mitochondria" in text
+    assert (metadata["page"], metadata["page_end"]) == (1, 3)
+
+
+def test_extraction_workers_send_fixed_size_batches(tmp_path):
+    path = tmp_path / "long.txt"
+    path.write_text(sample_text(400))
+    chunk_queue = queue.Queue()
+    count = send_file_chunks(str(path), "long.txt", "key", chunk_queue, batch_size=4)
+    batches = [chunk_queue.get_nowait() for _ in range(chunk_queue.qsize())]
+    assert count > 8 and sum(len(documents) for _, documents in batches) == count
+    assert all(key == "key" and len(documents) == 4 for key, documents in batches[:-1])
+    starts = [doc.metadata["start_index"] for _, documents in batches for doc in documents]
+    assert starts == sorted(starts) and batches[0][1][0].metadata["source"] == "long.txt"
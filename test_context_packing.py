@@ -0,0 +1,87 @@
+"""
+Context packing tests: run with `python -m pytest test_context_packing.py`.
+"""
+import numpy as np
+from langchain_core.documents import Document
+
+from rag_services.context_packing import merge_group, merge_overlapping, mmr_select, pack_context
+from rag_services.vector_index import FaissVectorIndex
+
+TEXT = "The capital of Mars is ElonCity. Mars has two small moons. Olympus Mons is the tallest volcano."
+
+
+def chunk(start: int, end: int, source: str = "mars.pdf", page: int = 1, doc_id: str = None) -> Document:
+    # Identical texts are dropped as duplicates, so other documents get their own (upper-cased) text
+    text = TEXT[start:end] if source == "mars.pdf" else TEXT[start:end].upper()
+    return Document(page_content=text, id=doc_id or f"{source}:{start}",
+                    metadata={"source": source, "start_index": start, "page": page})
+
+
+def test_overlapping_and_touching_chunks_of_one_document_are_grouped():
+    docs = [chunk(33, 60), chunk(0, 40), chunk(0, 40, source="other.pdf"), chunk(60, 95), chunk(0, 40)]
+    groups = merge_overlapping(docs)
+    # 33-60 overlaps 0-40 and touches 60-95; other.pdf is another document; the repeat is dropped
+    assert [[doc.id for doc in group] for group in groups] == [
+        ["mars.pdf:33", "mars.pdf:0", "mars.pdf:60"], ["other.pdf:0"]]
+
+
+def test_a_chunk_bridging_two_passages_joins_them_into_the_better_ranked_one():
+    groups = merge_overlapping([chunk(60, 95), chunk(0, 30), chunk(25, 65)])
+    assert [[doc.id for doc in group] for group in groups] == [["mars.pdf:60", "mars.pdf:25", "mars.pdf:0"]]
+
+
+def test_chunks_without_offsets_stay_alone():
+    docs = [Document(page_content="no offsets", metadata={"source": "a.txt"}), chunk(0, 40), chunk(20, 50)]
+    assert [len(group) for group in merge_overlapping(docs)] == [1, 2]
+
+
+def test_merged_passage_is_reassembled_in_document_order():
+    group = [chunk(33, 60, page=2, doc_id="best"), chunk(0, 40, page=1), chunk(55, 95, page=3)]
+    merged = merge_group(group)
+    assert merged.page_content == TEXT[0:95]
+    assert merged.id == "best" and merged.metadata["merged_chunks"] == 3
+    assert (merged.metadata["start_index"], merged.metadata["page"], merged.metadata["page_end"]) == (0, 1, 3)
+    single = chunk(0, 40)
+    assert merge_group([single]) is single
+
+
+def test_mmr_trades_relevance_for_diversity():
+    query = np.array([1.0, 0.0], dtype=np.float32)
+    vectors = np.array([[1.0, 0.05], [1.0, 0.0], [0.7, 0.7]], dtype=np.float32)
+    assert mmr_select(query, vectors, 2, lambda_mult=1.0) == [1, 0]
+    # The near-copy of the best row loses to the less relevant but different one
+    assert mmr_select(query, vectors, 2, lambda_mult=0.3) == [1, 2]
+    assert mmr_select(query, vectors, 0) == [] and mmr_select(query, np.zeros((0, 2)), 3) == []
+
+
+def test_pack_context_uses_stored_vectors_and_keeps_retrieval_order(tmp_path, hash_embeddings):
+    passages = ["Mars capital ElonCity", "Mars capital ElonCity again", "Mitochondria cells energy",
+                "Olympus Mons volcano"]
+    docs = [Document(page_content=text, metadata={"source": f"s{i}.txt"}, id=str(i)) for i, text in enumerate(passages)]
+    index = FaissVectorIndex(str(tmp_path), hash_embeddings, index_type="flat")
+    index.add(docs, [doc.id for doc in docs])
+    calls = hash_embeddings.calls
+    packed = pack_context("Mars capital", docs, k=2, index=index, lambda_mult=0.3)
+    assert hash_embeddings.calls == calls + 1  # the query only: chunk vectors come from the index
+    assert [doc.id for doc in packed] == ["0", "2"]  # the near-duplicate passage is left out
+
+
+def test_pack_context_embeds_only_chunks_missing_from_the_index(tmp_path, hash_embeddings):
+    index = FaissVectorIndex(str(tmp_path), hash_embeddings, index_type="flat")
+    stored = [Document(page_content="Mars capital ElonCity", metadata={"source": "a.txt"}, id="a")]
+    index.add(stored, ["a"])
+    extra = [Document(page_content="Mitochondria cells", metadata={"source": "b.txt"}, id="b"),
+             Document(page_content="Olympus Mons volcano", metadata={"source": "c.txt"})]
+    embedded = []
+    original = hash_embeddings.embed_documents
+    hash_embeddings.embed_documents = lambda texts: embedded.extend(texts) or original(texts)
+    packed = pack_context("Mars", stored + extra, k=2, index=index, query_vector=hash_embeddings.embed_query("Mars"))
+    assert embedded == ["Mitochondria cells", "Olympus Mons volcano"]
+    assert len(packed) == 2 and packed[0].id == "a"
+
+
+def test_few_passages_are_returned_without_embedding(hash_embeddings):
+    docs = [chunk(0, 40), chunk(30, 70), chunk(0, 40, source="other.pdf")]
+    packed = pack_context("Mars", docs, k=2, embeddings=hash_embeddings)
+    assert hash_embeddings.calls == 0
+    assert [doc.page_content for doc in packed] == [TEXT[0:70], TEXT[0:40].upper()]
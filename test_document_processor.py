@@ -0,0 +1,141 @@
+"""
+NotebookLM DocumentProcessor tests: run with `python -m pytest test_document_processor.py`.
+The HuggingFace model is replaced by the hash embeddings from conftest.py; skipped when
+the notebook's dependencies (langchain_text_splitters, HuggingFace embeddings) are missing.
+"""
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+from rag_services import embedding_cache
+
+sys.path.insert(0, str(Path(__file__).parent / "NoteBookLMProject"))
+pytest.importorskip("langchain_text_splitters")
+document_processor = pytest.importorskip("document_processor")
+DocumentProcessor = document_processor.DocumentProcessor
+
+MARS = ["The capital of Mars is ElonCity.\nMars has two small moons.", "Olympus Mons is the tallest volcano."]
+CELLS = ["Mitochondria are the powerhouse of the cell.", "Ribosomes build proteins from amino acids."]
+
+
+@pytest.fixture
+def processor(tmp_path, monkeypatch, hash_embeddings):
+    # Caches resolve under tmp_path; fresh chunk stores so none point into another test's directory
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(embedding_cache, "_chunk_stores", {})
+    monkeypatch.setattr(embedding_cache, "_query_cache", None)
+    monkeypatch.setattr(document_processor, "HuggingFaceEmbeddings", lambda model_name: hash_embeddings)
+    return DocumentProcessor(str(tmp_path / "faiss_db"))
+
+
+def sources(docs):
+    return {doc.metadata["source"] for doc in docs}
+
+
+def test_uploads_add_to_the_notebook_instead_of_replacing_it(processor, make_pdf):
+    assert "Processed" in processor.process_document(make_pdf("mars.pdf", MARS))
+    assert "Processed" in processor.process_document(make_pdf("cells.pdf", CELLS))
+    assert sorted(doc["source"] for doc in processor.list_documents()) == ["cells.pdf", "mars.pdf"]
+    assert len(processor.vector_store) == sum(doc["chunks"] for doc in processor.list_documents())
+    assert sources(processor.search("capital of Mars ElonCity", k=1)) == {"mars.pdf"}
+    assert sources(processor.search("mitochondria powerhouse", k=1)) == {"cells.pdf"}
+    assert sources(processor.search("ribosomes", k=5, filters={"source": "mars.pdf"})) <= {"mars.pdf"}
+
+
+def test_unchanged_reupload_is_skipped_and_removal_drops_chunks(processor, make_pdf):
+    path = make_pdf("mars.pdf", MARS)
+    processor.process_document(path)
+    version = processor.versions.version()
+    assert processor.process_document(path) == "Already in notebook: mars.pdf"
+    assert processor.versions.version() == version
+
+    processor.process_document(make_pdf("cells.pdf", CELLS))
+    mars_id = next(doc["doc_id"] for doc in processor.list_documents() if doc["source"] == "mars.pdf")
+    assert processor.remove_document(mars_id).startswith("Removed mars.pdf")
+    assert processor.remove_document(mars_id) == f"Unknown document: {mars_id}"
+    assert sources(processor.search("capital of Mars", k=5)) == {"cells.pdf"}
+
+
+def test_a_new_version_of_a_file_replaces_the_old_one(processor, make_pdf):
+    processor.process_document(make_pdf("mars.pdf", MARS))
+    processor.process_document(make_pdf("mars.pdf", ["The capital of Mars is now MuskVille."]))
+    (document,) = processor.list_documents()
+    assert document["pages"] == 1
+    assert "MuskVille" in processor.search("capital of Mars", k=1)[0].page_content
+    assert len(processor.vector_store) == document["chunks"]
+
+
+def test_notebook_is_reloaded_from_the_published_version(processor, make_pdf, tmp_path):
+    processor.process_document(make_pdf("mars.pdf", MARS))
+    processor.process_document(make_pdf("cells.pdf", CELLS))
+    reopened = DocumentProcessor(str(tmp_path / "faiss_db"))
+    reopened.load_vector_store()
+    assert reopened.list_documents() == processor.list_documents()
+    assert len(reopened.vector_store) == len(processor.vector_store)
+    assert sources(reopened.search("mitochondria powerhouse", k=1)) == {"cells.pdf"}
+
+
+def test_replacement_is_scoped_to_the_uploader(processor, make_pdf, tmp_path):
+    (tmp_path / "u1").mkdir()
+    (tmp_path / "u2").mkdir()
+    processor.process_document(make_pdf("u1/mars.pdf", MARS), user_id="u1")
+    processor.process_document(make_pdf("u2/mars.pdf", ["Mars notes from another student."]), user_id="u2")
+    assert len(processor.list_documents()) == 2
+
+    processor.process_document(make_pdf("u1/mars.pdf", ["The capital of Mars is now MuskVille."]), user_id="u1")
+    owners = {doc["user_id"]: doc["pages"] for doc in processor.list_documents()}
+    assert owners == {"u1": 1, "u2": 1}
+    assert "another student" in processor.search("Mars notes", k=1, filters={"user_id": "u2"})[0].page_content
+    assert "MuskVille" in processor.search("capital of Mars", k=1, filters={"user_id": "u1"})[0].page_content
+
+
+def test_each_uploader_of_the_same_file_gets_their_own_chunks(processor, make_pdf):
+    path = make_pdf("mars.pdf", MARS)
+    processor.process_document(path, user_id="u1")
+    version = processor.versions.version()
+    assert processor.process_document(path, user_id="u2").startswith("Processed")
+    assert processor.process_document(path, user_id="u2") == "Already in notebook: mars.pdf"
+    assert processor.versions.version() == version + 1
+    assert sorted(doc["user_id"] for doc in processor.list_documents()) == ["u1", "u2"]
+    for user_id in ("u1", "u2"):
+        assert sources(processor.search("capital of Mars", k=1, filters={"user_id": user_id})) == {"mars.pdf"}
+
+
+def test_concurrent_uploads_of_one_file_add_it_once(processor, make_pdf, monkeypatch):
+    path = make_pdf("mars.pdf", MARS)
+    processor.load_vector_store()
+    # Both uploads get past the shortcut check before either reaches the write lock
+    both_extracting = threading.Barrier(2, timeout=10)
+    extract = document_processor.iter_pdf_text
+
+    def extract_together(*args):
+        both_extracting.wait()
+        return extract(*args)
+
+    monkeypatch.setattr(document_processor, "iter_pdf_text", extract_together)
+    results = []
+    uploads = [threading.Thread(target=lambda: results.append(processor.process_document(path, user_id="u1")))
+               for _ in range(2)]
+    for upload in uploads:
+        upload.start()
+    for upload in uploads:
+        upload.join()
+    assert sorted(result.split()[0] for result in results) == ["Already", "Processed"]
+    assert len(processor.list_documents()) == 1 and processor.versions.version() == 1
+    assert len(processor.vector_store) == processor.list_documents()[0]["chunks"]
+
+
+def test_a_superseded_store_is_closed_once_no_search_holds_it(processor, make_pdf):
+    processor.process_document(make_pdf("mars.pdf", MARS))
+    first = processor.vector_store
+    processor.process_document(make_pdf("cells.pdf", CELLS))
+    assert first.store._conn is None and processor.vector_store.store._conn is not None
+
+    # A search pinned on the live version keeps it open across an upload
+    with processor.reading() as live:
+        processor.process_document(make_pdf("cells2.pdf", ["Ribosomes build proteins."]))
+        assert live.store is not processor.vector_store
+        assert [doc.id for doc, _ in live.store.search("capital of Mars", k=1)]
+    assert live.store.store._conn is None
@@ -0,0 +1,90 @@
+"""
+Embedding cache tests: run with `python -m pytest test_embedding_cache.py`.
+"""
+import numpy as np
+import pytest
+
+from rag_services.embedding_cache import CachedEmbeddings, ChunkEmbeddingStore, QueryEmbeddingCache, cache_key
+
+
+def test_query_keys_ignore_whitespace_but_not_model_or_case():
+    assert cache_key("m", "capital  of\nMars ") == cache_key("m", "capital of Mars")
+    assert cache_key("m", "capital of mars") != cache_key("m", "capital of Mars")
+    assert cache_key("m", "capital of Mars") != cache_key("other", "capital of Mars")
+
+
+def test_query_cache_serves_memory_then_disk_hits(tmp_path):
+    cache = QueryEmbeddingCache(str(tmp_path), max_memory_entries=1)
+    cache.put("a", "m", [1.0, 2.0])
+    cache.put("b", "m", [3.0, 4.0])  # evicts "a" from memory, not from disk
+    assert cache.get("b").tolist() == [3.0, 4.0]
+    assert cache.get("a").tolist() == [1.0, 2.0]
+    assert cache.get("missing") is None
+    assert cache.stats == {"memory_hits": 1, "disk_hits": 1, "misses": 1}
+
+    reopened = QueryEmbeddingCache(str(tmp_path))
+    assert reopened.get("b").tolist() == [3.0, 4.0]
+    assert reopened.stats["disk_hits"] == 1
+
+
+def test_cached_embeddings_only_call_the_model_on_a_miss(tmp_path, hash_embeddings):
+    model = CachedEmbeddings(hash_embeddings, "test/hash", cache=QueryEmbeddingCache(str(tmp_path)))
+    first = model.embed_query("capital of Mars")
+    assert model.embed_query("capital  of Mars") == first
+    assert hash_embeddings.calls == 1
+    assert np.allclose(first, hash_embeddings.embed_query("capital of Mars"))
+
+
+def test_embed_queries_batches_misses_into_one_call(tmp_path, hash_embeddings):
+    model = CachedEmbeddings(hash_embeddings, "test/hash", cache=QueryEmbeddingCache(str(tmp_path)),
+                             symmetric=True)
+    model.embed_query("photosynthesis")
+    hash_embeddings.calls = 0
+    vectors = model.embed_queries(["photosynthesis", "mitosis", "meiosis", "mitosis"])
+    assert hash_embeddings.calls == 1  # one embed_documents call for the two new queries
+    assert vectors[1] == vectors[3]
+    assert vectors == [hash_embeddings._embed(text) for text in ["photosynthesis", "mitosis", "meiosis", "mitosis"]]
+
+
+def test_chunk_store_returns_cached_rows_and_skips_duplicates(tmp_path):
+    store = ChunkEmbeddingStore(str(tmp_path))
+    assert store.get_many(["a"]) == [None]
+    store.put_many(["a", "b", "a"], [[1, 0], [0, 1], [9, 9]])
+    store.put_many(["b", "c"], [[5, 5], [1, 1]])  # "b" is already stored: keeps its first vector
+    assert len(store) == 3
+    found = store.get_many(["c", "missing", "a", "b"])
+    assert found[1] is None
+    assert [v.tolist() for v in (found[0], found[2], found[3])] == [[1, 1], [1, 0], [0, 1]]
+    assert store.stats == {"hits": 3, "misses": 2}
+
+    reopened = ChunkEmbeddingStore(str(tmp_path))
+    assert reopened.get_many(["b"])[0].tolist() == [0, 1]
+    with pytest.raises(ValueError):
+        reopened.put_many(["d"], [[1, 2, 3]])
+    assert len(reopened) == 3
+
+
+def test_documents_only_embed_chunks_not_seen_before(tmp_path, hash_embeddings):
+    model = CachedEmbeddings(hash_embeddings, "test/hash", cache=QueryEmbeddingCache(str(tmp_path / "q")),
+                             chunk_store=ChunkEmbeddingStore(str(tmp_path / "chunks")))
+    embedded = []
+    original = hash_embeddings.embed_documents
+    hash_embeddings.embed_documents = lambda texts: embedded.append(list(texts)) or original(texts)
+
+    first = model.embed_documents(["mars moons", "cell energy"])
+    second = model.embed_documents(["cell energy", "new chunk", "new chunk", "mars moons"])
+    assert embedded == [["mars moons", "cell energy"], ["new chunk"]]
+    assert second[0] == first[1] and second[3] == first[0] and second[1] == second[2]
+    assert model.embed_documents(["mars moons"]) == [first[0]] and len(embedded) == 2
+
+
+def test_chunk_cache_write_failure_still_returns_vectors(tmp_path, hash_embeddings, monkeypatch):
+    store = ChunkEmbeddingStore(str(tmp_path))
+    model = CachedEmbeddings(hash_embeddings, "test/hash", cache=QueryEmbeddingCache(str(tmp_path / "q")),
+                             chunk_store=store)
+
+    def broken(texts, vectors):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(store, "put_many", broken)
+    assert model.embed_documents(["mars moons"]) == [hash_embeddings._embed("mars moons")]
@@ -0,0 +1,82 @@
+"""
+Embedding backend tests: run with `python -m pytest test_embeddings.py`.
+sentence-transformers is replaced by a stub module, so no model is downloaded.
+"""
+import os
+import sys
+import types
+
+import numpy as np
+import pytest
+
+from rag_services import embedding_cache, embeddings
+from rag_services.embeddings import LocalEmbeddings, kb_collection_name, kb_files
+
+
+class StubSentenceTransformer:
+    instances = []
+
+    def __init__(self, model_name, device):
+        self.model_name = model_name
+        self.device = device
+        self.encode_calls = []
+        StubSentenceTransformer.instances.append(self)
+
+    def encode(self, texts, batch_size, normalize_embeddings, convert_to_numpy, show_progress_bar):
+        self.encode_calls.append((list(texts), batch_size, normalize_embeddings))
+        return np.array([[len(text), 1.0] for text in texts], dtype=np.float32)
+
+
+@pytest.fixture
+def stub_sentence_transformers(monkeypatch):
+    StubSentenceTransformer.instances = []
+    module = types.ModuleType("sentence_transformers")
+    module.SentenceTransformer = StubSentenceTransformer
+    monkeypatch.setitem(sys.modules, "sentence_transformers", module)
+    return StubSentenceTransformer
+
+
+def test_local_model_loads_once_and_encodes_in_one_batched_call(stub_sentence_transformers):
+    model = LocalEmbeddings("stub-model", batch_size=16)
+    assert model.embed_documents([]) == []
+    assert not stub_sentence_transformers.instances  # loaded lazily
+
+    assert model.embed_documents(["a", "bbb"]) == [[1.0, 1.0], [3.0, 1.0]]
+    assert model.embed_query("cc") == [2.0, 1.0]
+    (loaded,) = stub_sentence_transformers.instances
+    assert (loaded.model_name, loaded.device) == ("stub-model", "cpu")
+    assert loaded.encode_calls == [(["a", "bbb"], 16, True), (["cc"], 16, True)]
+
+
+def test_get_embeddings_shares_one_model_per_provider(monkeypatch, tmp_path, stub_sentence_transformers):
+    monkeypatch.chdir(tmp_path)  # the shared query cache is created under ./embedding_cache
+    monkeypatch.setattr(embedding_cache, "_query_cache", None)
+    monkeypatch.setattr(embeddings, "_embeddings", {})
+    monkeypatch.setattr(embeddings, "get_chunk_store", lambda name: None)
+    monkeypatch.setattr(embeddings, "EMBEDDING_PROVIDER", "local")
+    model = embeddings.get_embeddings()
+    assert embeddings.get_embeddings("LOCAL") is model
+    assert isinstance(model.base, LocalEmbeddings) and model.symmetric
+    with pytest.raises(ValueError):
+        embeddings.get_embeddings("unknown")
+
+
+def test_each_provider_gets_its_own_collection(monkeypatch):
+    monkeypatch.setattr(embeddings, "KB_COLLECTION", "kb")
+    assert kb_collection_name("gemini") == "kb"  # collection name used before local embeddings
+    assert kb_collection_name("local") == "kb_local"
+
+
+def test_kb_files_layouts(monkeypatch):
+    monkeypatch.setattr(embeddings, "FAISS_KB_PATH", "faiss_root")
+    monkeypatch.setattr(embeddings, "CHROMA_PATH", "chroma_root")
+    assert kb_files("kb_local", backend="faiss") == {
+        "index": os.path.join("faiss_root", "kb_local"),
+        "bm25": os.path.join("faiss_root", "kb_local_bm25.pkl"),
+        "manifest": os.path.join("faiss_root", "kb_local_manifest.json")}
+    assert kb_files("kb_local", backend="chroma")["index"] == "chroma_root"
+    version = os.path.join("root", "versions", "v1")
+    assert kb_files("kb_local", version_dir=version) == {
+        "index": os.path.join(version, "index"),
+        "bm25": os.path.join(version, "bm25.pkl"),
+        "manifest": os.path.join(version, "manifest.json")}
@@ -0,0 +1,92 @@
+"""
+Metadata filter tests: run with `python -m pytest test_filters.py`.
+The Python, SQLite and Chroma forms of a filter must select the same chunks.
+"""
+import itertools
+import json
+import sqlite3
+
+import pytest
+
+from rag_services.filters import build_filters, chroma_where, matches, normalize_filters, sql_where
+
+CHUNKS = [
+    {"source": "a.pdf", "page": 1, "page_end": 1, "user_id": "u1"},
+    {"source": "a.pdf", "page": 2, "page_end": 5, "user_id": "u2"},
+    {"source": "a.pdf", "page": 7},  # notebook chunks carry no page_end
+    {"source": "b.pdf", "page": 4, "doc_id": "d1"},
+    {"source": "notes.txt"},  # no pages at all
+    {"source": "b.pdf", "page": 9, "page_end": 12, "doc_id": "d2"},
+]
+
+FILTERS = [
+    {"source": "a.pdf"},
+    {"source": ["a.pdf", "b.pdf"], "user_id": "u2"},
+    {"doc_id": ["d1", "d2"]},
+    *({"page_start": start, "page_end": end} for start, end in itertools.product([None, 3, 7, 10], [None, 4, 9])),
+    {"source": "b.pdf", "page_start": 5},
+]
+
+
+def chroma_matches(metadata, where):
+    """Evaluate the subset of Chroma's `where` syntax chroma_where() produces"""
+    if where is None:
+        return True
+    if "$and" in where:
+        return all(chroma_matches(metadata, clause) for clause in where["$and"])
+    if "$or" in where:
+        return any(chroma_matches(metadata, clause) for clause in where["$or"])
+    (field, condition), = where.items()
+    if field not in metadata:
+        return False
+    value = metadata[field]
+    if not isinstance(condition, dict):
+        return value == condition
+    (op, operand), = condition.items()
+    return {"$in": lambda: value in operand, "$gte": lambda: value >= operand,
+            "$lte": lambda: value <= operand}[op]()
+
+
+def sql_matching(filters):
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE chunks (id INTEGER PRIMARY KEY, metadata TEXT)")
+    conn.executemany("INSERT INTO chunks VALUES (?, ?)", [(i, json.dumps(m)) for i, m in enumerate(CHUNKS)])
+    clause, params = sql_where(filters)
+    return {row for row, in conn.execute(f"SELECT id FROM chunks WHERE {clause}", params)}
+
+
+@pytest.mark.parametrize("filters", FILTERS, ids=str)
+def test_python_sql_and_chroma_filters_agree(filters):
+    normalized = normalize_filters(filters)
+    python = {i for i, metadata in enumerate(CHUNKS) if matches(metadata, normalized)}
+    chroma = {i for i, metadata in enumerate(CHUNKS) if chroma_matches(metadata, chroma_where(filters))}
+    assert python == sql_matching(filters) == chroma
+
+
+def test_page_ranges_use_page_when_page_end_is_missing():
+    # Chunk on page 7 without page_end is inside pages 6-8 for every backend
+    filters = {"page_start": 6, "page_end": 8}
+    assert matches(CHUNKS[2], normalize_filters(filters))
+    assert chroma_matches(CHUNKS[2], chroma_where(filters))
+    assert 2 in sql_matching(filters)
+    assert matches({"page": 3, "page_end": None}, normalize_filters({"page_start": 3}))
+
+
+def test_normalize_and_build_filters():
+    assert normalize_filters({"source": "a.pdf", "user_id": None, "doc_id": [], "page_start": "3"}) == {
+        "source": ["a.pdf"], "page_start": 3}
+    assert build_filters() is None and chroma_where(None) is None and sql_where(None) == ("1", [])
+    with pytest.raises(ValueError):
+        normalize_filters({"course": "CS101"})
+
+
+def test_chroma_accepts_the_where_clause():
+    chromadb = pytest.importorskip("chromadb")
+    collection = chromadb.Client().create_collection("filters_test")
+    collection.add(ids=[str(i) for i in range(len(CHUNKS))], metadatas=CHUNKS,
+                   embeddings=[[1.0, float(i)] for i in range(len(CHUNKS))])
+    for filters in FILTERS:
+        where = chroma_where(filters)
+        found = set(collection.get(where=where)["ids"]) if where else {str(i) for i in range(len(CHUNKS))}
+        expected = {str(i) for i, metadata in enumerate(CHUNKS) if matches(metadata, normalize_filters(filters))}
+        assert found == expected, filters
@@ -0,0 +1,101 @@
+"""
+Hedged request tests: run with `python -m pytest test_hedged_requests.py`.
+Chat models are replaced by scripted streams, so no API keys are needed.
+"""
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessageChunk
+
+from ai_services import HedgedRequests
+from ai_services.HedgedRequests import get_tracker, hedged_ainvoke
+
+
+class ScriptedModel:
+    """astream() that waits `delay` seconds, then yields `tokens` (or raises `error`)"""
+
+    def __init__(self, delay: float, tokens=("hello", " world"), error: Exception = None):
+        self.delay = delay
+        self.tokens = tokens
+        self.error = error
+        self.cancelled = False
+
+    async def astream(self, messages):
+        try:
+            await asyncio.sleep(self.delay)
+            if self.error is not None:
+                raise self.error
+            for token in self.tokens:
+                yield AIMessageChunk(content=token)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+
+
+@pytest.fixture(autouse=True)
+def fresh_trackers(monkeypatch):
+    monkeypatch.setattr(HedgedRequests, "_trackers", {})
+    monkeypatch.setattr(HedgedRequests, "DEFAULT_THRESHOLD", 0.05)
+
+
+def run(primary, secondary, outcomes=None):
+    def on_result(provider, error):
+        outcomes.append((provider, error))
+
+    return asyncio.run(hedged_ainvoke(("primary", primary), lambda: secondary and ("secondary", secondary), [],
+                                      on_result=on_result if outcomes is not None else None))
+
+
+def test_fast_primary_is_not_hedged():
+    outcomes = []
+    secondary = ScriptedModel(0)
+    message, provider = run(ScriptedModel(0), secondary, outcomes)
+    assert (message.content, provider) == ("hello world", "primary")
+    assert outcomes == [("primary", None)]
+    assert len(get_tracker("primary").samples) == 1
+
+
+def test_slow_primary_loses_and_is_recorded_as_a_lower_bound():
+    outcomes = []
+    primary = ScriptedModel(0.5)
+    message, provider = run(primary, ScriptedModel(0.01), outcomes)
+    assert provider == "secondary"
+    assert primary.cancelled
+    # The cancelled primary reports how long it ran without a token, not nothing
+    assert get_tracker("primary").samples and get_tracker("primary").samples[0] >= 0.05
+    assert outcomes == [("secondary", None)]
+
+
+def test_failures_are_reported_to_the_provider_that_failed():
+    outcomes = []
+    rate_limited = Exception("429 Too Many Requests")
+    message, provider = run(ScriptedModel(0.2), ScriptedModel(0.01, error=rate_limited), outcomes)
+    assert provider == "primary"
+    assert outcomes == [("secondary", rate_limited), ("primary", None)]
+
+
+def test_both_failing_raises():
+    with pytest.raises(RuntimeError):
+        run(ScriptedModel(0.1, error=RuntimeError("primary down")),
+            ScriptedModel(0.01, error=RuntimeError("secondary down")))
+
+
+def test_empty_stream_returns_an_empty_message():
+    message, provider = run(ScriptedModel(0, tokens=()), None)
+    assert (message.content, provider) == ("", "primary")
+
+
+def test_cancelling_the_caller_cancels_the_requests():
+    primary = ScriptedModel(5)
+
+    async def cancel_soon():
+        task = asyncio.create_task(hedged_ainvoke(("primary", primary), lambda: None, []))
+        await asyncio.sleep(0.1)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        # Nothing hedged_ainvoke started is left running
+        return [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+
+    assert asyncio.run(cancel_soon()) == []
+    assert primary.cancelled
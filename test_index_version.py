@@ -0,0 +1,120 @@
+"""
+Index version tests: run with `python -m pytest test_index_version.py`.
+"""
+import os
+
+from langchain_core.documents import Document
+
+from rag_services.bm25 import BM25Index
+from rag_services.index_version import IndexSnapshot, VersionedDirectory
+from rag_services.vector_index import FaissVectorIndex
+
+
+def facts(*texts):
+    return [Document(page_content=text, metadata={"source": "facts.txt"}) for text in texts]
+
+
+def build(directory, hash_embeddings, texts, ids):
+    store = FaissVectorIndex(directory, hash_embeddings, index_type="flat")
+    store.add(facts(*texts), ids)
+    store.persist()
+    keyword_index = BM25Index.load(os.path.join(directory, "bm25.pkl"))
+    keyword_index.add(ids, list(texts))
+    keyword_index.save(os.path.join(directory, "bm25.pkl"))
+    store.close()
+
+
+def test_publish_moves_the_pointer_and_prunes_old_versions(tmp_path):
+    versions = VersionedDirectory(str(tmp_path), keep=2)
+    assert versions.current() == (None, None)
+    for expected in (1, 2, 3):
+        version, path = versions.stage()
+        assert version == expected and os.path.isdir(path)
+        versions.publish(version)
+    assert versions.current() == (3, versions.path(3))
+    assert sorted(os.listdir(tmp_path)) == ["current.json", "v000002", "v000003"]
+
+
+def test_failed_and_abandoned_stages_are_removed(tmp_path):
+    versions = VersionedDirectory(str(tmp_path))
+    versions.publish(versions.stage()[0])
+    failed, _ = versions.stage()
+    versions.discard(failed)
+    assert not os.path.exists(versions.path(failed))
+    abandoned, _ = versions.stage()  # e.g. the writer crashed before publishing
+    versions.prune()
+    assert not os.path.exists(versions.path(abandoned)) and versions.version() == 1
+
+
+def test_stage_links_append_only_files_and_copies_the_rest(tmp_path, hash_embeddings):
+    versions = VersionedDirectory(str(tmp_path / "versions"))
+    _, first = versions.stage()
+    build(first, hash_embeddings, ["the capital of mars is elon city", "mitochondria power the cell"], ["a", "b"])
+    versions.publish(1)
+
+    _, second = versions.stage(copy_from=first)
+    for name in ("vectors.f32", "bm25.pkl"):
+        assert os.path.samefile(os.path.join(first, name), os.path.join(second, name))
+    assert not os.path.samefile(os.path.join(first, "chunks.sqlite3"), os.path.join(second, "chunks.sqlite3"))
+    cost = versions.last_stage
+    assert cost["copied_bytes"] == os.path.getsize(os.path.join(first, "chunks.sqlite3"))
+    assert cost["linked_bytes"] == sum(os.path.getsize(os.path.join(first, name))
+                                       for name in ("vectors.f32", "bm25.pkl"))
+
+
+def test_building_on_linked_files_leaves_the_published_version_intact(tmp_path, hash_embeddings):
+    versions = VersionedDirectory(str(tmp_path / "versions"))
+    _, first = versions.stage()
+    build(first, hash_embeddings, ["the capital of mars is elon city", "mitochondria power the cell"], ["a", "b"])
+    versions.publish(1)
+    published = FaissVectorIndex(first, hash_embeddings, index_type="flat")
+    before = {doc.id: score for doc, score in published.search("capital of mars", k=2)}
+
+    # The next build appends rows to the shared vectors.f32 and replaces bm25.pkl
+    _, second = versions.stage(copy_from=first)
+    build(second, hash_embeddings, ["mars has two small moons", "olympus mons is a volcano"], ["c", "d"])
+    store = FaissVectorIndex(second, hash_embeddings, index_type="flat")
+    store.delete(["a"])
+    store.persist()
+    assert len(store) == 3
+
+    assert len(published) == 2
+    assert {doc.id: score for doc, score in published.search("capital of mars", k=2)} == before
+    reopened = FaissVectorIndex(first, hash_embeddings, index_type="flat")
+    assert {doc.id: score for doc, score in reopened.search("capital of mars", k=2)} == before
+    assert set(BM25Index.load(os.path.join(first, "bm25.pkl")).doc_lengths) == {"a", "b"}
+
+
+def test_stage_copies_when_links_are_unavailable(tmp_path, hash_embeddings, monkeypatch):
+    versions = VersionedDirectory(str(tmp_path / "versions"))
+    _, first = versions.stage()
+    build(first, hash_embeddings, ["the capital of mars is elon city"], ["a"])
+
+    def no_links(src, dst):
+        raise OSError("cross-device link")
+
+    monkeypatch.setattr(os, "link", no_links)
+    _, second = versions.stage(copy_from=first)
+    assert versions.last_stage["linked_bytes"] == 0
+    assert not os.path.samefile(os.path.join(first, "vectors.f32"), os.path.join(second, "vectors.f32"))
+
+
+def test_snapshot_closes_a_retired_store_after_its_last_reader():
+    class Store:
+        closed = False
+
+        def close(self):
+            self.closed = True
+
+    snapshot = IndexSnapshot(1, Store(), BM25Index())
+    snapshot.readers = 1
+    snapshot.close_if_unused()
+    snapshot.retired = True
+    snapshot.close_if_unused()
+    assert not snapshot.store.closed
+    snapshot.readers = 0
+    snapshot.close_if_unused()
+    assert snapshot.store.closed
+    empty = IndexSnapshot(None, None, BM25Index())  # nothing was opened yet
+    empty.retired = True
+    empty.close_if_unused()
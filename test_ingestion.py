@@ -0,0 +1,145 @@
+"""
+Knowledge-base ingestion tests: run with `python -m pytest test_ingestion.py`.
+Uses the FAISS backend and hash embeddings from conftest.py.
+"""
+import os
+
+import ingestion
+from ingestion import ingest_documents
+from rag_services import embeddings
+from rag_services.embeddings import kb_collection_name, kb_files
+from rag_services.context_packing import merge_overlapping
+from rag_services.index_version import kb_versions
+from rag_services.manifest import IngestManifest
+from rag_services.vector_index import open_kb_index
+
+
+def published():
+    """(version, open index, manifest) of the published knowledge-base version"""
+    versions = kb_versions(kb_collection_name())
+    version, directory = versions.current()
+    manifest = IngestManifest(kb_files(kb_collection_name(), directory)["manifest"])
+    return version, open_kb_index(version_dir=directory), manifest
+
+
+def sources(index):
+    return {doc.metadata["source"] for doc in index.similarity_search("anything at all", k=len(index))}
+
+
+def test_new_changed_and_deleted_files_are_applied(kb_env):
+    (kb_env / "mars.txt").write_text("The capital of Mars is ElonCity.")
+    (kb_env / "notes").mkdir()
+    (kb_env / "notes" / "cells.txt").write_text("Mitochondria are the powerhouse of the cell.")
+    ingest_documents()
+    version, index, manifest = published()
+    assert version == 1 and len(index) == 2
+    assert set(manifest.entries) == {"mars.txt", os.path.join("notes", "cells.txt")}
+    old_ids = manifest.chunk_ids("mars.txt")
+
+    (kb_env / "mars.txt").write_text("The capital of Mars is now MuskVille.")
+    os.remove(kb_env / "notes" / "cells.txt")
+    ingest_documents()
+    version, index, manifest = published()
+    assert version == 2 and len(index) == 1 and sources(index) == {"mars.txt"}
+    assert "MuskVille" in index.similarity_search("capital of Mars", k=1)[0].page_content
+    assert set(manifest.entries) == {"mars.txt"} and manifest.chunk_ids("mars.txt") != old_ids
+
+
+def test_source_is_the_path_relative_to_the_knowledge_base(kb_env):
+    for folder, fact in (("mars", "The capital of Mars is ElonCity."), ("cells", "Mitochondria power the cell.")):
+        (kb_env / folder).mkdir()
+        (kb_env / folder / "notes.txt").write_text(fact)
+    ingest_documents()
+    _, index, _ = published()
+    mars, cells = os.path.join("mars", "notes.txt"), os.path.join("cells", "notes.txt")
+    assert sources(index) == {mars, cells}
+    hits = index.similarity_search("capital of Mars", k=2, filters={"source": cells})
+    assert [doc.page_content for doc in hits] == ["Mitochondria power the cell."]
+
+
+def test_same_named_files_are_never_packed_into_one_passage(kb_env):
+    for folder, fact in (("mars", "The capital of Mars is ElonCity."), ("cells", "Mitochondria power the cell.")):
+        (kb_env / folder).mkdir()
+        (kb_env / folder / "notes.txt").write_text(fact)
+    ingest_documents()
+    _, index, _ = published()
+    hits = index.similarity_search("anything at all", k=2)
+    assert len({doc.metadata["doc_id"] for doc in hits}) == 2
+    assert [len(group) for group in merge_overlapping(hits)] == [1, 1]
+
+
+def test_unchanged_knowledge_base_builds_no_new_version(kb_env):
+    (kb_env / "mars.txt").write_text("The capital of Mars is ElonCity.")
+    ingest_documents()
+    ingest_documents()
+    assert published()[0] == 1
+
+
+def test_large_files_are_embedded_in_batches(kb_env, monkeypatch):
+    monkeypatch.setattr(ingestion, "EMBEDDING_BATCH_SIZE", 2)
+    batch_sizes = []
+    model = embeddings.get_embeddings()
+    original = model.base.embed_documents
+    monkeypatch.setattr(model.base, "embed_documents", lambda texts: batch_sizes.append(len(texts)) or original(texts))
+
+    paragraphs = [f"Paragraph {i} talks about topic number {i}. " * 30 for i in range(5)]
+    (kb_env / "long.txt").write_text("\n\n".join(paragraphs))
+    ingest_documents()
+    version, index, manifest = published()
+    assert len(index) == len(manifest.chunk_ids("long.txt")) > 2
+    assert batch_sizes and max(batch_sizes) <= 2 and sum(batch_sizes) == len(index)
+
+
+def test_unreadable_file_is_not_recorded(kb_env):
+    (kb_env / "good.txt").write_text("Photosynthesis turns light into sugar.")
+    (kb_env / "broken.pdf").write_bytes(b"not really a pdf")
+    ingest_documents()
+    version, index, manifest = published()
+    assert set(manifest.entries) == {"good.txt"} and sources(index) == {"good.txt"}
+
+
+def test_file_failing_mid_stream_keeps_its_previous_chunks(kb_env, monkeypatch):
+    (kb_env / "mars.txt").write_text("The capital of Mars is ElonCity.")
+    ingest_documents()
+    monkeypatch.setattr(ingestion, "EMBEDDING_BATCH_SIZE", 1)
+    original = ingestion.iter_file_chunks
+
+    def fails_after_two(*args):
+        for i, document in enumerate(original(*args)):
+            if i == 2:
+                raise OSError("disk went away")
+            yield document
+
+    # Extraction processes are forked after the patch, so they see it too
+    monkeypatch.setattr(ingestion, "iter_file_chunks", fails_after_two)
+    (kb_env / "mars.txt").write_text("\n".join(f"Mars fact number {i}." for i in range(300)))
+    ingest_documents()
+    version, index, manifest = published()
+    assert version == 2 and len(index) == 1
+    assert "ElonCity" in index.similarity_search("capital of Mars", k=1)[0].page_content
+
+
+def test_embedding_failure_publishes_nothing_and_keeps_the_old_chunks(kb_env, monkeypatch):
+    (kb_env / "mars.txt").write_text("The capital of Mars is ElonCity.")
+    ingest_documents()
+    old_ids = published()[2].chunk_ids("mars.txt")
+
+    def embedding_service_down(texts):
+        raise RuntimeError("embedding service unavailable")
+
+    model = embeddings.get_embeddings().base
+    working = model.embed_documents
+    monkeypatch.setattr(model, "embed_documents", embedding_service_down)
+    (kb_env / "mars.txt").write_text("The capital of Mars is now MuskVille.")
+    ingest_documents()
+    version, index, manifest = published()
+    assert version == 1 and manifest.chunk_ids("mars.txt") == old_ids and len(index) == 1
+    assert "ElonCity" in index.similarity_search("capital of Mars", k=1)[0].page_content
+    assert not os.path.exists(kb_versions(kb_collection_name()).path(2))
+
+    # The next run retries the file
+    monkeypatch.setattr(model, "embed_documents", working)
+    ingest_documents()
+    version, index, manifest = published()
+    assert version == 2 and len(index) == 1
+    assert "MuskVille" in index.similarity_search("capital of Mars", k=1)[0].page_content
@@ -0,0 +1,132 @@
+"""
+Knowledge-base watcher tests: run with `python -m pytest test_kb_watcher.py`.
+Ingestion is a recording stub except in the last test, which runs the real pipeline.
+"""
+import os
+import threading
+import time
+
+import pytest
+
+from kb_watcher import KnowledgeBaseWatcher
+from rag_services.embeddings import kb_collection_name, kb_files
+from rag_services.index_version import kb_versions
+from rag_services.manifest import IngestManifest
+
+
+class RecordingIngest:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, paths, root):
+        self.calls.append((paths, root))
+
+
+def wait_for(condition, timeout: float = 10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def root(tmp_path):
+    path = tmp_path / "kb"
+    path.mkdir()
+    return path
+
+
+def test_events_are_filtered_to_supported_files_under_root(root, tmp_path):
+    watcher = KnowledgeBaseWatcher(str(root), debounce=0, ingest=RecordingIngest())
+    watcher.notify(str(root / "mars.pdf"))
+    watcher.notify(str(root / "notes" / "cells.TXT"))
+    watcher.notify(str(root / "deleted_dir"))  # no extension: may be a removed directory
+    watcher.notify(str(root / "image.png"))
+    watcher.notify(str(tmp_path / "outside.txt"))
+    assert watcher._next_batch() == {"mars.pdf", os.path.join("notes", "cells.TXT"), "deleted_dir"}
+
+
+def test_a_burst_of_events_is_debounced_into_one_batch(root):
+    watcher = KnowledgeBaseWatcher(str(root), debounce=0.2, ingest=RecordingIngest())
+    start = time.monotonic()
+    for name in ("a.txt", "b.txt", "a.txt"):
+        watcher.notify(str(root / name))
+        time.sleep(0.05)
+    assert watcher._next_batch() == {"a.txt", "b.txt"}
+    # Released 0.2s after the last event, not the first
+    assert time.monotonic() - start >= 0.1 + 0.2
+
+
+def test_max_delay_bounds_the_wait_under_a_steady_stream_of_events(root):
+    watcher = KnowledgeBaseWatcher(str(root), debounce=0.3, max_delay=0.5, ingest=RecordingIngest())
+    stop = threading.Event()
+
+    def keep_writing():
+        while not stop.is_set():
+            watcher.notify(str(root / "growing.txt"))
+            time.sleep(0.05)
+
+    writer = threading.Thread(target=keep_writing)
+    start = time.monotonic()
+    writer.start()
+    try:
+        assert watcher._next_batch() == {"growing.txt"}
+        assert 0.5 <= time.monotonic() - start < 3
+    finally:
+        stop.set()
+        writer.join()
+
+
+def test_worker_passes_root_and_scopes_each_run(root):
+    ingest = RecordingIngest()
+    watcher = KnowledgeBaseWatcher(str(root), debounce=0.05, poll_interval=60, ingest=ingest)
+    watcher.start()  # catch-up: one full scan
+    try:
+        wait_for(lambda: watcher.runs == 1)
+        watcher.notify(str(root / "b.txt"))
+        watcher.notify(str(root / "a.pdf"))
+        wait_for(lambda: watcher.runs == 2)
+    finally:
+        watcher.stop()
+    assert ingest.calls == [(None, str(root)), (["a.pdf", "b.txt"], str(root))]
+
+
+def test_failed_ingestion_does_not_stop_the_worker(root):
+    calls = []
+
+    def flaky_ingest(paths, root):
+        calls.append(paths)
+        if len(calls) == 1:
+            raise RuntimeError("disk full")
+
+    watcher = KnowledgeBaseWatcher(str(root), debounce=0.05, poll_interval=60, ingest=flaky_ingest)
+    watcher.start(catch_up=False)
+    try:
+        watcher.notify(str(root / "a.txt"))
+        wait_for(lambda: watcher.runs == 1)
+        watcher.notify(str(root / "b.txt"))
+        wait_for(lambda: watcher.runs == 2)
+    finally:
+        watcher.stop()
+    assert calls == [["a.txt"], ["b.txt"]]
+
+
+def test_polling_picks_up_changes_and_ingests_the_watched_root(kb_env, tmp_path, monkeypatch):
+    # The watched directory is not KNOWLEDGE_BASE_DIR: ingestion must read from it
+    notes = tmp_path / "course_notes"
+    notes.mkdir()
+    # Poll even where watchdog is installed; a slow-starting poll thread must still see files
+    # written right after start() as changes
+    monkeypatch.setattr(KnowledgeBaseWatcher, "_start_observer", lambda self: False)
+    poll = KnowledgeBaseWatcher._poll
+    monkeypatch.setattr(KnowledgeBaseWatcher, "_poll", lambda self, *args: time.sleep(0.2) or poll(self, *args))
+    watcher = KnowledgeBaseWatcher(str(notes), debounce=0.05, poll_interval=0.05)
+    watcher.start(catch_up=False)
+    try:
+        (notes / "mars.txt").write_text("The capital of Mars is ElonCity.")
+        wait_for(lambda: watcher.runs >= 1)
+    finally:
+        watcher.stop()
+    version, directory = kb_versions(kb_collection_name()).current()
+    manifest = IngestManifest(kb_files(kb_collection_name(), directory)["manifest"])
+    assert version == 1 and set(manifest.entries) == {"mars.txt"}
@@ -0,0 +1,75 @@
+"""
+Ingestion manifest tests: run with `python -m pytest test_manifest.py`.
+"""
+import os
+
+from rag_services.manifest import IngestManifest, chunk_ids_for, file_sha256, in_scope
+
+
+def write(root, rel_path, text):
+    path = root / rel_path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+    return str(rel_path), str(path)
+
+
+def record(manifest, rel_path, abs_path):
+    content_hash = file_sha256(abs_path)
+    manifest.update(rel_path, abs_path, content_hash, chunk_ids_for(rel_path, content_hash, 2))
+
+
+def test_chunk_ids_are_deterministic_per_path_and_content():
+    assert chunk_ids_for("a.txt", "f" * 64, 2) == chunk_ids_for("a.txt", "f" * 64, 2)
+    assert chunk_ids_for("a.txt", "f" * 64, 3)[:2] == chunk_ids_for("a.txt", "f" * 64, 2)
+    assert not set(chunk_ids_for("a.txt", "f" * 64, 2)) & set(chunk_ids_for("b.txt", "f" * 64, 2))
+    assert not set(chunk_ids_for("a.txt", "f" * 64, 2)) & set(chunk_ids_for("a.txt", "e" * 64, 2))
+
+
+def test_diff_reports_new_modified_and_deleted_files(tmp_path):
+    manifest = IngestManifest(str(tmp_path / "manifest.json"))
+    kept = write(tmp_path, "kept.txt", "unchanged")
+    edited = write(tmp_path, "edited.txt", "before")
+    gone = write(tmp_path, "gone.txt", "soon deleted")
+    for rel_path, abs_path in (kept, edited, gone):
+        record(manifest, rel_path, abs_path)
+    manifest.save()
+
+    edited = write(tmp_path, "edited.txt", "after the edit")
+    added = write(tmp_path, "added.txt", "new")
+    os.remove(gone[1])
+    changed, deleted = IngestManifest(manifest.path).diff([kept, edited, added])
+    assert sorted(rel for rel, _, _ in changed) == ["added.txt", "edited.txt"]
+    assert dict((rel, h) for rel, _, h in changed)["edited.txt"] == file_sha256(edited[1])
+    assert deleted == ["gone.txt"]
+
+
+def test_touched_but_identical_file_is_not_changed(tmp_path):
+    manifest = IngestManifest(str(tmp_path / "manifest.json"))
+    rel_path, abs_path = write(tmp_path, "a.txt", "same text")
+    record(manifest, rel_path, abs_path)
+    stat = os.stat(abs_path)
+    os.utime(abs_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert manifest.diff([(rel_path, abs_path)]) == ([], [])
+    assert manifest.entries[rel_path]["mtime_ns"] == stat.st_mtime_ns + 10 ** 9
+
+
+def test_scope_limits_deletions_to_the_scanned_paths(tmp_path):
+    manifest = IngestManifest(str(tmp_path / "manifest.json"))
+    files = [write(tmp_path, rel, rel) for rel in ("notes/a.txt", "notes/b.txt", "notesextra/c.txt", "d.txt")]
+    for rel_path, abs_path in files:
+        record(manifest, rel_path, abs_path)
+    # Only notes/ was scanned and only notes/a.txt is still there
+    changed, deleted = manifest.diff([files[0]], scope=["notes/"])
+    assert changed == [] and deleted == [os.path.join("notes", "b.txt")]
+    assert in_scope("d.txt", ["d.txt"]) and not in_scope("notesextra/c.txt", ["notes"])
+
+
+def test_chunk_ids_and_remove_round_trip_through_save(tmp_path):
+    manifest = IngestManifest(str(tmp_path / "index" / "manifest.json"))
+    rel_path, abs_path = write(tmp_path, "a.txt", "text")
+    record(manifest, rel_path, abs_path)
+    manifest.save()
+    reopened = IngestManifest(manifest.path)
+    assert reopened.chunk_ids(rel_path) == manifest.chunk_ids(rel_path) and len(reopened.chunk_ids(rel_path)) == 2
+    reopened.remove(rel_path)
+    assert reopened.chunk_ids(rel_path) == []
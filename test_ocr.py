@@ -0,0 +1,83 @@
+"""
+OCR tests: run with `python -m pytest test_ocr.py`.
+Tesseract is replaced by a stub that "reads" an image as its byte count, so only the
+page handling, caching and parallelism are exercised.
+"""
+import sys
+import types
+
+import pymupdf
+import pytest
+
+from rag_services.ocr import OcrCache, ocr_page, ocr_pages
+
+
+@pytest.fixture
+def tesseract(monkeypatch, tmp_path):
+    """Stub pytesseract/PIL; returns the list of (image size, lang) OCR calls"""
+    calls = []
+    pil = types.ModuleType("PIL")
+    pil.Image = types.ModuleType("PIL.Image")
+    pil.Image.open = lambda stream: stream.read()
+    pytesseract = types.ModuleType("pytesseract")
+
+    def image_to_string(image, lang):
+        calls.append((len(image), lang))
+        return f"ocr text ({len(image)} bytes)"
+
+    pytesseract.image_to_string = image_to_string
+    monkeypatch.setitem(sys.modules, "PIL", pil)
+    monkeypatch.setitem(sys.modules, "PIL.Image", pil.Image)
+    monkeypatch.setitem(sys.modules, "pytesseract", pytesseract)
+    monkeypatch.chdir(tmp_path)  # ./ocr_cache
+    return calls
+
+
+@pytest.fixture
+def scanned_pdf(make_pdf, tmp_path):
+    """PDF whose page 1 is a picture of text, page 2 is blank and page 3 repeats page 1's picture"""
+    source = pymupdf.open(make_pdf("source.pdf", ["The capital of Mars is ElonCity."]))
+    png = source[0].get_pixmap(dpi=72).tobytes("png")
+    document = pymupdf.open()
+    for has_image in (True, False, True):
+        page = document.new_page()
+        if has_image:
+            page.insert_image(page.rect, stream=png)
+    path = str(tmp_path / "scanned.pdf")
+    document.save(path)
+    return path
+
+
+def test_embedded_images_are_ocrd_once_and_then_cached(tesseract, scanned_pdf, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    number, text, counts = ocr_page(scanned_pdf, 1, lang="eng", cache_dir=cache_dir)
+    assert number == 1 and text.startswith("ocr text")
+    assert counts == {"ocr": 1, "cached": 0, "rendered": 0}
+    # Same image on page 3: served from the cache
+    cached = ocr_page(scanned_pdf, 3, lang="eng", cache_dir=cache_dir)
+    assert cached[1:] == (text, {"ocr": 0, "cached": 1, "rendered": 0})
+    # Another language is a different cache entry
+    ocr_page(scanned_pdf, 1, lang="deu", cache_dir=cache_dir)
+    assert [lang for _, lang in tesseract] == ["eng", "deu"]
+
+
+def test_pages_without_images_are_rendered_and_ocrd(tesseract, scanned_pdf, tmp_path):
+    number, text, counts = ocr_page(scanned_pdf, 2, dpi=50, cache_dir=str(tmp_path / "cache"))
+    assert counts == {"ocr": 1, "cached": 0, "rendered": 1}
+    assert text == f"ocr text ({tesseract[0][0]} bytes)"
+
+
+def test_ocr_pages_runs_pages_in_parallel(tesseract, scanned_pdf):
+    # Worker processes are forked after the stubs are installed
+    results = ocr_pages(scanned_pdf, [1, 2, 3], workers=3, dpi=50)
+    assert sorted(results) == [1, 2, 3] and results[1] == results[3]
+    assert ocr_pages(scanned_pdf, []) == {}
+
+
+def test_ocr_cache_round_trip(tmp_path):
+    cache = OcrCache(str(tmp_path))
+    key = OcrCache.key(b"image", "eng")
+    assert key != OcrCache.key(b"image", "deu") and cache.get(key) is None
+    cache.put(key, "text")
+    cache.close()
+    assert OcrCache(str(tmp_path)).get(key) == "text"
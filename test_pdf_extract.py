@@ -0,0 +1,73 @@
+"""
+PDF extraction layer tests: run with `python -m pytest test_pdf_extract.py`.
+"""
+import pytest
+
+from rag_services import pdf_extract
+from rag_services.pdf_extract import _page_ranges, extract_pdf_text, iter_pdf_text
+
+PAGES = [f"Page {i} talks about topic {i}." if i % 4 else "" for i in range(1, 11)]
+
+
+def test_every_page_is_yielded_in_order(make_pdf, pdf_cache):
+    pages = list(iter_pdf_text(make_pdf("ten.pdf", PAGES), workers=1))
+    assert [number for number, _ in pages] == list(range(1, 11))
+    assert [text.strip() for _, text in pages] == PAGES
+
+
+def test_parallel_ranges_match_sequential_extraction(make_pdf, pdf_cache, monkeypatch):
+    monkeypatch.setattr(pdf_extract, "PDF_PARALLEL_MIN_PAGES", 4)
+    path = make_pdf("ten.pdf", PAGES)
+    parallel = list(iter_pdf_text(path, workers=3, use_cache=False))
+    assert parallel == list(iter_pdf_text(path, workers=1, use_cache=False))
+
+
+@pytest.mark.parametrize("count, parts", [(10, 3), (64, 8), (5, 8), (1, 1)])
+def test_page_ranges_cover_every_page_once(count, parts):
+    ranges = _page_ranges(count, parts)
+    assert len(ranges) <= parts
+    assert [page for start, end in ranges for page in range(start, end)] == list(range(1, count + 1))
+
+
+def test_repeated_extraction_is_served_from_the_cache(make_pdf, pdf_cache, monkeypatch):
+    path = make_pdf("ten.pdf", PAGES)
+    first = list(iter_pdf_text(path, workers=1))
+
+    def not_parsed(*args):
+        raise AssertionError("PDF parsed again")
+
+    monkeypatch.setattr(pdf_extract, "iter_page_range", not_parsed)
+    assert list(iter_pdf_text(path, workers=1)) == first
+    # Different content means a different key
+    with pytest.raises(AssertionError):
+        list(iter_pdf_text(make_pdf("other.pdf", ["New content."]), workers=1))
+
+
+def test_pages_stream_into_the_cache_as_they_are_read(make_pdf, pdf_cache, monkeypatch):
+    monkeypatch.setattr(pdf_extract, "CACHE_BATCH_PAGES", 2)
+    read = []
+    extract = pdf_extract.iter_page_range
+
+    def recording(*args):
+        for page in extract(*args):
+            read.append(page[0])
+            yield page
+
+    monkeypatch.setattr(pdf_extract, "iter_page_range", recording)
+    path = make_pdf("ten.pdf", PAGES)
+    pages = iter_pdf_text(path, workers=1)
+    for _ in range(5):
+        next(pages)
+    # Only the pages asked for were extracted; full batches are already stored
+    assert read == [1, 2, 3, 4, 5]
+    key = f"{pdf_extract.file_sha256(path)}:{pdf_extract.EXTRACTOR_VERSION}"
+    assert not pdf_cache.has(key)  # a partly read file is not served from the cache
+    assert pdf_cache._conn.execute("SELECT COUNT(*) FROM pages WHERE key = ?", (key,)).fetchone()[0] == 4
+    rest = list(pages)
+    assert [number for number, _ in rest] == list(range(6, 11)) and pdf_cache.has(key)
+    assert [number for number, _ in pdf_cache.iter_pages(key)] == list(range(1, 11))
+
+
+def test_whole_text_joins_pages_with_newlines(make_pdf, pdf_cache):
+    text = extract_pdf_text(make_pdf("two.pdf", ["First page.", "Second page."]), workers=1)
+    assert text == "First page.\nSecond page.\n"
@@ -0,0 +1,63 @@
+"""
+Speculative prefetch tests: run with `python -m pytest test_prefetch.py`.
+"""
+import threading
+
+from rag_services.prefetch import SpeculativePrefetcher, query_terms, similarity
+
+
+def test_query_terms_drop_stopwords_and_case():
+    assert query_terms("What is the Capital of Mars?") == {"capital", "mars"}
+    assert similarity(query_terms("capital of mars"), query_terms("Mars capital city")) == 2 / 3
+    assert similarity(frozenset(), frozenset()) == 1.0
+
+
+def test_near_same_query_is_served_from_the_prefetch_once():
+    calls = []
+    prefetcher = SpeculativePrefetcher(lambda q: calls.append(q) or f"result for {q}")
+    assert prefetcher.start("Tell me about the capital of Mars")
+    assert prefetcher.take("capital of mars") == "result for Tell me about the capital of Mars"
+    # Consumed: a second request searches normally
+    assert prefetcher.take("capital of mars") is None
+    assert calls == ["Tell me about the capital of Mars"]
+    assert prefetcher.stats["hits"] == 1 and prefetcher.stats["misses"] == 1
+
+
+def test_trivial_and_unrelated_queries_are_not_matched():
+    prefetcher = SpeculativePrefetcher(lambda q: q)
+    assert not prefetcher.start("hello")
+    assert prefetcher.start("photosynthesis light reactions")
+    assert prefetcher.take("french revolution causes") is None
+
+
+def test_take_waits_for_a_running_search():
+    release = threading.Event()
+
+    def slow_search(query):
+        release.wait(5)
+        return "done"
+
+    prefetcher = SpeculativePrefetcher(slow_search)
+    prefetcher.start("quantum entanglement basics")
+    threading.Timer(0.05, release.set).start()
+    assert prefetcher.take("quantum entanglement basics") == "done"
+
+
+def test_failed_search_returns_none():
+    def broken(query):
+        raise RuntimeError("index unavailable")
+
+    prefetcher = SpeculativePrefetcher(broken)
+    prefetcher.start("linear algebra eigenvalues")
+    assert prefetcher.take("linear algebra eigenvalues") is None
+
+
+def test_entries_expire_and_are_bounded():
+    prefetcher = SpeculativePrefetcher(lambda q: q, ttl_seconds=-1, max_entries=2)
+    prefetcher.start("cell biology mitosis")
+    assert prefetcher.take("cell biology mitosis") is None
+    prefetcher = SpeculativePrefetcher(lambda q: q, max_entries=2)
+    for query in ("alpha beta", "gamma delta", "epsilon zeta"):
+        prefetcher.start(query)
+    assert prefetcher.take("alpha beta") is None
+    assert prefetcher.take("epsilon zeta") == "epsilon zeta"
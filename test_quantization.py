@@ -0,0 +1,150 @@
+"""
+Vector quantization tests: run with `python -m pytest test_quantization.py`.
+"""
+import os
+
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+
+from rag_services import quantization, vector_index
+from rag_services.quantization import BinaryCodec, Int8Codec, encode_blocks, get_codec, scan
+from rag_services.vector_index import FaissVectorIndex
+
+
+def unit_vectors(count: int, dim: int = 32, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((20, dim))
+    vectors = centers[rng.integers(0, 20, count)] + 0.5 * rng.standard_normal((count, dim))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def queries_near(vectors: np.ndarray, count: int, seed: int = 1) -> np.ndarray:
+    """Unit queries close to stored vectors, as real questions are to the chunks that answer them"""
+    rng = np.random.default_rng(seed)
+    queries = vectors[rng.choice(len(vectors), count, replace=False)]
+    queries = queries + 0.9 * rng.standard_normal(queries.shape) / np.sqrt(vectors.shape[1])
+    return (queries / np.linalg.norm(queries, axis=1, keepdims=True)).astype(np.float32)
+
+
+def add_all(index, vectors):
+    index.add([Document(page_content=f"chunk {i}", metadata={"source": f"s{i % 4}.txt"}) for i in range(len(vectors))],
+              [str(i) for i in range(len(vectors))], vectors)
+
+
+def top_ids(index, query, k):
+    return [doc.id for doc, _ in index.search_by_vector(query, k)]
+
+
+def exact_top(vectors, query, k):
+    return [str(i) for i in np.argsort(-(vectors @ query), kind="stable")[:k]]
+
+
+def test_int8_scores_approximate_the_inner_product():
+    vectors, queries = unit_vectors(200), unit_vectors(5, seed=1)
+    codec = Int8Codec()
+    codes = codec.encode(vectors)
+    assert codes.shape == (200, codec.code_size(32)) and codes.dtype == np.uint8
+    assert np.abs(codec.scores(queries, codes) - queries @ vectors.T).max() < 0.02
+
+
+def test_binary_scores_are_the_inner_product_with_the_signs():
+    vectors, queries = unit_vectors(50, dim=20), unit_vectors(3, dim=20, seed=1)
+    codec = BinaryCodec()
+    codes = codec.encode(vectors)
+    assert codes.shape == (50, codec.code_size(20)) == (50, 3)
+    np.testing.assert_allclose(codec.scores(queries, codes), queries @ np.where(vectors > 0, 1, -1).T, atol=1e-5)
+
+
+def test_block_encoding_and_scanning_match_one_pass(monkeypatch):
+    monkeypatch.setattr(quantization, "SCAN_BLOCK", 7)
+    vectors, queries = unit_vectors(50), unit_vectors(2, seed=1)
+    for codec in (Int8Codec(), BinaryCodec()):
+        codes = encode_blocks(codec, vectors)
+        np.testing.assert_array_equal(codes, codec.encode(vectors))
+        np.testing.assert_allclose(scan(codec, queries, codes), codec.scores(queries, codes), atol=1e-6)
+
+
+def test_get_codec():
+    assert get_codec(None) is None and get_codec("none") is None
+    assert get_codec("sq8").name == "sq8" and get_codec("binary").name == "binary"
+    with pytest.raises(ValueError):
+        get_codec("pq4")
+
+
+@pytest.mark.parametrize("quantization_name", ["sq8", "binary"])
+def test_quantized_flat_search_rescores_to_exact_results(tmp_path, quantization_name):
+    vectors = unit_vectors(2000, dim=64)
+    queries = queries_near(vectors, 20)
+    index = FaissVectorIndex(str(tmp_path), embeddings=None, index_type="flat", quantization=quantization_name)
+    add_all(index, vectors)
+    recall = np.mean([len(set(top_ids(index, q, 10)) & set(exact_top(vectors, q, 10))) / 10 for q in queries])
+    assert recall >= 0.9
+    # Returned scores are the exact float scores of the re-scored short list
+    for doc, score in index.search_by_vector(queries[0], 5):
+        assert score == pytest.approx(float(vectors[int(doc.id)] @ queries[0]), abs=1e-5)
+    stats = index.stats()
+    assert stats["quantization"] == quantization_name and stats["rescore_factor"] > 0
+    assert stats["index_bytes"] < stats["vector_bytes"]
+
+
+def test_codes_are_persisted_next_to_the_vectors_and_mapped_on_reload(tmp_path):
+    vectors = unit_vectors(300)
+    index = FaissVectorIndex(str(tmp_path), embeddings=None, index_type="flat", quantization="sq8")
+    add_all(index, vectors[:200])
+    index.persist()
+    add_all(index, vectors)  # the first 200 are replaced, 100 are new
+    index.persist()
+    codes_path = os.path.join(str(tmp_path), "codes.sq8")
+    assert os.path.getsize(codes_path) == index.next_id * Int8Codec().code_size(32)
+
+    reopened = FaissVectorIndex(str(tmp_path), embeddings=None, index_type="flat", quantization="sq8")
+    assert isinstance(reopened._codes_mapped, np.memmap) and len(reopened) == 300
+    assert top_ids(reopened, vectors[250], 1) == ["250"]
+
+
+def test_enabling_quantization_encodes_an_existing_store(tmp_path):
+    vectors = unit_vectors(100)
+    index = FaissVectorIndex(str(tmp_path), embeddings=None, index_type="flat")
+    add_all(index, vectors)
+    index.persist()
+    index.close()
+    quantized = FaissVectorIndex(str(tmp_path), embeddings=None, index_type="flat", quantization="binary")
+    assert os.path.getsize(os.path.join(str(tmp_path), "codes.binary")) == 100 * BinaryCodec().code_size(32)
+    assert top_ids(quantized, vectors[42], 1) == ["42"]
+
+
+def test_rescore_factor_zero_returns_first_pass_scores(tmp_path):
+    vectors, query = unit_vectors(500), unit_vectors(1, seed=1)[0]
+    index = FaissVectorIndex(str(tmp_path), embeddings=None, index_type="flat", quantization="sq8")
+    add_all(index, vectors)
+    index.set_search_params(rescore_factor=0)
+    assert index.stats()["rescore_factor"] == 0
+    hits = index.search_by_vector(query, 5)
+    approximate = [score for _, score in hits]
+    exact = [float(vectors[int(doc.id)] @ query) for doc, _ in hits]
+    assert approximate != exact and np.allclose(approximate, exact, atol=0.02)
+
+
+def test_filtered_quantized_search_scans_codes_of_allowed_rows(tmp_path, monkeypatch):
+    # Force the code-scanning path instead of exact scoring of the allowed rows
+    monkeypatch.setattr(vector_index, "FILTER_EXACT_MAX", 0)
+    vectors, query = unit_vectors(400), unit_vectors(1, seed=1)[0]
+    index = FaissVectorIndex(str(tmp_path), embeddings=None, index_type="flat", quantization="sq8")
+    add_all(index, vectors)
+    hits = index.search_by_vector(query, 5, filters={"source": "s1.txt"})
+    assert len(hits) == 5 and all(doc.metadata["source"] == "s1.txt" for doc, _ in hits)
+    allowed = np.arange(1, 400, 4)
+    assert [doc.id for doc, _ in hits] == [str(i) for i in allowed[np.argsort(-(vectors[allowed] @ query))[:5]]]
+
+
+def test_quantized_hnsw_stores_int8_vectors_in_the_graph(tmp_path):
+    import faiss
+
+    vectors = unit_vectors(600)
+    index = FaissVectorIndex(str(tmp_path), embeddings=None, index_type="hnsw", quantization="binary")
+    add_all(index, vectors)
+    index.wait_for_build()
+    assert index.active_type == "hnsw" and isinstance(index._inner(index.index), faiss.IndexHNSWSQ)
+    hits = [top_ids(index, vectors[i], 1) == [str(i)] for i in range(0, 600, 20)]
+    assert sum(hits) / len(hits) > 0.95
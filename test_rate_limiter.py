@@ -0,0 +1,103 @@
+"""
+RateLimiter tests: run with `python -m pytest test_rate_limiter.py`.
+"""
+import time
+
+import pytest
+
+from ai_services.RateLimiter import (MIN_RATE_SCALE, RATE_INCREASE_STEP, ProviderLimiter, TokenBucket,
+                                     is_rate_limit_error, parse_retry_after)
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+
+def test_bucket_refills_continuously_up_to_capacity():
+    bucket = TokenBucket(60)  # one token per second
+    bucket.consume(60)
+    start = bucket.updated
+    assert bucket.wait_time(1, start) == pytest.approx(1.0)
+    assert bucket.wait_time(1, start + 0.5) == pytest.approx(0.5)
+    assert bucket.wait_time(1, start + 1.0) == 0.0
+    bucket.wait_time(1, start + 1000)
+    assert bucket.tokens == 60
+
+
+def test_oversized_request_waits_for_a_full_bucket_only():
+    bucket = TokenBucket(60)
+    bucket.consume(60)
+    assert bucket.wait_time(500, bucket.updated) == pytest.approx(60.0)
+
+
+def test_try_acquire_respects_both_buckets():
+    limiter = ProviderLimiter("test", rpm=2, tpm=1000)
+    assert limiter.try_acquire(100)
+    assert limiter.try_acquire(100)
+    assert not limiter.try_acquire(100)  # out of requests
+    limiter = ProviderLimiter("test", rpm=100, tpm=1000)
+    assert limiter.try_acquire(900)
+    assert not limiter.try_acquire(200)  # out of tokens
+
+
+def test_429_halves_the_rate_blocks_and_recovers_additively():
+    limiter = ProviderLimiter("test", rpm=600, tpm=100000)
+    limiter.record_rate_limited(retry_after=0.2)
+    assert limiter.scale == 0.5
+    assert limiter.requests.rate == pytest.approx(600 * 0.5 / 60)
+    assert limiter.blocked_until > time.monotonic()
+    assert not limiter.try_acquire(10)
+
+    for _ in range(10):
+        limiter.record_rate_limited(retry_after=0)
+    assert limiter.scale == MIN_RATE_SCALE
+
+    limiter.record_success()
+    assert limiter.scale == pytest.approx(MIN_RATE_SCALE + RATE_INCREASE_STEP)
+    assert limiter.consecutive_429s == 0
+
+
+def test_backoff_without_retry_after_grows_exponentially():
+    limiter = ProviderLimiter("test", rpm=600, tpm=100000)
+    limiter.record_rate_limited()
+    first = limiter.blocked_until - time.monotonic()
+    limiter.record_rate_limited()
+    second = limiter.blocked_until - time.monotonic()
+    assert first == pytest.approx(2.0, abs=0.1)
+    assert second == pytest.approx(4.0, abs=0.1)
+
+
+def test_call_retries_after_429_and_waits_out_the_block():
+    limiter = ProviderLimiter("test", rpm=6000, tpm=10 ** 6)
+    attempts = []
+
+    def flaky():
+        attempts.append(time.monotonic())
+        if len(attempts) == 1:
+            raise Exception("429 Too Many Requests. Please try again in 0.2s")
+        return "ok"
+
+    assert limiter.call(flaky, estimated_tokens=10) == "ok"
+    assert len(attempts) == 2
+    assert attempts[1] - attempts[0] >= 0.2
+    assert limiter.stats["rate_limited"] == 1
+
+
+def test_call_does_not_retry_other_errors():
+    limiter = ProviderLimiter("test", rpm=6000, tpm=10 ** 6)
+
+    def broken():
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        limiter.call(broken)
+    assert limiter.stats["calls"] == 1
+
+
+def test_rate_limit_detection_and_retry_hints():
+    assert is_rate_limit_error(RateLimitError())
+    assert is_rate_limit_error(Exception("429 RESOURCE_EXHAUSTED"))
+    assert not is_rate_limit_error(Exception("500 internal error"))
+    assert parse_retry_after(Exception("'retryDelay': '23s'")) == 23.0
+    assert parse_retry_after(Exception("Please try again in 7.66s")) == 7.66
+    assert parse_retry_after(Exception("no hint")) is None
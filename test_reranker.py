@@ -0,0 +1,67 @@
+"""
+Cross-encoder reranker tests: run with `python -m pytest test_reranker.py`.
+The cross-encoder is replaced by a word-overlap scorer, so no model is downloaded.
+"""
+from langchain_core.documents import Document
+
+from rag_services.reranker import CrossEncoderReranker
+
+
+class OverlapCrossEncoder:
+    """predict() scores a pair by the number of query words in the passage"""
+
+    def __init__(self):
+        self.batches = []
+
+    def predict(self, pairs, batch_size, show_progress_bar):
+        self.batches.append(len(pairs))
+        return [len(set(query.lower().split()) & set(text.lower().split())) for query, text in pairs]
+
+
+def reranker(max_cache_entries: int = 8192):
+    model = CrossEncoderReranker(max_cache_entries=max_cache_entries)
+    model._model = OverlapCrossEncoder()
+    return model
+
+
+def docs(*texts):
+    return [Document(page_content=text, metadata={"source": "notes.pdf"}, id=str(i)) for i, text in enumerate(texts)]
+
+
+def test_rerank_keeps_the_best_in_one_batch():
+    model = reranker()
+    candidates = docs("mars has two moons", "capital of mars is elon city", "cells divide", "the capital")
+    top = model.rerank("capital of mars", candidates, top_n=2)
+    assert [doc.id for doc in top] == ["1", "0"]
+    assert [doc.metadata["rerank_score"] for doc in top] == [3.0, 1.0]
+    assert model.model.batches == [4]
+    assert model.rerank("anything", []) == []
+
+
+def test_rerank_does_not_modify_the_input_documents():
+    model = reranker()
+    candidates = docs("capital of mars", "moons")
+    top = model.rerank("capital of mars", candidates, top_n=1)
+    assert top[0].metadata == {"source": "notes.pdf", "rerank_score": 3.0}
+    assert top[0] is not candidates[0]
+    assert all("rerank_score" not in doc.metadata for doc in candidates)
+
+
+def test_cached_pairs_skip_the_model():
+    model = reranker()
+    model.score("capital of mars", docs("capital of mars", "moons"))
+    model.score("capital of mars", docs("moons", "cells", "capital of mars"))
+    assert model.model.batches == [2, 1]  # only "cells" was new
+
+
+def test_cache_evicts_the_least_recently_used_pair():
+    model = reranker(max_cache_entries=2)
+    a, b, c = docs("alpha", "beta", "gamma")
+    model.score("q", [a, b])
+    model.score("q", [a])  # hit: alpha becomes the most recent
+    model.score("q", [c])  # evicts beta, not alpha
+    model.model.batches.clear()
+    model.score("q", [a])
+    assert model.model.batches == []
+    model.score("q", [b])
+    assert model.model.batches == [1]
@@ -0,0 +1,61 @@
+"""
+Shared knowledge-base retriever tests: run with `python -m pytest test_retriever.py`.
+"""
+import importlib
+import threading
+
+from ingestion import ingest_documents
+from rag_services.retriever import KnowledgeRetriever
+
+retriever_module = importlib.import_module("rag_services.retriever")
+
+
+def write_kb(knowledge_base):
+    (knowledge_base / "mars.txt").write_text("The capital of Mars is ElonCity. Mars has two moons.")
+    (knowledge_base / "cells.txt").write_text("Mitochondria are the powerhouse of the cell.")
+
+
+def count_opens(monkeypatch):
+    opened = []
+    original = retriever_module.open_kb_index
+
+    def counting(*args, **kwargs):
+        opened.append(args)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(retriever_module, "open_kb_index", counting)
+    return opened
+
+
+def test_index_is_opened_once_and_shared_between_threads(kb_env, monkeypatch):
+    write_kb(kb_env)
+    ingest_documents()
+    opened = count_opens(monkeypatch)
+    shared = KnowledgeRetriever(backend="faiss")
+    assert not shared.is_open
+
+    results = []
+
+    def ask():
+        results.append(shared.search("capital of Mars", k=1))
+
+    threads = [threading.Thread(target=ask) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(opened) == 1
+    assert all("ElonCity" in docs[0].page_content for docs in results)
+
+
+def test_reload_reopens_on_next_search(kb_env, monkeypatch):
+    write_kb(kb_env)
+    ingest_documents()
+    opened = count_opens(monkeypatch)
+    shared = KnowledgeRetriever(backend="faiss")
+    shared.search("mitochondria", k=1)
+    shared.reload()
+    assert not shared.is_open
+    assert "powerhouse" in shared.search("mitochondria cell", k=1)[0].page_content
+    assert len(opened) == 2
@@ -0,0 +1,221 @@
+"""
+FaissVectorIndex tests: run with `python -m pytest test_vector_index.py`.
+Vectors are passed in directly or come from the hash embeddings in conftest.py.
+"""
+import os
+
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+
+from rag_services import vector_index
+from rag_services.vector_index import FaissVectorIndex, open_vector_index
+
+
+def clustered_vectors(count: int, dim: int = 32, clusters: int = 20, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim))
+    return (centers[rng.integers(0, clusters, count)] + 0.3 * rng.standard_normal((count, dim))).astype(np.float32)
+
+
+def add_all(index, vectors, start: int = 0):
+    ids = [str(i) for i in range(start, start + len(vectors))]
+    docs = [Document(page_content=f"chunk {i}", metadata={"source": f"s{int(i) % 4}.txt"}) for i in ids]
+    index.add(docs, ids, vectors)
+    return ids
+
+
+def self_recall(index, vectors, ids, k: int = 10) -> float:
+    """Fraction of vectors whose own chunk is among the top-k hits of a search for that vector"""
+    found = sum(doc_id in {doc.id for doc, _ in index.search_by_vector(vectors[i], k)} for i, doc_id in ids)
+    return found / len(ids)
+
+
+@pytest.fixture
+def small_ivfpq(monkeypatch):
+    # Train IVF-PQ on a few thousand vectors instead of ~10k
+    monkeypatch.setattr(vector_index, "IVFPQ_MIN_TRAIN", 2000)
+
+
+def test_ivfpq_delete_keeps_surviving_vectors_searchable(tmp_path, small_ivfpq):
+    vectors = clustered_vectors(3000)
+    index = FaissVectorIndex(str(tmp_path), embeddings=None, index_type="ivfpq")
+    ids = add_all(index, vectors)
+    index.wait_for_build()
+    assert index.active_type == "ivfpq"
+    sample = [(i, ids[i]) for i in range(200, 3000, 20)]
+    before = self_recall(index, vectors, sample)
+
+    index.delete(ids[:200])
+    after = self_recall(index, vectors, sample)
+    assert after >= before - 0.02 and after > 0.8
+    hits = {doc.id for i in range(0, 200, 10) for doc, _ in index.search_by_vector(vectors[i], 10)}
+    assert not hits & set(ids[:200])
+
+    index.persist()
+    reopened = FaissVectorIndex(str(tmp_path), embeddings=None, index_type="ivfpq")
+    reopened.wait_for_build()
+    assert len(reopened) == 2800
+    assert self_recall(reopened, vectors, sample) >= after - 0.02
+
+
+def facts(*texts):
+    return [Document(page_content=text, metadata={"source": "facts.txt", "page": i + 1})
+            for i, text in enumerate(texts)]
+
+
+def test_flat_index_adds_searches_and_deletes(tmp_path, hash_embeddings):
+    index = open_vector_index("faiss", hash_embeddings, str(tmp_path))
+    assert isinstance(index, FaissVectorIndex) and len(index) == 0 and index.search("mars") == []
+    index.add(facts("the capital of mars is elon city", "mitochondria power the cell", "mars has two moons"),
+              ["a", "b", "c"])
+    hits = index.search("capital of mars", k=3)
+    assert [doc.id for doc, _ in hits][0] == "a"
+    assert [score for _, score in hits] == sorted((score for _, score in hits), reverse=True)
+    assert hits[0][0].metadata == {"source": "facts.txt", "page": 1}
+    assert np.linalg.norm(index.get_vectors(["b"])["b"]) == pytest.approx(1.0)
+
+    # Re-adding an id replaces its chunk; deleting unknown ids is a no-op
+    index.add(facts("photosynthesis makes sugar"), ["a"])
+    index.delete(["c", "missing"])
+    assert len(index) == 2
+    assert {doc.id for doc in index.similarity_search("mars", k=5)} == {"a", "b"}
+    assert index.similarity_search("photosynthesis", k=1)[0].page_content == "photosynthesis makes sugar"
+    assert index.stats()["documents"] == 2 and index.stats()["index_type"] == "flat"
+
+
+def test_flat_index_persists_and_reloads(tmp_path, hash_embeddings):
+    index = FaissVectorIndex(str(tmp_path), hash_embeddings, index_type="flat")
+    index.add(facts("the capital of mars is elon city", "mitochondria power the cell"), ["a", "b"])
+    index.persist()
+    index.delete(["b"])
+    index.add(facts("mars has two moons"), ["c"])
+    index.persist()
+    index.close()
+
+    reopened = FaissVectorIndex(str(tmp_path), hash_embeddings, index_type="flat")
+    assert len(reopened) == 2
+    assert reopened.similarity_search("two moons", k=1)[0].id == "c"
+    assert "b" not in {doc.id for doc, _ in reopened.search("mitochondria cell", k=2)}
+
+    reopened.reset()
+    reopened.persist()
+    assert len(FaissVectorIndex(str(tmp_path), hash_embeddings, index_type="flat")) == 0
+
+
+def test_unknown_backend_or_index_type_is_rejected(tmp_path, hash_embeddings):
+    with pytest.raises(ValueError):
+        open_vector_index("annoy", hash_embeddings, str(tmp_path))
+    with pytest.raises(ValueError):
+        FaissVectorIndex(str(tmp_path), hash_embeddings, index_type="lsh")
+
+
+def test_chroma_backend_matches_the_interface(tmp_path, hash_embeddings):
+    pytest.importorskip("chromadb")
+    index = open_vector_index("chroma", hash_embeddings, str(tmp_path), collection_name="kb_test")
+    index.add(facts("the capital of mars is elon city", "mitochondria power the cell"), ["a", "b"])
+    assert index.similarity_search("capital of mars", k=1)[0].id == "a"
+    index.delete(["a"])
+    assert len(index) == 1
+    index.close()
+
+
+def test_hnsw_tombstones_deletes_and_rebuilds_when_they_pile_up(tmp_path):
+    vectors = clustered_vectors(1000)
+    index = FaissVectorIndex(str(tmp_path), embeddings=None, index_type="hnsw")
+    ids = add_all(index, vectors)
+    index.wait_for_build()
+    assert index.active_type == "hnsw"
+
+    index.delete(ids[:100])  # 10%: below FAISS_TOMBSTONE_RATIO, kept as tombstones
+    assert len(index.tombstones) == 100 and len(index) == 900
+    hits = [doc.id for doc, _ in index.search_by_vector(vectors[0], 10)]
+    assert len(hits) == 10 and not set(hits) & set(ids[:100])
+
+    index.persist()
+    reopened = FaissVectorIndex(str(tmp_path), embeddings=None, index_type="hnsw")
+    assert reopened.active_type == "hnsw" and len(reopened.tombstones) == 100
+    assert not {doc.id for doc, _ in reopened.search_by_vector(vectors[5], 10)} & set(ids[:100])
+
+    reopened.delete(ids[100:300])  # 30% deleted: rebuilt without them
+    reopened.wait_for_build()
+    assert reopened.tombstones == set() and reopened.index.ntotal == 700
+    sample = [(i, ids[i]) for i in range(300, 1000, 10)]
+    assert self_recall(reopened, vectors, sample) > 0.95
+
+
+def test_auto_switches_to_hnsw_as_the_corpus_grows(tmp_path, monkeypatch):
+    monkeypatch.setattr(vector_index, "FAISS_HNSW_MIN_VECTORS", 500)
+    vectors = clustered_vectors(800)
+    index = FaissVectorIndex(str(tmp_path), embeddings=None, index_type="auto")
+    ids = add_all(index, vectors[:400])
+    assert index.active_type == "flat" and index.stats()["building"] is False
+    ids += add_all(index, vectors[400:], start=400)
+    # The flat index keeps serving until the background build is swapped in
+    assert index.search_by_vector(vectors[450], 1)[0][0].id == "450"
+    index.wait_for_build()
+    assert index.active_type == "hnsw" and len(index) == 800
+    assert self_recall(index, vectors, [(i, ids[i]) for i in range(0, 800, 10)]) > 0.95
+
+
+def test_search_params_reach_the_faiss_index(tmp_path, small_ivfpq):
+    import faiss
+
+    index = FaissVectorIndex(str(tmp_path), embeddings=None, index_type="ivfpq")
+    add_all(index, clustered_vectors(2500))
+    index.wait_for_build()
+    index.set_search_params(nprobe=3)
+    assert faiss.downcast_index(index.index).nprobe == 3
+
+    hnsw = FaissVectorIndex(str(tmp_path / "hnsw"), embeddings=None, index_type="hnsw")
+    add_all(hnsw, clustered_vectors(50))
+    hnsw.wait_for_build()
+    hnsw.set_search_params(ef_search=17)
+    assert FaissVectorIndex._inner(hnsw.index).hnsw.efSearch == 17
+
+
+def test_reload_maps_vectors_and_fetches_text_only_for_hits(tmp_path, monkeypatch):
+    vectors = clustered_vectors(500)
+    index = FaissVectorIndex(str(tmp_path), embeddings=None, index_type="flat")
+    ids = add_all(index, vectors[:300])
+    index.persist()
+    size = os.path.getsize(index.store.vectors_path)
+    add_all(index, vectors[300:], start=300)
+    index.persist()
+    # The second persist appended only the new rows
+    assert os.path.getsize(index.store.vectors_path) == size + 200 * 32 * 4
+
+    reopened = FaissVectorIndex(str(tmp_path), embeddings=None, index_type="flat")
+    assert isinstance(reopened._mapped, np.memmap) and reopened._pending_docs == {}
+    assert reopened.stats()["mapped_vector_bytes"] == 500 * 32 * 4
+    fetched = []
+    original = reopened.store.get_chunks
+    monkeypatch.setattr(reopened.store, "get_chunks",
+                        lambda faiss_ids: fetched.append(faiss_ids) or original(faiss_ids))
+    (doc, score), = reopened.search_by_vector(vectors[42], 1)
+    assert (doc.id, doc.page_content, doc.metadata) == ("42", "chunk 42", {"source": "s2.txt"})
+    assert score == pytest.approx(1.0, abs=1e-5)
+    assert fetched == [[42]]
+    assert np.allclose(reopened.get_vectors([ids[7]])[ids[7]], vectors[7] / np.linalg.norm(vectors[7]))
+
+
+def test_saved_approximate_index_is_reused_unless_it_is_stale(tmp_path):
+    vectors = clustered_vectors(600)
+    index = FaissVectorIndex(str(tmp_path), embeddings=None, index_type="hnsw")
+    add_all(index, vectors)
+    index.wait_for_build()
+    index.persist()
+    reopened = FaissVectorIndex(str(tmp_path), embeddings=None, index_type="hnsw")
+    # Loaded from vectors.index: no rebuild started
+    assert reopened.active_type == "hnsw" and not reopened.stats()["building"]
+
+    # A vectors.index that does not match the committed chunks (crash between writes) is not trusted
+    import faiss
+
+    stale = faiss.IndexIDMap2(faiss.IndexHNSWFlat(32, 16, faiss.METRIC_INNER_PRODUCT))
+    stale.add_with_ids(vectors[:590], np.arange(590, dtype=np.int64))
+    faiss.write_index(stale, os.path.join(str(tmp_path), FaissVectorIndex.INDEX_FILE))
+    rebuilt = FaissVectorIndex(str(tmp_path), embeddings=None, index_type="hnsw")
+    assert rebuilt.active_type == "flat" and len(rebuilt) == 600
+    rebuilt.wait_for_build()
+    assert rebuilt.active_type == "hnsw" and rebuilt.index.ntotal == 600
@@ -4,6 +4,9 @@ from core_services.ppt_service import generate_ppt
 from core_services.video_service import generate_educational_video
 from core_services.quiz_service import generate_quiz_from_pdf, generate_flashcards_from_pdf
 from core_services.notebook_service import ask_question_about_document
+from rag_services.prefetch import SpeculativePrefetcher
+from rag_services.retriever import retriever
+from rag_services.filters import build_filters
 
 # --- Tool Definitions ---
 
@@ -69,40 +72,40 @@ def generate_quiz_tool(file_path: str, num_questions: int = 5) -> Dict[str, Any]
         return {"error": str(e)}
 
 @tool
-def ask_document_tool(question: str) -> Dict[str, Any]:
+def ask_document_tool(question: str, source: Optional[str] = None, page_start: Optional[int] = None,
+                      page_end: Optional[int] = None) -> Dict[str, Any]:
     """
     Asks a question about the currently uploaded document/notebook.
     Useful for specific questions like "What does the document say about X?" or "Summarize the pdf".
+    Optionally restrict the search to one file name (source) and/or a page range (page_start..page_end).
     """
     try:
-        return ask_question_about_document(question)
+        filters = build_filters(source=source, page_start=page_start, page_end=page_end)
+        return ask_question_about_document(question, filters=filters)
     except Exception as e:
         return {"error": str(e)}
 
+def search_knowledge_base(query: str, k: int = 3, filters: Optional[Dict[str, Any]] = None):
+    """Top-k passages from the shared knowledge-base retriever (overlaps merged, MMR-diversified)"""
+    return retriever.search_context(query, k=k, filters=filters)
+
+# Started by input_session so retrieval overlaps with routing
+knowledge_prefetcher = SpeculativePrefetcher(search_knowledge_base)
+
 @tool
-def retrieve_knowledge_tool(query: str):
+def retrieve_knowledge_tool(query: str, source: Optional[str] = None, page_start: Optional[int] = None,
+                            page_end: Optional[int] = None):
     """
     Search the knowledge base (RAG) for information.
     Use this to find answers in stored documents.
+    Optionally restrict the search to one file (source, path relative to knowledge_base/) and/or a page range.
     """
     try:
-        from langchain_google_genai import GoogleGenerativeAIEmbeddings
-        from langchain_chroma import Chroma
-        import os
-        
-        embeddings_model = GoogleGenerativeAIEmbeddings(
-            model="models/embedding-001",
-            google_api_key=os.getenv("GEMINI_API_KEY")
-        )
-        
-        vector_store = Chroma(
-            collection_name="knowledge_base",
-            embedding_function=embeddings_model,
-            persist_directory="./chroma_db"
-        )
-        
-        # Search
-        results = vector_store.similarity_search(query, k=3)
+        filters = build_filters(source=source, page_start=page_start, page_end=page_end)
+        # The speculative prefetch is unscoped, so it can only serve unfiltered searches
+        results = knowledge_prefetcher.take(query) if filters is None else None
+        if results is None:
+            results = search_knowledge_base(query, k=3, filters=filters)
         
         if not results:
             return "No relevant information found in knowledge base."